@@ -0,0 +1,55 @@
+from typing import Dict, List
+from fastapi import APIRouter, HTTPException, Path
+from fastapi.responses import StreamingResponse
+from loguru import logger
+
+from database.backup import backup_manager
+
+router = APIRouter()
+
+
+@router.get("/", response_model=List[Dict])
+async def list_snapshots():
+    """获取所有数据库快照，最新的在前"""
+    try:
+        return await backup_manager.list_snapshots()
+    except Exception as e:
+        logger.error(f"获取数据库快照列表失败: {e}")
+        raise HTTPException(status_code=500, detail="获取数据库快照列表失败")
+
+
+@router.post("/create", response_model=Dict)
+async def create_snapshot():
+    """在线创建数据库快照，只保存相对已有快照发生变化的数据块"""
+    try:
+        return await backup_manager.create_snapshot()
+    except Exception as e:
+        logger.error(f"创建数据库快照失败: {e}")
+        raise HTTPException(status_code=500, detail=f"创建数据库快照失败: {str(e)}")
+
+
+@router.get("/{name}/export")
+async def export_snapshot(name: str = Path(..., description="快照名")):
+    """以gzip格式流式下载快照，解压后即为完整的数据库文件"""
+    snapshot = await backup_manager.get_snapshot(name)
+    if not snapshot:
+        raise HTTPException(status_code=404, detail=f"快照不存在: {name}")
+    return StreamingResponse(
+        backup_manager.export_snapshot(name),
+        media_type="application/gzip",
+        headers={"Content-Disposition": f'attachment; filename="LocalBooks-{name}.db.gz"'}
+    )
+
+
+@router.post("/delete/{name}", response_model=Dict[str, str])
+async def delete_snapshot(name: str = Path(..., description="快照名")):
+    """删除数据库快照"""
+    try:
+        if not await backup_manager.delete_snapshot(name):
+            raise HTTPException(status_code=404, detail=f"快照不存在: {name}")
+        return {"message": "快照删除成功"}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"删除数据库快照失败: {e}")
+        raise HTTPException(status_code=500, detail="删除数据库快照失败")
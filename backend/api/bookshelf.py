@@ -43,10 +43,16 @@ async def add_to_bookshelf(bookshelf: BookshelfCreate):
 async def get_bookshelf(
     page: int = Query(1, description="页码", ge=1),
     page_size: int = Query(10, description="每页数量", ge=1, le=100),
-    sort_by: str = Query("updated_at", description="排序字段: updated_at, added_at, title")
+    sort_by: str = Query("updated_at", description="排序字段: updated_at, added_at, title"),
+    cursor: Optional[str] = Query(None, description="分页游标，传空字符串获取第一页，传入后忽略page")
 ):
     """获取书架列表"""
     try:
+        # 游标分页
+        if cursor is not None:
+            bookshelf_items, next_cursor = await crud.get_bookshelf_by_cursor(cursor, page_size, sort_by)
+            return {"page_size": page_size, "data": bookshelf_items, "next_cursor": next_cursor}
+
         # 获取书架列表
         bookshelf_items, total = await crud.get_bookshelf(page, page_size, sort_by)
 
@@ -59,6 +65,8 @@ async def get_bookshelf(
         }
 
         return response
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"获取书架列表失败: {str(e)}")
         raise HTTPException(status_code=500, detail=f"获取书架列表失败: {str(e)}")
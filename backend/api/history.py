@@ -3,6 +3,7 @@ from typing import Optional, List
 from loguru import logger
 
 from database import crud
+from database.write_buffer import write_buffer
 from database.models import HistoryCreate, History, PaginatedResponse
 
 router = APIRouter()
@@ -12,10 +13,17 @@ router = APIRouter()
 async def get_history_list(
     page: int = Query(1, ge=1, description="页码"),
     page_size: int = Query(10, ge=1, le=50, description="每页数量"),
-    sort_by: str = Query("read_at", description="排序字段，支持read_at(阅读时间)和title(标题)")
+    sort_by: str = Query("read_at", description="排序字段，支持read_at(阅读时间)和title(标题)"),
+    cursor: Optional[str] = Query(None, description="分页游标，传空字符串获取第一页，传入后忽略page")
 ):
     """获取历史记录列表"""
     try:
+        # 先写入缓冲中的阅读记录
+        await write_buffer.flush()
+        if cursor is not None:
+            history_items, next_cursor = await crud.get_history_by_cursor(cursor, page_size, sort_by)
+            return {"page_size": page_size, "data": history_items, "next_cursor": next_cursor}
+
         history_items, total = await crud.get_history(page, page_size, sort_by)
         return {
             "total": total,
@@ -23,6 +31,8 @@ async def get_history_list(
             "page_size": page_size,
             "data": history_items
         }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"获取历史记录列表失败: {e}")
         raise HTTPException(status_code=500, detail="获取历史记录列表失败")
@@ -42,9 +52,9 @@ async def add_history(history: HistoryCreate):
         if not chapter:
             raise HTTPException(status_code=404, detail="章节不存在")
         
-        # 添加历史记录
-        history_id = await crud.add_history(history)
-        return {"id": history_id, "message": "历史记录添加成功"}
+        # 阅读位置变化频繁，先写入缓冲，由后台批量提交
+        write_buffer.add_history(history)
+        return {"message": "历史记录添加成功"}
     except HTTPException:
         raise
     except Exception as e:
@@ -56,6 +66,7 @@ async def add_history(history: HistoryCreate):
 async def delete_history(history_id: int = Path(..., description="历史记录ID")):
     """删除历史记录"""
     try:
+        await write_buffer.flush()
         success = await crud.delete_history(history_id)
         if not success:
             raise HTTPException(status_code=404, detail="历史记录不存在")
@@ -76,6 +87,7 @@ async def delete_novel_history(novel_id: int = Path(..., description="小说ID")
         if not novel:
             raise HTTPException(status_code=404, detail="小说不存在")
         
+        await write_buffer.discard_history(novel_id)
         success = await crud.delete_novel_history(novel_id)
         return {"message": "小说历史记录删除成功"}
     except HTTPException:
@@ -89,6 +101,7 @@ async def delete_novel_history(novel_id: int = Path(..., description="小说ID")
 async def clear_all_history():
     """清空所有历史记录"""
     try:
+        await write_buffer.discard_history()
         success = await crud.clear_all_history()
         return {"message": "所有历史记录已清空"}
     except Exception as e:
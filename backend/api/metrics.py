@@ -0,0 +1,45 @@
+from typing import Any, Dict, List
+from fastapi import APIRouter, HTTPException
+from loguru import logger
+
+from database.instrumentation import query_stats
+from spider.rate_limiter import rate_limiter
+
+router = APIRouter()
+
+
+@router.get("/queries", response_model=Dict[str, Any])
+async def get_query_stats():
+    """获取各crud函数的耗时统计，包括连接、执行、提交耗时的分位数和返回行数，按总耗时降序"""
+    try:
+        return query_stats.snapshot()
+    except Exception as e:
+        logger.error(f"获取查询统计失败: {e}")
+        raise HTTPException(status_code=500, detail="获取查询统计失败")
+
+
+@router.get("/slow_queries", response_model=List[Dict[str, Any]])
+async def get_slow_queries():
+    """获取最近的慢查询及其执行计划，最新的在前"""
+    try:
+        return query_stats.slow_queries()
+    except Exception as e:
+        logger.error(f"获取慢查询失败: {e}")
+        raise HTTPException(status_code=500, detail="获取慢查询失败")
+
+
+@router.get("/rate_limits", response_model=Dict[str, Dict[str, Any]])
+async def get_rate_limits():
+    """获取各域名的限速状态，包括速率、排队中的请求数、平均等待时间和429/503暂停情况"""
+    try:
+        return rate_limiter.snapshot()
+    except Exception as e:
+        logger.error(f"获取限速状态失败: {e}")
+        raise HTTPException(status_code=500, detail="获取限速状态失败")
+
+
+@router.post("/reset", response_model=Dict[str, str])
+async def reset_query_stats():
+    """清空查询统计和慢查询记录"""
+    query_stats.reset()
+    return {"message": "查询统计已清空"}
@@ -5,9 +5,12 @@ from fastapi import APIRouter, Depends, HTTPException, Query, Path
 from utils.logger_manager import api_logger, error_logger
 
 from database import crud
-from database.models import Novel, Chapter, SearchResult, NovelCreate, ChapterCreate, PaginatedResponse
+from database.write_buffer import write_buffer
+from database.models import Novel, Chapter, SearchResult, NovelCreate, ChapterCreate, PaginatedResponse, ContentSearchResponse
 from spider.spider_manager import spider_manager
+from spider.conditional import NOT_MODIFIED
 from utils.cache import cached
+from utils.rule_registry import rule_registry
 
 # 创建路由器
 router = APIRouter()
@@ -21,17 +24,15 @@ async def search_novel(
     """搜索小说"""
     try:
         # 检查规则是否存在
-        rule = await crud.get_rule(rule_id)
+        rule = await rule_registry.get(rule_id)
         if not rule:
             raise HTTPException(status_code=404, detail=f"规则不存在: {rule_id}")
 
         # 使用爬虫搜索小说
         results = await spider_manager.search_novel(keyword, rule_id)
 
-        # 记录搜索历史
-        from database.models import SearchHistoryCreate
-        search_history = SearchHistoryCreate(keyword=keyword)
-        await crud.add_search_history(search_history)
+        # 记录搜索历史，由写入缓冲批量提交
+        write_buffer.add_search(keyword)
 
         api_logger.info(f"搜索小说成功: {keyword}", rule_id=rule_id, results_count=len(results))
         return results
@@ -51,7 +52,7 @@ async def add_novel(novel_data: Dict[str, Any]):
         # 检查规则是否存在
         rule_id = novel_data.get('rule_id')
         if rule_id:
-            rule = await crud.get_rule(rule_id)
+            rule = await rule_registry.get(rule_id)
             if not rule:
                 raise HTTPException(status_code=404, detail=f"规则不存在: {rule_id}")
 
@@ -77,6 +78,43 @@ async def add_novel(novel_data: Dict[str, Any]):
         raise HTTPException(status_code=500, detail=f"添加小说失败: {str(e)}")
 
 
+@router.get("/search/content", response_model=ContentSearchResponse)
+async def search_library_content(
+    keyword: str = Query(..., description="搜索关键词"),
+    page: int = Query(1, ge=1, description="页码"),
+    page_size: int = Query(20, ge=1, le=100, description="每页数量")
+):
+    """在书库所有已下载章节中搜索"""
+    try:
+        hits, has_more = await crud.search_chapter_content(keyword, None, page, page_size)
+        api_logger.info(f"书库正文搜索成功: {keyword}", results_count=len(hits))
+        return {"page": page, "page_size": page_size, "has_more": has_more, "data": hits}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        error_logger.exception(f"书库正文搜索失败: {keyword}", exc_info=e)
+        raise HTTPException(status_code=500, detail=f"书库正文搜索失败: {str(e)}")
+
+
+@router.get("/{novel_id}/search/content", response_model=ContentSearchResponse)
+async def search_novel_content(
+    novel_id: int = Path(..., description="小说ID"),
+    keyword: str = Query(..., description="搜索关键词"),
+    page: int = Query(1, ge=1, description="页码"),
+    page_size: int = Query(20, ge=1, le=100, description="每页数量")
+):
+    """在本书已下载章节中搜索"""
+    try:
+        hits, has_more = await crud.search_chapter_content(keyword, novel_id, page, page_size)
+        api_logger.info(f"本书正文搜索成功: {keyword}", novel_id=novel_id, results_count=len(hits))
+        return {"page": page, "page_size": page_size, "has_more": has_more, "data": hits}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        error_logger.exception(f"本书正文搜索失败: {keyword}", exc_info=e, novel_id=novel_id)
+        raise HTTPException(status_code=500, detail=f"本书正文搜索失败: {str(e)}")
+
+
 @router.get("/{novel_id}", response_model=Novel)
 async def get_novel_detail(novel_id: int = Path(..., description="小说ID")):
     """获取小说详情"""
@@ -102,7 +140,7 @@ async def fetch_novel_detail(
     """从网络获取小说详情"""
     try:
         # 检查规则是否存在
-        rule = await crud.get_rule(rule_id)
+        rule = await rule_registry.get(rule_id)
         if not rule:
             raise HTTPException(status_code=404, detail=f"规则不存在: {rule_id}")
 
@@ -147,9 +185,9 @@ async def get_novel_chapters(novel_id: int = Path(..., description="小说ID")):
                 # 使用爬虫获取章节列表
                 chapter_list = await spider_manager.get_chapters(novel_id, novel['source_url'], rule_id)
 
-                # 保存到数据库
-                for chapter_data in chapter_list:
-                    chapter = ChapterCreate(
+                # 保存到数据库，并发请求同时抓取时按来源地址去重
+                await crud.sync_chapter_catalog(novel_id, [
+                    ChapterCreate(
                         novel_id=novel_id,
                         title=chapter_data['title'],
                         chapter_index=chapter_data['chapter_index'],
@@ -157,7 +195,8 @@ async def get_novel_chapters(novel_id: int = Path(..., description="小说ID")):
                         content=None,
                         is_downloaded=False
                     )
-                    await crud.create_chapter(chapter)
+                    for chapter_data in chapter_list
+                ])
 
                 # 重新获取章节列表
                 chapters = await crud.get_novel_chapters(novel_id)
@@ -240,13 +279,21 @@ async def get_novel_detail_from_network(novel_id: int = Path(..., description="
             else:
                 raise HTTPException(status_code=404, detail="未找到可用的规则")
         
-        # 使用爬虫获取小说详情
-        detail = await spider_manager.get_novel_detail(novel['source_url'], rule_id)
+        # 使用爬虫获取小说详情，页面未变化时不再解析和更新
+        detail = await spider_manager.get_novel_detail(novel['source_url'], rule_id, revalidate=True)
+        if detail is NOT_MODIFIED:
+            api_logger.info(f"小说详情未变化: {novel['title']}", novel_id=novel_id)
+            return novel
         if not detail:
             raise HTTPException(status_code=404, detail="获取小说详情失败")
         
         # 更新小说信息
-        await crud.update_novel(novel_id, detail)
+        try:
+            await crud.update_novel(novel_id, detail)
+        except Exception:
+            # 验证信息已保存，更新失败时删除，下次刷新重新完整获取
+            await crud.delete_http_validators(novel['source_url'])
+            raise
         
         # 获取更新后的小说信息
         updated_novel = await crud.get_novel(novel_id)
@@ -278,15 +325,20 @@ async def get_novel_chapters_from_network(novel_id: int = Path(..., description=
             else:
                 raise HTTPException(status_code=404, detail="未找到可用的规则")
         
-        # 使用爬虫获取章节列表
-        chapter_list = await spider_manager.get_chapters(novel_id, novel['source_url'], rule_id)
+        # 使用爬虫获取章节列表，目录页未变化时不再解析和同步
+        chapter_list = await spider_manager.get_chapters(novel_id, novel['source_url'], rule_id, revalidate=True)
+        if chapter_list is NOT_MODIFIED:
+            chapters = await crud.get_novel_chapters(novel_id)
+            if chapters:
+                api_logger.info("小说章节列表未变化", novel_id=novel_id, chapters_count=len(chapters))
+                return chapters
+            # 本地没有目录时重新完整获取
+            chapter_list = await spider_manager.get_chapters(novel_id, novel['source_url'], rule_id)
         
-        # 保存到数据库
-        for chapter_data in chapter_list:
-            # 检查章节是否已存在
-            existing_chapter = await crud.get_chapter_by_url(chapter_data['source_url'])
-            if not existing_chapter:
-                chapter = ChapterCreate(
+        # 与已有目录比对，只写入新增、改名、移动和移除的章节
+        try:
+            counts = await crud.sync_chapter_catalog(novel_id, [
+                ChapterCreate(
                     novel_id=novel_id,
                     title=chapter_data['title'],
                     chapter_index=chapter_data['chapter_index'],
@@ -294,11 +346,16 @@ async def get_novel_chapters_from_network(novel_id: int = Path(..., description=
                     content=None,
                     is_downloaded=False
                 )
-                await crud.create_chapter(chapter)
+                for chapter_data in chapter_list
+            ])
+        except Exception:
+            # 验证信息已保存，同步失败时删除，下次刷新重新完整获取
+            await crud.delete_http_validators(novel['source_url'])
+            raise
         
         # 获取更新后的章节列表
         chapters = await crud.get_novel_chapters(novel_id)
-        api_logger.info(f"从网络更新小说章节列表成功", novel_id=novel_id, chapters_count=len(chapters))
+        api_logger.info(f"从网络更新小说章节列表成功", novel_id=novel_id, chapters_count=len(chapters), **counts)
         return chapters
     except HTTPException:
         raise
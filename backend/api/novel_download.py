@@ -1,52 +1,18 @@
-from typing import Dict, Any
-from fastapi import APIRouter, Path, HTTPException, BackgroundTasks
+from typing import Dict, Any, List, Optional
+from fastapi import APIRouter, Path, Query, HTTPException
 from loguru import logger
 
 from database import crud
-from spider.spider_manager import spider_manager
+from database.models import DownloadJob
+from spider.download_manager import download_manager
 
 # 创建路由器
 router = APIRouter()
 
 
-async def download_novel_chapters_task(novel_id: int, rule_id: int, source_url: str):
-    """后台任务：下载小说所有章节"""
-    try:
-        # 获取章节列表
-        chapters = await crud.get_novel_chapters(novel_id)
-        
-        # 如果没有章节，先从网络获取章节列表
-        if not chapters:
-            chapters = await spider_manager.get_chapters(novel_id, source_url, rule_id)
-            if not chapters:
-                logger.error(f"获取小说章节列表失败: 小说ID {novel_id}")
-                return
-        
-        # 遍历章节，下载未下载的章节内容
-        for chapter in chapters:
-            # 如果章节未下载，则下载内容
-            if not chapter.get('is_downloaded') or not chapter.get('content'):
-                content = await spider_manager.get_chapter_content(
-                    chapter['id'], 
-                    chapter['url'], 
-                    rule_id
-                )
-                
-                if content:
-                    # 更新章节内容
-                    await crud.update_chapter_content(chapter['id'], content)
-                    logger.info(f"下载章节成功: 章节ID {chapter['id']}, 标题: {chapter['title']}")
-                else:
-                    logger.error(f"下载章节内容失败: 章节ID {chapter['id']}, 标题: {chapter['title']}")
-        
-        logger.info(f"小说章节下载任务完成: 小说ID {novel_id}")
-    except Exception as e:
-        logger.error(f"下载小说章节失败: {str(e)}")
-
-
-@router.post("/{novel_id}/download")
-async def download_novel_chapters(background_tasks: BackgroundTasks, novel_id: int = Path(..., description="小说ID")):
-    """下载小说所有章节"""
+@router.post("/{novel_id}/download", response_model=Dict[str, Any])
+async def download_novel_chapters(novel_id: int = Path(..., description="小说ID")):
+    """下载小说所有章节，该小说已有未完成的下载任务时返回该任务"""
     try:
         # 检查小说是否存在
         novel = await crud.get_novel(novel_id)
@@ -63,17 +29,69 @@ async def download_novel_chapters(background_tasks: BackgroundTasks, novel_id: i
             else:
                 raise HTTPException(status_code=404, detail="未找到可用的规则")
         
-        # 添加后台任务
-        background_tasks.add_task(
-            download_novel_chapters_task, 
-            novel_id, 
-            rule_id, 
-            novel['source_url']
-        )
-        
-        return {"message": "章节下载任务已开始，请稍后查看"}
+        # 提交下载任务，任务保存在数据库中，服务重启后继续
+        job, created = await download_manager.submit(novel_id, rule_id)
+        message = "章节下载任务已开始，请稍后查看" if created else "该小说已有未完成的下载任务"
+        return {"job_id": job['id'], "status": job['status'], "message": message}
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"下载小说章节失败: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"下载小说章节失败: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"下载小说章节失败: {str(e)}")
+
+
+@router.get("/{novel_id}/download", response_model=DownloadJob)
+async def get_novel_download_job(novel_id: int = Path(..., description="小说ID")):
+    """获取小说最近的下载任务及进度"""
+    try:
+        job = await crud.get_latest_download_job(novel_id)
+        if not job:
+            raise HTTPException(status_code=404, detail="该小说没有下载任务")
+        return job
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"获取下载任务失败: {str(e)}")
+        raise HTTPException(status_code=500, detail="获取下载任务失败")
+
+
+@router.get("/download/jobs", response_model=List[DownloadJob])
+async def get_download_jobs(
+    status: Optional[str] = Query(None, description="任务状态，支持pending、running、completed、failed和cancelled"),
+    limit: int = Query(50, ge=1, le=200, description="返回数量")
+):
+    """获取下载任务列表，最新的在前"""
+    try:
+        return await crud.get_download_jobs(status, limit)
+    except Exception as e:
+        logger.error(f"获取下载任务列表失败: {str(e)}")
+        raise HTTPException(status_code=500, detail="获取下载任务列表失败")
+
+
+@router.get("/download/jobs/{job_id}", response_model=DownloadJob)
+async def get_download_job(job_id: int = Path(..., description="任务ID")):
+    """获取下载任务进度"""
+    try:
+        job = await crud.get_download_job(job_id)
+        if not job:
+            raise HTTPException(status_code=404, detail="下载任务不存在")
+        return job
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"获取下载任务失败: {str(e)}")
+        raise HTTPException(status_code=500, detail="获取下载任务失败")
+
+
+@router.post("/download/jobs/{job_id}/cancel", response_model=Dict[str, str])
+async def cancel_download_job(job_id: int = Path(..., description="任务ID")):
+    """取消下载任务，已下载的章节保留"""
+    try:
+        if not await download_manager.cancel(job_id):
+            raise HTTPException(status_code=400, detail="下载任务不存在或已结束")
+        return {"message": "下载任务已取消"}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"取消下载任务失败: {str(e)}")
+        raise HTTPException(status_code=500, detail="取消下载任务失败")
@@ -3,7 +3,7 @@ from typing import Optional, List, Dict, Any
 from loguru import logger
 
 from database import crud
-from database.models import RuleCreate, Rule, PaginatedResponse
+from database.models import RuleCreate, Rule, CleaningRules, PaginatedResponse
 
 router = APIRouter()
 
@@ -12,10 +12,15 @@ router = APIRouter()
 async def get_rules(
     page: int = Query(1, ge=1, description="页码"),
     page_size: int = Query(10, ge=1, le=50, description="每页数量"),
-    sort_by: str = Query("updated_at", description="排序字段，支持updated_at(更新时间)、created_at(创建时间)和name(名称)")
+    sort_by: str = Query("updated_at", description="排序字段，支持updated_at(更新时间)、created_at(创建时间)和name(名称)"),
+    cursor: Optional[str] = Query(None, description="分页游标，传空字符串获取第一页，传入后忽略page")
 ):
     """获取规则列表"""
     try:
+        if cursor is not None:
+            rules, next_cursor = await crud.get_rules_by_cursor(cursor, page_size, sort_by)
+            return {"page_size": page_size, "data": rules, "next_cursor": next_cursor}
+
         rules, total = await crud.get_rules(page, page_size, sort_by)
         return {
             "total": total,
@@ -23,6 +28,8 @@ async def get_rules(
             "page_size": page_size,
             "data": rules
         }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"获取规则列表失败: {e}")
         raise HTTPException(status_code=500, detail="获取规则列表失败")
@@ -65,6 +72,13 @@ async def update_rule(
         rule = await crud.get_rule(rule_id)
         if not rule:
             raise HTTPException(status_code=404, detail="规则不存在")
+
+        # 检查正文清理配置
+        if rule_data.get('cleaning_rules') is not None:
+            try:
+                rule_data['cleaning_rules'] = CleaningRules.model_validate(rule_data['cleaning_rules']).model_dump()
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=f"正文清理配置无效: {str(e)}")
         
         # 更新规则
         success = await crud.update_rule(rule_id, rule_data)
@@ -3,6 +3,7 @@ from fastapi import APIRouter, HTTPException, Query, Path, Depends
 from utils.logger_manager import api_logger, error_logger
 
 from database import crud
+from database.write_buffer import write_buffer
 from database.models import SearchHistory, SearchHistoryCreate
 
 # 创建路由器
@@ -13,6 +14,7 @@ router = APIRouter()
 async def add_search_history(search_history: SearchHistoryCreate):
     """添加搜索历史"""
     try:
+        await write_buffer.discard_search(search_history.keyword)
         history_id = await crud.add_search_history(search_history)
         api_logger.info("添加搜索历史", keyword=search_history.keyword)
         return history_id
@@ -25,6 +27,7 @@ async def add_search_history(search_history: SearchHistoryCreate):
 async def get_search_history(limit: int = Query(10, description="返回数量")):
     """获取搜索历史列表"""
     try:
+        await write_buffer.flush()
         history_list = await crud.get_search_history(limit)
         api_logger.info("获取搜索历史列表", limit=limit)
         return history_list
@@ -37,6 +40,7 @@ async def get_search_history(limit: int = Query(10, description="返回数量"))
 async def delete_search_history(history_id: int = Path(..., description="搜索历史ID")):
     """删除搜索历史"""
     try:
+        await write_buffer.flush()
         result = await crud.delete_search_history(history_id)
         api_logger.info("删除搜索历史", history_id=history_id)
         return result
@@ -49,6 +53,7 @@ async def delete_search_history(history_id: int = Path(..., description="搜索
 async def delete_search_history_by_keyword(keyword: str = Path(..., description="搜索关键词")):
     """根据关键词删除搜索历史"""
     try:
+        await write_buffer.discard_search(keyword)
         result = await crud.delete_search_history_by_keyword(keyword)
         api_logger.info("根据关键词删除搜索历史", keyword=keyword)
         return result
@@ -61,6 +66,7 @@ async def delete_search_history_by_keyword(keyword: str = Path(..., description=
 async def clear_all_search_history():
     """清空所有搜索历史"""
     try:
+        await write_buffer.discard_search()
         result = await crud.clear_all_search_history()
         api_logger.info("清空所有搜索历史")
         return result
@@ -1,5 +1,5 @@
 from fastapi import APIRouter, HTTPException, Path, Body
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 from loguru import logger
 import json
 
@@ -8,24 +8,66 @@ from database import crud
 router = APIRouter()
 
 
+def _decode(value: str) -> Any:
+    """尝试将JSON字符串转换为对象，不是有效的JSON时保持原样"""
+    try:
+        return json.loads(value)
+    except (json.JSONDecodeError, TypeError):
+        return value
+
+
+def _encode(value: Any) -> str:
+    """复杂对象转换为JSON字符串，其他值转换为字符串"""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    if not isinstance(value, str):
+        return str(value)
+    return value
+
+
 @router.get("/")
 async def get_all_settings():
     """获取所有设置"""
     try:
         settings = await crud.get_all_settings()
-        # 尝试将JSON字符串转换为对象
-        for key, value in settings.items():
-            try:
-                settings[key] = json.loads(value)
-            except (json.JSONDecodeError, TypeError):
-                # 如果不是有效的JSON，保持原样
-                pass
-        return settings
+        return {key: _decode(value) for key, value in settings.items()}
     except Exception as e:
         logger.error(f"获取所有设置失败: {e}")
         raise HTTPException(status_code=500, detail="获取所有设置失败")
 
 
+@router.get("/version")
+async def get_settings_version():
+    """获取设置版本号，设置每次改动后递增，客户端可轮询该值判断是否需要重新获取设置"""
+    try:
+        return {"version": await crud.get_settings_version()}
+    except Exception as e:
+        logger.error(f"获取设置版本号失败: {e}")
+        raise HTTPException(status_code=500, detail="获取设置版本号失败")
+
+
+@router.post("/batch/get")
+async def get_settings_batch(keys: List[str] = Body(..., description="设置键名列表")):
+    """批量获取设置，不存在的键不出现在结果中"""
+    try:
+        settings = await crud.get_settings(keys)
+        return {key: _decode(value) for key, value in settings.items()}
+    except Exception as e:
+        logger.error(f"批量获取设置失败: {e}")
+        raise HTTPException(status_code=500, detail="批量获取设置失败")
+
+
+@router.post("/batch/update")
+async def update_settings_batch(values: Dict[str, Any] = Body(..., description="设置键名到设置值的映射")):
+    """在一个事务中批量更新设置"""
+    try:
+        version = await crud.update_settings({key: _encode(value) for key, value in values.items()})
+        return {"message": f"已更新 {len(values)} 项设置", "version": version}
+    except Exception as e:
+        logger.error(f"批量更新设置失败: {e}")
+        raise HTTPException(status_code=500, detail="批量更新设置失败")
+
+
 @router.get("/{key}")
 async def get_setting(key: str = Path(..., description="设置键名")):
     """获取单个设置"""
@@ -33,15 +75,8 @@ async def get_setting(key: str = Path(..., description="设置键名")):
         value = await crud.get_setting(key)
         if value is None:
             raise HTTPException(status_code=404, detail=f"设置 {key} 不存在")
-        
-        # 尝试将JSON字符串转换为对象
-        try:
-            value = json.loads(value)
-        except (json.JSONDecodeError, TypeError):
-            # 如果不是有效的JSON，保持原样
-            pass
-            
-        return {key: value}
+
+        return {key: _decode(value)}
     except HTTPException:
         raise
     except Exception as e:
@@ -56,13 +91,7 @@ async def update_setting(
 ):
     """更新设置"""
     try:
-        # 如果值是复杂对象，转换为JSON字符串
-        if isinstance(value, (dict, list)):
-            value = json.dumps(value, ensure_ascii=False)
-        elif not isinstance(value, str):
-            value = str(value)
-        
-        success = await crud.update_setting(key, value)
+        success = await crud.update_setting(key, _encode(value))
         return {"message": f"设置 {key} 更新成功"}
     except Exception as e:
         logger.error(f"更新设置失败: {e}")
@@ -95,9 +124,8 @@ async def reset_to_default():
             SettingKeys.LOG_LEVEL: "INFO"  # INFO级别
         }
         
-        # 更新所有设置
-        for key, value in default_settings.items():
-            await crud.update_setting(key, value)
+        # 在一个事务中更新所有设置
+        await crud.update_settings(default_settings)
         
         return {"message": "已重置为默认设置"}
     except Exception as e:
@@ -0,0 +1,130 @@
+"""整本书章节下载基准测试
+
+本地HTTP服务为每个章节页面加上固定的响应延迟，模拟源站的网络往返时间，
+对比逐章等待下载（旧实现）和批量下载（SpiderManager.get_chapter_contents）下载整本书的耗时。
+测试时关闭按域名限速和Scrapy的HTTP缓存，只比较请求方式本身；
+生产环境中同一域名的请求频率仍受限速器（RATE_LIMIT_PER_HOST）限制。
+
+运行方式（在backend目录下）:
+    python -m benchmarks.bench_chapter_batch
+"""
+import time
+import asyncio
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Tuple
+
+from loguru import logger
+from scrapy.settings import Settings
+
+from benchmarks.common import print_table
+from utils.rule_registry import rule_registry
+from spider.spider_manager import SpiderManager
+from spider.crawler_service import CrawlerService, project_settings, start_reactor
+from spider.async_fetcher import AsyncFetcher
+from spider.rate_limiter import rate_limiter
+
+# 模拟的章节页面
+CHAPTER_PAGE = (
+    "<html><head><title>第一章</title></head><body><h1>第一章</h1><div id='content'>"
+    + "".join(f"<p>第{i}段，这是用于基准测试的章节正文内容。</p>" for i in range(100))
+    + "</div></body></html>"
+).encode("utf-8")
+
+RULE_ID = -1
+
+RULE = {
+    "id": RULE_ID, "name": "基准测试", "updated_at": None,
+    "chapter_list_rule": "#list a", "chapter_content_rule": "#content",
+}
+
+
+def _handler(latency: float):
+    class _ChapterHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(latency)
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(CHAPTER_PAGE)))
+            self.end_headers()
+            self.wfile.write(CHAPTER_PAGE)
+
+        def log_message(self, *args):
+            pass
+
+    return _ChapterHandler
+
+
+def _settings() -> Settings:
+    settings = project_settings()
+    settings.setdict({
+        "HTTPCACHE_ENABLED": False,
+        "TELNETCONSOLE_ENABLED": False,
+        "LOG_ENABLED": False,
+    }, priority="cmdline")
+    return settings
+
+
+async def _serial(manager: SpiderManager, chapters: List[Tuple[int, str]]) -> float:
+    start = time.perf_counter()
+    for chapter_id, url in chapters:
+        assert await manager.get_chapter_content(chapter_id, url, RULE_ID), "未解析到正文"
+    return (time.perf_counter() - start) * 1000
+
+
+async def _batch(manager: SpiderManager, chapters: List[Tuple[int, str]]) -> float:
+    start = time.perf_counter()
+    count = 0
+    async for _, content in manager.get_chapter_contents(chapters, RULE_ID):
+        assert content, "未解析到正文"
+        count += 1
+    assert count == len(chapters), "章节数不一致"
+    return (time.perf_counter() - start) * 1000
+
+
+async def main(chapters: int, latency: float, rounds: int) -> None:
+    # 每个章节都会记录日志，测试时关闭
+    logger.disable("spider")
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _handler(latency / 1000))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    book = [(i, f"http://127.0.0.1:{server.server_port}/chapter/{i}") for i in range(chapters)]
+    rule_registry.put(RULE)
+    # 本地服务不限速
+    rate_limiter.set_host_rate("127.0.0.1", 0)
+    start_reactor()
+
+    managers = {
+        "scrapy": SpiderManager("scrapy"),
+        "httpx": SpiderManager("httpx"),
+    }
+    managers["scrapy"].service = CrawlerService(_settings())
+    managers["httpx"].service = AsyncFetcher()
+
+    results: Dict[str, List[float]] = {}
+    try:
+        for backend, manager in managers.items():
+            if isinstance(manager.service, CrawlerService):
+                # 爬虫服务的启动时间不计入结果
+                await manager.service.start()
+            results[f"{backend} 逐章下载"] = [await _serial(manager, book) for _ in range(rounds)]
+            results[f"{backend} 批量下载"] = [await _batch(manager, book) for _ in range(rounds)]
+            await manager.service.stop()
+    finally:
+        server.shutdown()
+
+    print(f"\n下载 {chapters} 章，每页响应延迟 {latency:.0f} ms")
+    for name, samples in results.items():
+        total = min(samples) / 1000
+        print(f"{name:<16}总耗时 {total:.2f}s  吞吐 {chapters / total:.1f} 章/s")
+    print_table("整本书下载耗时", results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="整本书章节下载基准测试")
+    parser.add_argument("-n", "--chapters", type=int, default=100, help="章节数")
+    parser.add_argument("-l", "--latency", type=float, default=50, help="每个页面的响应延迟（毫秒）")
+    parser.add_argument("-r", "--rounds", type=int, default=3, help="每种方式的下载次数")
+    args = parser.parse_args()
+    asyncio.run(main(args.chapters, args.latency, args.rounds))
@@ -0,0 +1,152 @@
+"""爬虫启动开销基准测试
+
+在本地HTTP服务上逐章抓取章节正文，对比每个页面新建一个Crawler（旧实现）、
+常驻爬虫服务投递请求和httpx异步抓取后端的单页耗时。Scrapy的两种方式使用相同的设置，
+关闭按域名限速和HTTP缓存，只比较爬虫本身的开销。
+
+运行方式（在backend目录下）:
+    python -m benchmarks.bench_crawler
+"""
+import time
+import asyncio
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List
+
+import scrapy
+from scrapy.crawler import CrawlerRunner
+from scrapy.http import Request, Response
+from scrapy.settings import Settings
+
+from benchmarks.common import print_table
+from utils.rule_registry import CompiledRule
+from spider.parsers import parse_chapter_content
+from spider.crawler_service import CrawlerService, project_settings, start_reactor, run_in_reactor
+from spider.async_fetcher import AsyncFetcher
+from spider.rate_limiter import rate_limiter
+
+# 模拟的章节页面
+CHAPTER_PAGE = (
+    "<html><head><title>第一章</title></head><body><h1>第一章</h1><div id='content'>"
+    + "".join(f"<p>第{i}段，这是用于基准测试的章节正文内容。</p>" for i in range(100))
+    + "</div></body></html>"
+).encode("utf-8")
+
+RULE = CompiledRule({
+    "id": 0, "name": "基准测试", "updated_at": None,
+    "chapter_list_rule": "#list a", "chapter_content_rule": "#content",
+})
+
+
+class _ChapterHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(CHAPTER_PAGE)))
+        self.end_headers()
+        self.wfile.write(CHAPTER_PAGE)
+
+    def log_message(self, *args):
+        pass
+
+
+class _OneShotSpider(scrapy.Spider):
+    """旧实现：每个页面一个爬虫"""
+    name = "bench_one_shot"
+
+    def __init__(self, url: str, results: List[str], *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.url = url
+        self.results = results
+
+    def start_requests(self):
+        yield Request(self.url, callback=self.parse, dont_filter=True)
+
+    def parse(self, response: Response):
+        self.results.append(parse_chapter_content(RULE, response.text, response.url))
+
+
+def _settings() -> Settings:
+    settings = project_settings()
+    settings.setdict({
+        "HTTPCACHE_ENABLED": False,
+        "TELNETCONSOLE_ENABLED": False,
+        "LOG_ENABLED": False,
+    }, priority="cmdline")
+    return settings
+
+
+async def _per_request_crawler(urls: List[str]) -> List[float]:
+    runner = CrawlerRunner(_settings())
+    samples = []
+    for url in urls:
+        results: List[str] = []
+        start = time.perf_counter()
+        await run_in_reactor(runner.crawl, _OneShotSpider, url=url, results=results)
+        samples.append((time.perf_counter() - start) * 1000)
+        assert results and results[0], "未解析到正文"
+    return samples
+
+
+async def _persistent_service(urls: List[str]) -> List[float]:
+    service = CrawlerService(_settings())
+    await service.start()
+    samples = []
+    try:
+        for url in urls:
+            start = time.perf_counter()
+            content = await service.fetch("content", url, RULE)
+            samples.append((time.perf_counter() - start) * 1000)
+            assert content, "未解析到正文"
+    finally:
+        await service.stop()
+    return samples
+
+
+async def _async_fetcher(urls: List[str]) -> List[float]:
+    fetcher = AsyncFetcher()
+    samples = []
+    try:
+        for url in urls:
+            start = time.perf_counter()
+            content = await fetcher.fetch("content", url, RULE)
+            samples.append((time.perf_counter() - start) * 1000)
+            assert content, "未解析到正文"
+    finally:
+        await fetcher.stop()
+    return samples
+
+
+async def main(pages: int) -> None:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _ChapterHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    urls = [f"http://127.0.0.1:{server.server_port}/chapter/{i}" for i in range(pages)]
+    start_reactor()
+    # 本地服务不限速
+    rate_limiter.set_host_rate("127.0.0.1", 0)
+
+    try:
+        legacy = await _per_request_crawler(urls)
+        service = await _persistent_service(urls)
+        fetcher = await _async_fetcher(urls)
+    finally:
+        server.shutdown()
+
+    print(f"\n逐章抓取 {pages} 个页面")
+    results = {
+        "每页新建Crawler": legacy,
+        "常驻爬虫服务": service,
+        "httpx异步抓取": fetcher,
+    }
+    for name, samples in results.items():
+        total = sum(samples) / 1000
+        print(f"{name:<20}总耗时 {total:.2f}s  吞吐 {pages / total:.1f} 页/s")
+    print_table("单页耗时", results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="爬虫启动开销基准测试")
+    parser.add_argument("-n", "--pages", type=int, default=50, help="抓取的页面数")
+    args = parser.parse_args()
+    asyncio.run(main(args.pages))
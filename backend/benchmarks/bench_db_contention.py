@@ -0,0 +1,169 @@
+"""数据库写入争用基准测试
+
+模拟N个小说同时下载章节正文，并伴随阅读器不断上报阅读进度和读取章节，
+对比各连接独立提交（旧实现）与单写协程组提交的写入吞吐、延迟和锁错误数。
+
+运行方式（在backend目录下）:
+    python -m benchmarks.bench_db_contention
+"""
+import time
+import asyncio
+import argparse
+import sqlite3
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List
+
+from benchmarks.common import use_temp_database, print_table
+from database import init_db, crud
+from database.pool import db_pool, ConnectionPool
+from database.writer import db_writer
+from database.content_store import save_content
+from database.models import NovelCreate, ChapterCreate, HistoryCreate
+
+# 模拟的章节正文
+CHAPTER_TEXT = "\n".join(f"第{i}段，这是用于基准测试的章节正文内容。" for i in range(200))
+
+
+async def _prepare(downloads: int, chapters: int) -> List[List[int]]:
+    """为每个下载任务创建一本小说及其章节目录"""
+    catalogs = []
+    for d in range(downloads):
+        novel_id = await crud.create_novel(NovelCreate(title=f"争用测试{d}", author="bench"))
+        await crud.create_chapters_bulk([
+            ChapterCreate(novel_id=novel_id, title=f"第{i + 1}章", chapter_index=i,
+                          source_url=f"https://example.com/{novel_id}/{i}")
+            for i in range(chapters)
+        ])
+        catalogs.append([chapter['id'] for chapter in await crud.get_novel_chapters(novel_id)])
+    return catalogs
+
+
+async def _run_workload(
+    catalogs: List[List[int]],
+    readers: int,
+    write_chapter: Callable[[int], Awaitable],
+    write_history: Callable[[HistoryCreate], Awaitable],
+) -> Dict[str, object]:
+    """并发执行下载、进度上报和读取，返回耗时样本"""
+    write_samples: List[float] = []
+    read_samples: List[float] = []
+    errors = {"locked": 0}
+    finished = asyncio.Event()
+
+    async def timed(samples: List[float], call: Callable[[], Awaitable]) -> None:
+        start = time.perf_counter()
+        try:
+            await call()
+        except sqlite3.OperationalError as e:
+            if "locked" not in str(e):
+                raise
+            errors["locked"] += 1
+        samples.append((time.perf_counter() - start) * 1000)
+
+    async def download(chapter_ids: List[int]) -> None:
+        for chapter_id in chapter_ids:
+            await timed(write_samples, lambda: write_chapter(chapter_id))
+
+    async def reader(index: int) -> None:
+        chapter_ids = catalogs[index % len(catalogs)]
+        novel_id = (await crud.get_chapter(chapter_ids[0]))['novel_id']
+        position = 0
+        while not finished.is_set():
+            position += 1
+            chapter_id = chapter_ids[position % len(chapter_ids)]
+            await timed(read_samples, lambda: crud.get_chapter(chapter_id))
+            await timed(write_samples, lambda: write_history(
+                HistoryCreate(novel_id=novel_id, chapter_id=chapter_id, read_position=position)
+            ))
+
+    start = time.perf_counter()
+    reader_tasks = [asyncio.create_task(reader(i)) for i in range(readers)]
+    await asyncio.gather(*(download(chapter_ids) for chapter_ids in catalogs))
+    elapsed = time.perf_counter() - start
+    finished.set()
+    await asyncio.gather(*reader_tasks)
+
+    return {
+        "elapsed": elapsed,
+        "writes": write_samples,
+        "reads": read_samples,
+        "locked": errors["locked"],
+    }
+
+
+async def _legacy(catalogs: List[List[int]], readers: int, pool_size: int) -> Dict[str, object]:
+    """旧实现：每个写操作借出一个可写连接并各自提交"""
+    pool = ConnectionPool(size=pool_size)
+    await pool.open()
+
+    async def write_chapter(chapter_id: int) -> None:
+        async with pool.acquire() as conn:
+            await save_content(conn, chapter_id, CHAPTER_TEXT)
+            await conn.execute("UPDATE chapters SET is_downloaded = 1 WHERE id = ?", (chapter_id,))
+            await conn.commit()
+
+    async def write_history(history: HistoryCreate) -> None:
+        async with pool.acquire() as conn:
+            await crud._upsert_history(conn, history, datetime.now())
+            await conn.commit()
+
+    try:
+        return await _run_workload(catalogs, readers, write_chapter, write_history)
+    finally:
+        await pool.close()
+
+
+async def _single_writer(catalogs: List[List[int]], readers: int) -> Dict[str, object]:
+    """新实现：所有写操作经由单写协程组提交"""
+    return await _run_workload(
+        catalogs, readers,
+        lambda chapter_id: crud.update_chapter_content(chapter_id, CHAPTER_TEXT),
+        crud.add_history,
+    )
+
+
+async def _fresh_database(downloads: int, chapters: int) -> List[List[int]]:
+    """每种实现使用独立的新数据库，避免WAL文件大小等状态影响结果"""
+    use_temp_database()
+    await init_db.init_db()
+    await db_pool.open()
+    await db_writer.open()
+    return await _prepare(downloads, chapters)
+
+
+async def _shutdown() -> None:
+    await db_writer.close()
+    await db_pool.close()
+
+
+async def main(downloads: int, chapters: int, readers: int) -> None:
+    catalogs = await _fresh_database(downloads, chapters)
+    legacy = await _legacy(catalogs, readers, db_pool.size)
+    await _shutdown()
+
+    catalogs = await _fresh_database(downloads, chapters)
+    writer = await _single_writer(catalogs, readers)
+    await _shutdown()
+
+    total = downloads * chapters
+    print(f"\n{downloads} 个下载任务 x {chapters} 章，{readers} 个阅读器")
+    for name, result in (("各连接独立提交", legacy), ("单写协程组提交", writer)):
+        print(f"{name:<20}下载耗时 {result['elapsed']:.2f}s  "
+              f"吞吐 {total / result['elapsed']:.0f} 章/s  锁错误 {result['locked']}")
+    print_table("写操作延迟", {
+        "各连接独立提交": legacy["writes"],
+        "单写协程组提交": writer["writes"],
+    })
+    print_table("读操作延迟", {
+        "各连接独立提交": legacy["reads"],
+        "单写协程组提交": writer["reads"],
+    })
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="数据库写入争用基准测试")
+    parser.add_argument("-d", "--downloads", type=int, default=8, help="并发下载任务数")
+    parser.add_argument("-c", "--chapters", type=int, default=100, help="每个任务下载的章节数")
+    parser.add_argument("-r", "--readers", type=int, default=4, help="并发阅读器数")
+    args = parser.parse_args()
+    asyncio.run(main(args.downloads, args.chapters, args.readers))
@@ -0,0 +1,64 @@
+"""数据库连接池基准测试
+
+对比每次调用新建连接（旧实现）与连接池借出连接的单次调用延迟。
+
+运行方式（在backend目录下）:
+    python -m benchmarks.bench_db_pool
+"""
+import asyncio
+import argparse
+
+import aiosqlite
+
+from benchmarks.common import use_temp_database, measure, print_table
+from database import init_db, crud
+from database.pool import db_pool
+from database.writer import db_writer
+from database.models import NovelCreate, ChapterCreate
+
+
+async def _legacy_get_chapter(chapter_id: int):
+    """旧实现：每次调用打开并关闭一个新连接"""
+    conn = await aiosqlite.connect(init_db.DB_PATH)
+    await conn.execute("PRAGMA foreign_keys = ON")
+    conn.row_factory = aiosqlite.Row
+    try:
+        cursor = await conn.execute("SELECT * FROM chapters WHERE id = ?", (chapter_id,))
+        result = await cursor.fetchone()
+        return dict(result) if result else None
+    finally:
+        await conn.close()
+
+
+async def main(iterations: int) -> None:
+    use_temp_database()
+    await init_db.init_db()
+
+    novel_id = await crud.create_novel(NovelCreate(title="基准测试小说", author="bench"))
+    chapter_id = await crud.create_chapter(ChapterCreate(
+        novel_id=novel_id,
+        title="第一章",
+        chapter_index=0,
+        content="正文" * 2000,
+        is_downloaded=True
+    ))
+    await db_writer.close()
+    await db_pool.close()
+
+    legacy = await measure(lambda: _legacy_get_chapter(chapter_id), iterations)
+
+    await db_pool.open()
+    pooled = await measure(lambda: crud.get_chapter(chapter_id), iterations)
+    await db_pool.close()
+
+    print_table(f"get_chapter 单次调用延迟 ({iterations} 次)", {
+        "每次新建连接": legacy,
+        "连接池": pooled,
+    })
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="数据库连接池基准测试")
+    parser.add_argument("-n", "--iterations", type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(main(args.iterations))
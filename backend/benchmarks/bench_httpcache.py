@@ -0,0 +1,157 @@
+"""HTTP缓存存储基准测试
+
+用benchmarks/fixtures中的详情、目录和正文页面生成大量不同URL的响应，分别写入
+Scrapy内置的FilesystemCacheStorage（原实现，含HTTPCACHE_GZIP压缩）和spider/httpcache.py
+中的SqliteCacheStorage，对比写入耗时、命中和未命中的查找耗时，以及缓存目录的磁盘占用和文件数。
+最后以小于数据总量的HTTPCACHE_MAX_BYTES写入同样的页面，检查淘汰后占用不超过容量。
+
+运行方式（在backend目录下）:
+    python -m benchmarks.bench_httpcache
+"""
+import os
+import time
+import random
+import shutil
+import argparse
+import tempfile
+from typing import Dict, List, Tuple
+
+from loguru import logger
+from scrapy import Spider
+from scrapy.http import HtmlResponse, Request
+from scrapy.utils.misc import load_object
+from scrapy.utils.test import get_crawler
+
+from benchmarks.common import print_table
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+# 页面文件 -> 在生成的页面中所占的比例，整本书缓存中绝大多数是正文页
+PAGES = {
+    "chapter.html": 0.9,
+    "catalog.html": 0.05,
+    "detail.html": 0.05,
+}
+
+# 存储名称 -> (存储类, 额外设置)
+STORAGES = {
+    "filesystem": ("scrapy.extensions.httpcache.FilesystemCacheStorage", {}),
+    "filesystem+gzip": ("scrapy.extensions.httpcache.FilesystemCacheStorage", {"HTTPCACHE_GZIP": True}),
+    "sqlite": ("spider.httpcache.SqliteCacheStorage", {"HTTPCACHE_MAX_BYTES": 0}),
+}
+
+
+def _responses(count: int) -> List[Tuple[Request, HtmlResponse]]:
+    """按比例生成不同URL的响应，正文中加入序号使每个页面内容不同"""
+    bodies = {}
+    for name in PAGES:
+        with open(os.path.join(FIXTURES_DIR, name), "rb") as f:
+            bodies[name] = f.read()
+    names = random.Random(0).choices(list(PAGES), weights=list(PAGES.values()), k=count)
+    pairs = []
+    for i, name in enumerate(names):
+        url = f"https://www.example.com/book/{i // 1000}/{i}.html"
+        body = bodies[name].replace(b"</body>", f"<!-- {i} --></body>".encode())
+        headers = {"Content-Type": "text/html; charset=utf-8", "Server": "nginx"}
+        pairs.append((Request(url), HtmlResponse(url, status=200, headers=headers, body=body)))
+    return pairs
+
+
+def _disk_usage(path: str) -> Tuple[int, int]:
+    """目录下所有文件实际占用的磁盘字节数和文件数"""
+    used, files = 0, 0
+    for root, _, names in os.walk(path):
+        for name in names:
+            used += os.stat(os.path.join(root, name)).st_blocks * 512
+            files += 1
+    return used, files
+
+
+def _open(storage_path: str, extra: Dict, cache_dir: str):
+    crawler = get_crawler(Spider, {
+        "HTTPCACHE_DIR": cache_dir,
+        "HTTPCACHE_STORAGE": storage_path,
+        "HTTPCACHE_EXPIRATION_SECS": 0,
+        **extra,
+    })
+    spider = Spider.from_crawler(crawler, name="bench")
+    storage = load_object(storage_path)(crawler.settings)
+    storage.open_spider(spider)
+    return storage, spider
+
+
+def _run(name: str, pairs, lookups: int) -> Dict[str, object]:
+    storage_path, extra = STORAGES[name]
+    cache_dir = tempfile.mkdtemp(prefix="localbooks_httpcache_")
+    try:
+        storage, spider = _open(storage_path, extra, cache_dir)
+        start = time.perf_counter()
+        for request, response in pairs:
+            storage.store_response(spider, request, response)
+        store_seconds = time.perf_counter() - start
+
+        rng = random.Random(1)
+        hits, misses = [], []
+        for _ in range(lookups):
+            request, response = rng.choice(pairs)
+            start = time.perf_counter()
+            cached = storage.retrieve_response(spider, request)
+            hits.append((time.perf_counter() - start) * 1000)
+            assert cached is not None and cached.body == response.body, "缓存内容不一致"
+
+            missing = Request(f"https://www.example.com/missing/{rng.random()}")
+            start = time.perf_counter()
+            assert storage.retrieve_response(spider, missing) is None, "不应命中"
+            misses.append((time.perf_counter() - start) * 1000)
+        storage.close_spider(spider)
+
+        used, files = _disk_usage(cache_dir)
+        return {"store": store_seconds, "hits": hits, "misses": misses, "used": used, "files": files}
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+def _run_with_budget(pairs, budget: int) -> Tuple[int, int]:
+    """以给定容量写入所有页面，返回(磁盘占用, 仍在缓存中的页面数)"""
+    cache_dir = tempfile.mkdtemp(prefix="localbooks_httpcache_")
+    try:
+        storage, spider = _open(STORAGES["sqlite"][0], {"HTTPCACHE_MAX_BYTES": budget}, cache_dir)
+        for request, response in pairs:
+            storage.store_response(spider, request, response)
+        kept = sum(storage.retrieve_response(spider, request) is not None for request, _ in pairs)
+        storage.close_spider(spider)
+        return _disk_usage(cache_dir)[0], kept
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+def main(pages: int, lookups: int, budget_mb: float) -> None:
+    # 淘汰时记录日志，测试时关闭
+    logger.disable("spider")
+    pairs = _responses(pages)
+    raw = sum(len(response.body) for _, response in pairs)
+    print(f"\n{pages} 个页面，正文共 {raw / 1024 / 1024:.1f} MB")
+
+    lookup_rows: Dict[str, List[float]] = {}
+    for name in STORAGES:
+        result = _run(name, pairs, lookups)
+        lookup_rows[f"{name} 命中"] = result["hits"]
+        lookup_rows[f"{name} 未命中"] = result["misses"]
+        print(
+            f"{name:<18}写入 {result['store']:.2f}s  磁盘占用 {result['used'] / 1024 / 1024:.1f} MB  "
+            f"文件数 {result['files']}"
+        )
+    print_table("缓存查找耗时", lookup_rows)
+
+    budget = int(budget_mb * 1024 * 1024)
+    used, kept = _run_with_budget(pairs, budget)
+    print(f"\n容量 {budget_mb:.0f} MB: 磁盘占用 {used / 1024 / 1024:.1f} MB，保留最近的 {kept}/{pages} 个页面")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="HTTP缓存存储基准测试")
+    parser.add_argument("-n", "--pages", type=int, default=5000, help="页面数")
+    parser.add_argument("-l", "--lookups", type=int, default=2000, help="查找次数")
+    parser.add_argument("-b", "--budget", type=float, default=8, help="淘汰测试的缓存容量（MB）")
+    args = parser.parse_args()
+    main(args.pages, args.lookups, args.budget)
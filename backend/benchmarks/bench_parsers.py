@@ -0,0 +1,72 @@
+"""页面解析引擎基准测试
+
+用benchmarks/fixtures中保存的搜索结果、详情、目录和正文页面，对比各解析引擎的耗时，
+并检查解析结果与BeautifulSoup（原实现）完全一致。
+
+运行方式（在backend目录下）:
+    python -m benchmarks.bench_parsers
+"""
+import os
+import json
+import time
+import argparse
+from typing import Dict, List
+
+from loguru import logger
+
+from benchmarks.common import print_table
+from utils.rule_registry import CompiledRule
+from spider.parsers import PARSERS
+from spider.html_engines import available_engines, create_engine
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+# 页面文件 -> (解析任务类型, 任务参数)
+CASES = {
+    "search.html": ("search", {}),
+    "detail.html": ("detail", {}),
+    "catalog.html": ("chapters", {"novel_id": 1}),
+    "chapter.html": ("content", {}),
+}
+
+BASE_URL = "https://www.example.com/book/1001/"
+
+
+def main(rounds: int) -> None:
+    # 解析函数每次都会记录日志，测试时关闭
+    logger.disable("spider")
+
+    with open(os.path.join(FIXTURES_DIR, "rule.json"), encoding="utf-8") as f:
+        rule = CompiledRule(json.load(f))
+    engines = {name: create_engine(name) for name in available_engines()}
+
+    mismatches = []
+    for page, (kind, params) in CASES.items():
+        with open(os.path.join(FIXTURES_DIR, page), encoding="utf-8") as f:
+            html = f.read()
+        parse = PARSERS[kind]
+        expected = parse(rule, html, BASE_URL, engine=engines["bs4"], **params)
+
+        rows: Dict[str, List[float]] = {}
+        for name, engine in engines.items():
+            if parse(rule, html, BASE_URL, engine=engine, **params) != expected:
+                mismatches.append(f"{page} / {name}")
+            samples = []
+            for _ in range(rounds):
+                start = time.perf_counter()
+                parse(rule, html, BASE_URL, engine=engine, **params)
+                samples.append((time.perf_counter() - start) * 1000)
+            rows[name] = samples
+        print_table(f"{page}（{len(html) // 1024} KB，{kind}）", rows)
+
+    if mismatches:
+        print(f"\n解析结果与BeautifulSoup不一致: {', '.join(mismatches)}")
+    else:
+        print("\n所有引擎的解析结果与BeautifulSoup一致")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="页面解析引擎基准测试")
+    parser.add_argument("-n", "--rounds", type=int, default=20, help="每个页面的解析次数")
+    args = parser.parse_args()
+    main(args.rounds)
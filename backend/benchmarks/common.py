@@ -0,0 +1,44 @@
+import os
+import time
+import tempfile
+import statistics
+from typing import Awaitable, Callable, Dict, List
+
+from database import init_db
+
+
+def use_temp_database() -> str:
+    """将数据库切换到临时文件，避免基准测试污染真实数据"""
+    tmp_dir = tempfile.mkdtemp(prefix="localbooks_bench_")
+    init_db.DB_PATH = os.path.join(tmp_dir, "bench.db")
+    return init_db.DB_PATH
+
+
+async def measure(func: Callable[[], Awaitable], iterations: int) -> List[float]:
+    """重复执行异步函数，返回每次耗时（毫秒）"""
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        await func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """计算耗时统计"""
+    ordered = sorted(samples)
+    return {
+        "mean": statistics.mean(ordered),
+        "p50": ordered[len(ordered) // 2],
+        "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        "max": ordered[-1],
+    }
+
+
+def print_table(title: str, rows: Dict[str, List[float]]) -> None:
+    """打印对比结果"""
+    print(f"\n{title}")
+    print(f"{'场景':<28}{'mean(ms)':>10}{'p50(ms)':>10}{'p95(ms)':>10}{'max(ms)':>10}")
+    for name, samples in rows.items():
+        s = summarize(samples)
+        print(f"{name:<28}{s['mean']:>10.3f}{s['p50']:>10.3f}{s['p95']:>10.3f}{s['max']:>10.3f}")
@@ -0,0 +1,286 @@
+"""数据库在线备份
+
+使用SQLite备份API在服务运行期间复制数据库，每步复制BACKUP_PAGES_PER_STEP个页面，
+步与步之间让出数据库，不会长时间阻塞读写。复制结果按BACKUP_CHUNK_SIZE切块，
+以内容的SHA-256命名压缩保存，各快照共享相同的块，每次快照只新增发生变化的块。
+
+运行方式（在backend目录下）:
+    python -m database.backup create
+    python -m database.backup list
+    python -m database.backup restore <快照名> <目标文件>
+"""
+import os
+import re
+import sys
+import json
+import zlib
+import asyncio
+import hashlib
+import sqlite3
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Set
+
+from loguru import logger
+from dotenv import load_dotenv
+
+from database import init_db
+
+# 加载环境变量
+load_dotenv()
+
+# 备份目录，默认为数据库所在目录下的backups
+BACKUP_DIR = os.getenv("BACKUP_DIR", "")
+
+# 备份API每步复制的页面数
+BACKUP_PAGES_PER_STEP = int(os.getenv("BACKUP_PAGES_PER_STEP", "1024"))
+
+# 每步之间让出数据库的时间（秒）
+BACKUP_STEP_SLEEP = float(os.getenv("BACKUP_STEP_SLEEP", "0.01"))
+
+# 快照切块大小（字节），只有发生变化的块会被重新保存
+BACKUP_CHUNK_SIZE = int(os.getenv("BACKUP_CHUNK_SIZE", str(1024 * 1024)))
+
+# 快照名格式，同时用于校验接口传入的名称
+SNAPSHOT_NAME = re.compile(r"^\d{8}-\d{6}-\d{6}$")
+
+
+def backup_dir() -> str:
+    """备份目录"""
+    return BACKUP_DIR or os.path.join(os.path.dirname(os.path.abspath(init_db.DB_PATH)), "backups")
+
+
+class BackupManager:
+    """数据库快照的创建、列出、删除、导出和恢复
+
+    快照由snapshots目录下的清单文件和chunks目录下的数据块组成，清单按顺序记录数据块的哈希。
+    文件读写和备份复制在线程池中执行，不阻塞事件循环。
+    """
+
+    def __init__(self):
+        # 创建和删除快照互斥，避免删除时回收正在写入的快照所用的块
+        self._lock = asyncio.Lock()
+
+    async def create_snapshot(self) -> Dict:
+        """创建快照，返回快照信息"""
+        async with self._lock:
+            return await asyncio.get_running_loop().run_in_executor(None, self._create_snapshot)
+
+    async def list_snapshots(self) -> List[Dict]:
+        """列出所有快照，最新的在前"""
+        return await asyncio.get_running_loop().run_in_executor(None, self._list_snapshots)
+
+    async def delete_snapshot(self, name: str) -> bool:
+        """删除快照并回收不再被引用的数据块，快照不存在时返回False"""
+        async with self._lock:
+            return await asyncio.get_running_loop().run_in_executor(None, self._delete_snapshot, name)
+
+    async def get_snapshot(self, name: str) -> Optional[Dict]:
+        """获取快照信息，快照不存在时返回None"""
+        manifest = await asyncio.get_running_loop().run_in_executor(None, self._load_manifest, name)
+        return self._summary(manifest) if manifest else None
+
+    async def export_snapshot(self, name: str) -> AsyncIterator[bytes]:
+        """以gzip格式流式导出快照，解压后即为完整的数据库文件"""
+        loop = asyncio.get_running_loop()
+        manifest = await loop.run_in_executor(None, self._load_manifest, name)
+        if manifest is None:
+            raise FileNotFoundError(f"快照不存在: {name}")
+
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        for digest in manifest['chunks']:
+            block = await loop.run_in_executor(None, self._read_chunk, digest)
+            data = compressor.compress(block)
+            if data:
+                yield data
+        yield compressor.flush()
+
+    async def restore_snapshot(self, name: str, target_path: str) -> int:
+        """将快照还原为数据库文件，返回写入的字节数；不能还原到正在使用的数据库"""
+        return await asyncio.get_running_loop().run_in_executor(None, self._restore_snapshot, name, target_path)
+
+    # 以下方法在线程池中执行
+
+    def _create_snapshot(self) -> Dict:
+        root = backup_dir()
+        os.makedirs(os.path.join(root, "snapshots"), exist_ok=True)
+        os.makedirs(os.path.join(root, "chunks"), exist_ok=True)
+
+        created_at = datetime.now()
+        name = created_at.strftime("%Y%m%d-%H%M%S-%f")
+        copy_path = os.path.join(root, f"{name}.tmp")
+        try:
+            pages = self._copy_database(copy_path)
+            chunks = []
+            new_chunks = 0
+            stored_bytes = 0
+            with open(copy_path, "rb") as f:
+                while True:
+                    block = f.read(BACKUP_CHUNK_SIZE)
+                    if not block:
+                        break
+                    digest = hashlib.sha256(block).hexdigest()
+                    written = self._write_chunk(digest, block)
+                    if written:
+                        new_chunks += 1
+                        stored_bytes += written
+                    chunks.append(digest)
+            manifest = {
+                "name": name,
+                "created_at": created_at.isoformat(),
+                "size": os.path.getsize(copy_path),
+                "pages": pages,
+                "chunk_size": BACKUP_CHUNK_SIZE,
+                "new_chunks": new_chunks,
+                "stored_bytes": stored_bytes,
+                "chunks": chunks,
+            }
+            self._write_file(self._manifest_path(name), json.dumps(manifest).encode("utf-8"))
+        finally:
+            for path in (copy_path, f"{copy_path}-journal"):
+                if os.path.exists(path):
+                    os.remove(path)
+
+        logger.info(f"已创建数据库快照 {name}: {len(chunks)} 个块，其中新增 {new_chunks} 个")
+        return self._summary(manifest)
+
+    def _copy_database(self, target_path: str) -> int:
+        """用备份API分步复制数据库，返回复制的页面数"""
+        source = sqlite3.connect(init_db.DB_PATH, timeout=30, isolation_level=None)
+        try:
+            # 在源连接上保持一个读事务：WAL模式下不阻塞其他连接的读写，
+            # 其他连接的写入也不会使备份从头开始，得到的是开始时刻的一致快照
+            source.execute("BEGIN")
+            source.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+            target = sqlite3.connect(target_path)
+            try:
+                source.backup(target, pages=BACKUP_PAGES_PER_STEP, sleep=BACKUP_STEP_SLEEP)
+                # 快照保存为单个文件，不依赖WAL文件
+                target.execute("PRAGMA journal_mode = DELETE")
+                return target.execute("PRAGMA page_count").fetchone()[0]
+            finally:
+                target.close()
+                source.execute("COMMIT")
+        finally:
+            source.close()
+
+    def _list_snapshots(self) -> List[Dict]:
+        snapshots = []
+        for name in self._snapshot_names():
+            manifest = self._load_manifest(name)
+            if manifest:
+                snapshots.append(self._summary(manifest))
+        return snapshots
+
+    def _delete_snapshot(self, name: str) -> bool:
+        if self._load_manifest(name) is None:
+            return False
+        os.remove(self._manifest_path(name))
+
+        # 回收不再被任何快照引用的数据块
+        referenced: Set[str] = set()
+        for other in self._snapshot_names():
+            manifest = self._load_manifest(other)
+            if manifest:
+                referenced.update(manifest['chunks'])
+        removed = 0
+        chunks_dir = os.path.join(backup_dir(), "chunks")
+        for dirpath, _, filenames in os.walk(chunks_dir):
+            for filename in filenames:
+                if filename not in referenced:
+                    os.remove(os.path.join(dirpath, filename))
+                    removed += 1
+        logger.info(f"已删除数据库快照 {name}，回收 {removed} 个数据块")
+        return True
+
+    def _restore_snapshot(self, name: str, target_path: str) -> int:
+        if os.path.abspath(target_path) == os.path.abspath(init_db.DB_PATH):
+            raise ValueError("不能还原到正在使用的数据库，请先还原到其他文件再替换")
+        manifest = self._load_manifest(name)
+        if manifest is None:
+            raise FileNotFoundError(f"快照不存在: {name}")
+
+        temp_path = f"{target_path}.tmp"
+        written = 0
+        with open(temp_path, "wb") as f:
+            for digest in manifest['chunks']:
+                block = self._read_chunk(digest)
+                if hashlib.sha256(block).hexdigest() != digest:
+                    raise ValueError(f"数据块校验失败: {digest}")
+                f.write(block)
+                written += len(block)
+        os.replace(temp_path, target_path)
+        logger.info(f"已将快照 {name} 还原到 {target_path}")
+        return written
+
+    def _snapshot_names(self) -> List[str]:
+        snapshots_dir = os.path.join(backup_dir(), "snapshots")
+        if not os.path.isdir(snapshots_dir):
+            return []
+        names = [filename[:-len(".json")] for filename in os.listdir(snapshots_dir) if filename.endswith(".json")]
+        return sorted((name for name in names if SNAPSHOT_NAME.match(name)), reverse=True)
+
+    def _load_manifest(self, name: str) -> Optional[Dict]:
+        if not SNAPSHOT_NAME.match(name):
+            return None
+        try:
+            with open(self._manifest_path(name), "rb") as f:
+                return json.loads(f.read())
+        except FileNotFoundError:
+            return None
+
+    def _manifest_path(self, name: str) -> str:
+        return os.path.join(backup_dir(), "snapshots", f"{name}.json")
+
+    def _chunk_path(self, digest: str) -> str:
+        return os.path.join(backup_dir(), "chunks", digest[:2], digest)
+
+    def _read_chunk(self, digest: str) -> bytes:
+        with open(self._chunk_path(digest), "rb") as f:
+            return zlib.decompress(f.read())
+
+    def _write_chunk(self, digest: str, block: bytes) -> int:
+        """保存数据块，已存在时跳过，返回写入的字节数"""
+        path = self._chunk_path(digest)
+        if os.path.exists(path):
+            return 0
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = zlib.compress(block)
+        self._write_file(path, data)
+        return len(data)
+
+    @staticmethod
+    def _write_file(path: str, data: bytes) -> None:
+        """先写临时文件再替换，中途失败不会留下不完整的文件"""
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+
+    @staticmethod
+    def _summary(manifest: Dict) -> Dict:
+        """快照信息，不含数据块列表"""
+        summary = {key: value for key, value in manifest.items() if key != "chunks"}
+        summary["chunks"] = len(manifest["chunks"])
+        return summary
+
+
+# 全局备份管理实例
+backup_manager = BackupManager()
+
+
+async def main(args: List[str]) -> int:
+    if args[:1] == ["create"]:
+        print(json.dumps(await backup_manager.create_snapshot(), ensure_ascii=False, indent=2))
+    elif args[:1] == ["list"]:
+        for snapshot in await backup_manager.list_snapshots():
+            print(f"{snapshot['name']}  {snapshot['size']} 字节  新增 {snapshot['new_chunks']}/{snapshot['chunks']} 块")
+    elif args[:1] == ["restore"] and len(args) == 3:
+        print(f"已写入 {await backup_manager.restore_snapshot(args[1], args[2])} 字节")
+    else:
+        print(__doc__)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(sys.argv[1:])))
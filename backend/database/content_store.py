@@ -0,0 +1,381 @@
+import html
+import json
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+import aiosqlite
+from loguru import logger
+
+# 章节正文压缩算法
+CODEC_ZLIB = "zlib"
+CODEC_RAW = "raw"
+
+# zlib压缩级别，6为速度与压缩率的折中
+ZLIB_LEVEL = 6
+
+# 迁移旧数据时每批处理的章节数
+MIGRATE_BATCH_SIZE = 200
+
+# 正文全文索引按段落建立，rowid = 章节ID * PARAGRAPH_SLOTS + 段落序号
+PARAGRAPH_SLOTS = 1 << 16
+
+# 搜索摘要中关键词前后保留的字符数
+SNIPPET_CONTEXT = 30
+
+# 关键词过短无法使用trigram索引时，逐章解压扫描的章节数上限
+SCAN_MAX_CHAPTERS = 5000
+
+
+def compress_content(content: str) -> Tuple[str, bytes, int]:
+    """压缩章节正文，返回(算法, 数据, 原始字节数)"""
+    raw = content.encode("utf-8")
+    return CODEC_ZLIB, zlib.compress(raw, ZLIB_LEVEL), len(raw)
+
+
+def decompress_content(codec: str, data: bytes) -> str:
+    """解压章节正文"""
+    if codec == CODEC_ZLIB:
+        return zlib.decompress(data).decode("utf-8")
+    if codec == CODEC_RAW:
+        return bytes(data).decode("utf-8")
+    raise ValueError(f"未知的章节内容压缩算法: {codec}")
+
+
+def split_paragraphs(content: str) -> List[str]:
+    """将正文拆分为段落，超出索引容量的段落合并到最后一段"""
+    paragraphs = [line.strip() for line in content.split('\n') if line.strip()]
+    if len(paragraphs) > PARAGRAPH_SLOTS:
+        paragraphs = paragraphs[:PARAGRAPH_SLOTS - 1] + [' '.join(paragraphs[PARAGRAPH_SLOTS - 1:])]
+    return paragraphs
+
+
+def paragraphs_json(codec: str, data: bytes) -> str:
+    """SQL函数chapter_paragraphs：解压正文并拆分为段落，返回JSON数组，供删除章节的触发器移出索引"""
+    return json.dumps(split_paragraphs(decompress_content(codec, data)), ensure_ascii=False)
+
+
+async def register_functions(conn: aiosqlite.Connection) -> None:
+    """在连接上注册正文索引使用的函数"""
+    await conn.create_function("chapter_paragraphs", 2, paragraphs_json, deterministic=True)
+
+
+def book_marker(novel_id: int) -> str:
+    """全文索引中用于按小说过滤的标记"""
+    return f"<{novel_id}>"
+
+
+def build_snippet(paragraph: str, keyword: str) -> Tuple[int, str]:
+    """在段落中定位关键词，返回(字符位置, 高亮摘要)"""
+    offset = paragraph.lower().find(keyword.lower())
+    if offset < 0:
+        return 0, html.escape(paragraph[:SNIPPET_CONTEXT * 2])
+    start = max(0, offset - SNIPPET_CONTEXT)
+    end = min(len(paragraph), offset + len(keyword) + SNIPPET_CONTEXT)
+    snippet = (
+        ("…" if start > 0 else "")
+        + html.escape(paragraph[start:offset])
+        + "<mark>" + html.escape(paragraph[offset:offset + len(keyword)]) + "</mark>"
+        + html.escape(paragraph[offset + len(keyword):end])
+        + ("…" if end < len(paragraph) else "")
+    )
+    return offset, snippet
+
+
+async def _index_paragraphs(
+    conn: aiosqlite.Connection, chapter_id: int, novel_id: int, content: str, delete: bool = False
+) -> None:
+    """将章节正文按段落写入（或移出）全文索引"""
+    marker = book_marker(novel_id)
+    rows = [
+        (chapter_id * PARAGRAPH_SLOTS + index, paragraph, marker)
+        for index, paragraph in enumerate(split_paragraphs(content))
+    ]
+    if delete:
+        # 无内容索引表删除时必须提供与写入时相同的值
+        await conn.executemany(
+            """
+            INSERT INTO chapter_paragraphs_fts (chapter_paragraphs_fts, rowid, text, book)
+            VALUES ('delete', ?, ?, ?)
+            """,
+            rows
+        )
+    else:
+        await conn.executemany(
+            "INSERT INTO chapter_paragraphs_fts (rowid, text, book) VALUES (?, ?, ?)",
+            rows
+        )
+
+
+async def save_content(conn: aiosqlite.Connection, chapter_id: int, content: str) -> None:
+    """写入章节正文并增量更新全文索引，调用方负责提交事务"""
+    cursor = await conn.execute(
+        """
+        SELECT c.novel_id, cc.codec, cc.data
+        FROM chapters c
+        LEFT JOIN chapter_contents cc ON cc.chapter_id = c.id
+        WHERE c.id = ?
+        """,
+        (chapter_id,)
+    )
+    row = await cursor.fetchone()
+    if not row:
+        return
+    if row['data'] is not None:
+        await _index_paragraphs(
+            conn, chapter_id, row['novel_id'], decompress_content(row['codec'], row['data']), delete=True
+        )
+    await _index_paragraphs(conn, chapter_id, row['novel_id'], content)
+
+    codec, data, raw_size = compress_content(content)
+    await conn.execute(
+        """
+        INSERT INTO chapter_contents (chapter_id, codec, data, raw_size)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(chapter_id) DO UPDATE SET
+            codec = excluded.codec,
+            data = excluded.data,
+            raw_size = excluded.raw_size,
+            updated_at = CURRENT_TIMESTAMP
+        """,
+        (chapter_id, codec, data, raw_size)
+    )
+
+
+async def delete_content(conn: aiosqlite.Connection, chapter_id: int) -> None:
+    """删除章节正文并将其移出全文索引，调用方负责提交事务"""
+    cursor = await conn.execute(
+        """
+        SELECT c.novel_id, cc.codec, cc.data
+        FROM chapter_contents cc
+        JOIN chapters c ON c.id = cc.chapter_id
+        WHERE cc.chapter_id = ?
+        """,
+        (chapter_id,)
+    )
+    row = await cursor.fetchone()
+    if not row:
+        return
+    await _index_paragraphs(
+        conn, chapter_id, row['novel_id'], decompress_content(row['codec'], row['data']), delete=True
+    )
+    await conn.execute("DELETE FROM chapter_contents WHERE chapter_id = ?", (chapter_id,))
+
+
+async def load_content(conn: aiosqlite.Connection, chapter_id: int) -> Optional[str]:
+    """按章节ID读取正文"""
+    cursor = await conn.execute(
+        "SELECT codec, data FROM chapter_contents WHERE chapter_id = ?",
+        (chapter_id,)
+    )
+    row = await cursor.fetchone()
+    return decompress_content(row['codec'], row['data']) if row else None
+
+
+async def migrate_inline_contents(conn: aiosqlite.Connection) -> int:
+    """将chapters.content中的旧正文迁移到chapter_contents，返回迁移的章节数
+
+    分批读取只是为了限制内存占用，全部批次在调用方的迁移事务中执行，由调用方提交：
+    中途中断时整个迁移回滚，下次启动重新执行，不会留下一半已迁移的数据。
+    """
+    migrated = 0
+    while True:
+        cursor = await conn.execute(
+            "SELECT id, content FROM chapters WHERE content IS NOT NULL LIMIT ?",
+            (MIGRATE_BATCH_SIZE,)
+        )
+        rows = await cursor.fetchall()
+        if not rows:
+            break
+
+        for row in rows:
+            if row['content']:
+                await save_content(conn, row['id'], row['content'])
+        await conn.executemany(
+            "UPDATE chapters SET content = NULL WHERE id = ?",
+            [(row['id'],) for row in rows]
+        )
+        migrated += len(rows)
+
+    if migrated:
+        logger.info(f"已将 {migrated} 个章节的正文迁移到压缩存储")
+    return migrated
+
+
+async def rebuild_content_index(conn: aiosqlite.Connection) -> int:
+    """为已保存的全部章节正文建立全文索引，返回处理的章节数
+
+    与migrate_inline_contents相同，在调用方的迁移事务中执行，由调用方提交，
+    中断后不会留下只包含部分章节的索引。
+    """
+    indexed = 0
+    last_id = 0
+    while True:
+        cursor = await conn.execute(
+            """
+            SELECT cc.chapter_id, c.novel_id, cc.codec, cc.data
+            FROM chapter_contents cc
+            JOIN chapters c ON c.id = cc.chapter_id
+            WHERE cc.chapter_id > ?
+            ORDER BY cc.chapter_id
+            LIMIT ?
+            """,
+            (last_id, MIGRATE_BATCH_SIZE)
+        )
+        rows = await cursor.fetchall()
+        if not rows:
+            break
+
+        for row in rows:
+            await _index_paragraphs(
+                conn, row['chapter_id'], row['novel_id'], decompress_content(row['codec'], row['data'])
+            )
+        indexed += len(rows)
+        last_id = rows[-1]['chapter_id']
+
+    if indexed:
+        logger.info(f"已为 {indexed} 个章节建立正文全文索引")
+    return indexed
+
+
+async def purge_orphan_paragraphs(conn: aiosqlite.Connection) -> int:
+    """检查全文索引中是否有已删除章节的段落，有则清空后重建索引，返回重建的章节数
+
+    无内容索引表删除时需要原始段落，正文已随章节删除的段落无法单独移出，只能整体重建。
+    """
+    cursor = await conn.execute(
+        """
+        SELECT 1 FROM chapter_paragraphs_fts
+        WHERE rowid / ? NOT IN (SELECT chapter_id FROM chapter_contents)
+        LIMIT 1
+        """,
+        (PARAGRAPH_SLOTS,)
+    )
+    if await cursor.fetchone() is None:
+        return 0
+    logger.info("正文全文索引中有已删除章节的段落，重建索引")
+    await conn.execute("INSERT INTO chapter_paragraphs_fts (chapter_paragraphs_fts) VALUES ('delete-all')")
+    return await rebuild_content_index(conn)
+
+
+async def search_paragraphs(
+    conn: aiosqlite.Connection, keyword: str, novel_id: Optional[int], limit: int, offset: int
+) -> List[Dict]:
+    """在正文全文索引中查找关键词，按章节和段落顺序返回命中位置及高亮摘要"""
+    match = 'text: "' + keyword.replace('"', '""') + '"'
+    if novel_id is not None:
+        match += ' AND book: "' + book_marker(novel_id) + '"'
+
+    cursor = await conn.execute(
+        """
+        SELECT rowid FROM chapter_paragraphs_fts
+        WHERE chapter_paragraphs_fts MATCH ?
+        ORDER BY rowid
+        LIMIT ? OFFSET ?
+        """,
+        (match, limit, offset)
+    )
+    positions = [divmod(row['rowid'], PARAGRAPH_SLOTS) for row in await cursor.fetchall()]
+    if not positions:
+        return []
+
+    # 每个命中章节只解压一次正文
+    chapter_ids = sorted({chapter_id for chapter_id, _ in positions})
+    placeholders = ", ".join("?" for _ in chapter_ids)
+    cursor = await conn.execute(
+        f"""
+        SELECT c.id, c.novel_id, c.title, c.chapter_index, n.title AS novel_title, cc.codec, cc.data
+        FROM chapters c
+        JOIN novels n ON n.id = c.novel_id
+        JOIN chapter_contents cc ON cc.chapter_id = c.id
+        WHERE c.id IN ({placeholders})
+        """,
+        chapter_ids
+    )
+    chapters = {}
+    for row in await cursor.fetchall():
+        chapters[row['id']] = (row, split_paragraphs(decompress_content(row['codec'], row['data'])))
+
+    hits = []
+    for chapter_id, paragraph_index in positions:
+        if chapter_id not in chapters:
+            # 章节已被删除
+            continue
+        row, paragraphs = chapters[chapter_id]
+        if paragraph_index >= len(paragraphs):
+            continue
+        hits.append(_paragraph_hit(row, paragraph_index, paragraphs[paragraph_index], keyword))
+    return hits
+
+
+def _paragraph_hit(row: aiosqlite.Row, paragraph_index: int, paragraph: str, keyword: str) -> Dict:
+    """生成一条正文搜索结果"""
+    position, snippet = build_snippet(paragraph, keyword)
+    return {
+        "novel_id": row['novel_id'],
+        "novel_title": row['novel_title'],
+        "chapter_id": row['id'],
+        "chapter_title": row['title'],
+        "chapter_index": row['chapter_index'],
+        "paragraph_index": paragraph_index,
+        "position": position,
+        "snippet": snippet,
+    }
+
+
+async def scan_paragraphs(
+    conn: aiosqlite.Connection, keyword: str, novel_id: Optional[int], limit: int, offset: int
+) -> List[Dict]:
+    """不使用全文索引，逐章解压正文查找关键词，结果的顺序和格式与search_paragraphs相同
+
+    用于trigram索引无法匹配的短关键词（如两个字的人名），只扫描按章节ID排在前面的
+    SCAN_MAX_CHAPTERS章，超出部分不会出现在结果中。
+    """
+    if novel_id is None:
+        cursor = await conn.execute(
+            "SELECT chapter_id FROM chapter_contents ORDER BY chapter_id LIMIT ?",
+            (SCAN_MAX_CHAPTERS + 1,)
+        )
+    else:
+        cursor = await conn.execute(
+            """
+            SELECT c.id FROM chapters c
+            JOIN chapter_contents cc ON cc.chapter_id = c.id
+            WHERE c.novel_id = ?
+            ORDER BY c.id
+            LIMIT ?
+            """,
+            (novel_id, SCAN_MAX_CHAPTERS + 1)
+        )
+    chapter_ids = [row[0] for row in await cursor.fetchall()]
+    if len(chapter_ids) > SCAN_MAX_CHAPTERS:
+        logger.warning(f"短关键词搜索只扫描前 {SCAN_MAX_CHAPTERS} 章: {keyword}")
+        chapter_ids = chapter_ids[:SCAN_MAX_CHAPTERS]
+
+    lowered = keyword.lower()
+    hits: List[Dict] = []
+    skipped = 0
+    for start in range(0, len(chapter_ids), MIGRATE_BATCH_SIZE):
+        batch = chapter_ids[start:start + MIGRATE_BATCH_SIZE]
+        placeholders = ", ".join("?" for _ in batch)
+        cursor = await conn.execute(
+            f"""
+            SELECT c.id, c.novel_id, c.title, c.chapter_index, n.title AS novel_title, cc.codec, cc.data
+            FROM chapters c
+            JOIN novels n ON n.id = c.novel_id
+            JOIN chapter_contents cc ON cc.chapter_id = c.id
+            WHERE c.id IN ({placeholders})
+            ORDER BY c.id
+            """,
+            batch
+        )
+        for row in await cursor.fetchall():
+            for index, paragraph in enumerate(split_paragraphs(decompress_content(row['codec'], row['data']))):
+                if lowered not in paragraph.lower():
+                    continue
+                if skipped < offset:
+                    skipped += 1
+                    continue
+                hits.append(_paragraph_hit(row, index, paragraph, keyword))
+                if len(hits) >= limit:
+                    return hits
+    return hits
@@ -1,9 +1,17 @@
 from typing import List, Optional, Dict, Any, Tuple
 from datetime import datetime
+import json
 import aiosqlite
 from loguru import logger
 
-from database.init_db import get_db_connection
+from database.pool import db_pool
+from database.writer import db_writer
+from database.pagination import encode_cursor, decode_cursor, keyset_condition, keyset_order
+from database.content_store import save_content, load_content, search_paragraphs, scan_paragraphs
+from database import popularity
+from database.instrumentation import instrument_functions
+from database.settings_cache import settings_snapshot, read_version as read_settings_version
+from utils.rule_registry import rule_registry
 from database.models import (
     Novel, NovelCreate,
     Chapter, ChapterCreate,
@@ -15,11 +23,21 @@ from database.models import (
 )
 
 
+def _next_page(items: List[Dict], page_size: int) -> Tuple[List[Dict], Optional[str]]:
+    """截取一页数据，多查询的一行用于判断是否有下一页并生成游标"""
+    next_cursor = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        next_cursor = encode_cursor([items[-1]["sort_key"], items[-1]["id"]])
+    for item in items:
+        del item["sort_key"]
+    return items, next_cursor
+
+
 # 小说相关操作
 async def create_novel(novel: NovelCreate) -> int:
     """创建小说"""
-    conn = await get_db_connection()
-    try:
+    async with db_writer.transaction() as conn:
         cursor = await conn.execute(
             """
             INSERT INTO novels (title, author, cover, description, source, source_url, last_update)
@@ -28,84 +46,105 @@ async def create_novel(novel: NovelCreate) -> int:
             (novel.title, novel.author, novel.cover, novel.description,
              novel.source, novel.source_url, datetime.now())
         )
-        await conn.commit()
+        await popularity.ensure_row(conn, cursor.lastrowid)
         return cursor.lastrowid
-    finally:
-        await conn.close()
 
 
 async def get_novel(novel_id: int) -> Optional[Dict]:
     """获取小说详情"""
-    conn = await get_db_connection()
-    try:
+    async with db_pool.acquire() as conn:
         cursor = await conn.execute(
             "SELECT * FROM novels WHERE id = ?", (novel_id,)
         )
         result = await cursor.fetchone()
         return dict(result) if result else None
-    finally:
-        await conn.close()
+
+
+# trigram分词最少需要3个字符才能使用全文索引
+FTS_MIN_KEYWORD_LENGTH = 3
+
+
+def _fts_phrase(keyword: str) -> str:
+    """将关键词转义为FTS5短语查询"""
+    return '"' + keyword.replace('"', '""') + '"'
 
 
 async def search_novels(keyword: str, page: int = 1, page_size: int = 10) -> Tuple[List[Dict], int]:
-    """搜索小说"""
-    conn = await get_db_connection()
-    try:
-        # 计算总数
-        cursor = await conn.execute(
-            "SELECT COUNT(*) as count FROM novels WHERE title LIKE ? OR author LIKE ?",
-            (f"%{keyword}%", f"%{keyword}%")
-        )
-        result = await cursor.fetchone()
-        total = result['count']
+    """搜索小说，按标题、作者、简介的相关度排序"""
+    keyword = keyword.strip()
+    async with db_pool.acquire() as conn:
+        if len(keyword) >= FTS_MIN_KEYWORD_LENGTH:
+            match = _fts_phrase(keyword)
 
-        # 获取分页数据
-        cursor = await conn.execute(
-            """
-            SELECT * FROM novels
-            WHERE title LIKE ? OR author LIKE ?
-            ORDER BY updated_at DESC
-            LIMIT ? OFFSET ?
-            """,
-            (f"%{keyword}%", f"%{keyword}%", page_size, (page - 1) * page_size)
-        )
+            # 计算总数
+            cursor = await conn.execute(
+                "SELECT COUNT(*) as count FROM novels_fts WHERE novels_fts MATCH ?",
+                (match,)
+            )
+            result = await cursor.fetchone()
+            total = result['count']
+
+            # 获取分页数据，标题命中权重最高
+            cursor = await conn.execute(
+                """
+                SELECT n.* FROM novels_fts f
+                JOIN novels n ON n.id = f.rowid
+                WHERE novels_fts MATCH ?
+                ORDER BY bm25(novels_fts, 10.0, 5.0, 1.0), n.updated_at DESC
+                LIMIT ? OFFSET ?
+                """,
+                (match, page_size, (page - 1) * page_size)
+            )
+        else:
+            # 关键词过短时无法使用trigram索引，退回到模糊匹配
+            pattern = f"%{keyword}%"
+
+            cursor = await conn.execute(
+                """
+                SELECT COUNT(*) as count FROM novels
+                WHERE title LIKE ? OR author LIKE ? OR description LIKE ?
+                """,
+                (pattern, pattern, pattern)
+            )
+            result = await cursor.fetchone()
+            total = result['count']
+
+            cursor = await conn.execute(
+                """
+                SELECT * FROM novels
+                WHERE title LIKE ? OR author LIKE ? OR description LIKE ?
+                ORDER BY updated_at DESC
+                LIMIT ? OFFSET ?
+                """,
+                (pattern, pattern, pattern, page_size, (page - 1) * page_size)
+            )
         rows = await cursor.fetchall()
         novels = [dict(row) for row in rows]
 
         return novels, total
-    finally:
-        await conn.close()
 
 
 async def get_hot_novels(limit: int = 10) -> List[Dict]:
     """获取热门小说"""
-    conn = await get_db_connection()
-    try:
-        # 基于历史记录和书架数据计算热门小说
+    async with db_pool.acquire() as conn:
+        # 热度由写入历史记录和书架时增量维护，按score索引读取前K本
         cursor = await conn.execute(
             """
-            SELECT n.*,
-                   COUNT(DISTINCT h.id) as history_count,
-                   COUNT(DISTINCT b.id) as bookshelf_count
-            FROM novels n
-            LEFT JOIN history h ON n.id = h.novel_id
-            LEFT JOIN bookshelf b ON n.id = b.novel_id
-            GROUP BY n.id
-            ORDER BY (history_count * 0.7 + bookshelf_count * 0.3) DESC
+            SELECT n.*, p.history_count, p.bookshelf_count
+            FROM novel_popularity p
+            JOIN novels n ON n.id = p.novel_id
+            ORDER BY p.score DESC
             LIMIT ?
             """,
             (limit,)
         )
         rows = await cursor.fetchall()
         return [dict(row) for row in rows]
-    finally:
-        await conn.close()
 
 
 async def update_novel(novel_id: int, novel_data: Dict[str, Any]) -> bool:
     """更新小说信息"""
-    conn = await get_db_connection()
-    try:
+    async with db_writer.transaction() as conn:
         # 构建更新SQL
         fields = []
         values = []
@@ -129,82 +168,413 @@ async def update_novel(novel_id: int, novel_data: Dict[str, Any]) -> bool:
             f"UPDATE novels SET {', '.join(fields)} WHERE id = ?",
             values
         )
-        await conn.commit()
         return True
-    finally:
-        await conn.close()
 
 
 # 章节相关操作
+# 章节元数据列，正文单独保存在chapter_contents中，按需加载
+CHAPTER_COLUMNS = "id, novel_id, title, chapter_index, source_url, is_downloaded, created_at, updated_at"
+
+INSERT_CHAPTER_SQL = """
+    INSERT INTO chapters
+    (novel_id, title, chapter_index, source_url, is_downloaded)
+    VALUES (?, ?, ?, ?, ?)
+"""
+
+
+async def _insert_chapters(conn: aiosqlite.Connection, chapters: List[ChapterCreate]) -> int:
+    """插入章节，带正文的章节同时写入内容存储，调用方负责提交事务
+
+    来源地址已存在的章节跳过（唯一索引(novel_id, source_url)），返回实际插入的章节数。
+    """
+    cursor = await conn.executemany(
+        INSERT_CHAPTER_SQL + "ON CONFLICT(novel_id, source_url) DO NOTHING",
+        [(chapter.novel_id, chapter.title, chapter.chapter_index,
+          chapter.source_url, chapter.is_downloaded)
+         for chapter in chapters if not chapter.content]
+    )
+    inserted = max(cursor.rowcount, 0)
+    for chapter in chapters:
+        if chapter.content:
+            cursor = await conn.execute(
+                INSERT_CHAPTER_SQL + "ON CONFLICT(novel_id, source_url) DO NOTHING",
+                (chapter.novel_id, chapter.title, chapter.chapter_index,
+                 chapter.source_url, chapter.is_downloaded)
+            )
+            if cursor.rowcount > 0:
+                await save_content(conn, cursor.lastrowid, chapter.content)
+                inserted += 1
+    return inserted
+
+
 async def create_chapter(chapter: ChapterCreate) -> int:
     """创建章节"""
-    conn = await get_db_connection()
-    try:
+    async with db_writer.transaction() as conn:
         cursor = await conn.execute(
-            """
-            INSERT INTO chapters
-            (novel_id, title, chapter_index, content, source_url, is_downloaded)
-            VALUES (?, ?, ?, ?, ?, ?)
-            """,
+            INSERT_CHAPTER_SQL,
             (chapter.novel_id, chapter.title, chapter.chapter_index,
-             chapter.content, chapter.source_url, chapter.is_downloaded)
+             chapter.source_url, chapter.is_downloaded)
         )
-        await conn.commit()
+        if chapter.content:
+            await save_content(conn, cursor.lastrowid, chapter.content)
         return cursor.lastrowid
-    finally:
-        await conn.close()
+
+
+async def create_chapters_bulk(chapters: List[ChapterCreate]) -> int:
+    """批量创建章节，整个目录在一个事务中写入，来源地址已存在的章节跳过，返回插入的章节数"""
+    if not chapters:
+        return 0
+    async with db_writer.transaction() as conn:
+        return await _insert_chapters(conn, chapters)
+
+
+async def sync_chapter_catalog(novel_id: int, chapters: List[ChapterCreate]) -> Dict[str, int]:
+    """按来源地址比对抓取到的目录和已有目录，在一个事务中只写入差异
+
+    新地址的章节插入，标题变化的章节计为改名，只有序号变化的计为移动，二者都只更新标题和序号；
+    源站已移除且未下载的章节删除，已下载的章节保留正文；阅读记录或书架仍引用的章节也保留（计为kept），
+    目录页被截断或临时出错时不会因级联删除丢失阅读进度。目录未变化时不产生任何写入。
+    没有来源地址的章节无法比对，不参与同步。返回各类变化的数量。
+    """
+    counts = {"added": 0, "renamed": 0, "moved": 0, "removed": 0, "kept": 0, "unchanged": 0}
+    # 抓取结果中同一地址只保留第一次出现
+    catalog: Dict[str, ChapterCreate] = {}
+    for chapter in chapters:
+        if chapter.source_url and chapter.source_url not in catalog:
+            catalog[chapter.source_url] = chapter
+    if not catalog:
+        # 抓取失败时返回空目录，不能据此删除已有章节
+        return counts
+
+    async with db_writer.transaction() as conn:
+        cursor = await conn.execute(
+            """
+            SELECT id, title, chapter_index, source_url, is_downloaded FROM chapters
+            WHERE novel_id = ? AND source_url IS NOT NULL
+            """,
+            (novel_id,)
+        )
+        existing = {row['source_url']: row for row in await cursor.fetchall()}
+
+        now = datetime.now()
+        inserts = []
+        updates = []
+        for source_url, chapter in catalog.items():
+            row = existing.get(source_url)
+            if row is None:
+                inserts.append(chapter.model_copy(update={"novel_id": novel_id}))
+                continue
+            if row['title'] != chapter.title:
+                counts["renamed"] += 1
+            elif row['chapter_index'] != chapter.chapter_index:
+                counts["moved"] += 1
+            else:
+                counts["unchanged"] += 1
+                continue
+            updates.append((chapter.title, chapter.chapter_index, now, row['id']))
+        removed = [
+            (row['id'],) for source_url, row in existing.items()
+            if source_url not in catalog and not row['is_downloaded']
+        ]
+        if removed:
+            cursor = await conn.execute(
+                """
+                SELECT chapter_id FROM history WHERE novel_id = ?
+                UNION
+                SELECT last_read_chapter_id FROM bookshelf WHERE novel_id = ?
+                """,
+                (novel_id, novel_id)
+            )
+            referenced = {row[0] for row in await cursor.fetchall()}
+            counts["kept"] = sum(1 for (chapter_id,) in removed if chapter_id in referenced)
+            removed = [(chapter_id,) for (chapter_id,) in removed if chapter_id not in referenced]
+
+        if inserts:
+            await _insert_chapters(conn, inserts)
+        if updates:
+            await conn.executemany(
+                "UPDATE chapters SET title = ?, chapter_index = ?, updated_at = ? WHERE id = ?",
+                updates
+            )
+        if removed:
+            await conn.executemany("DELETE FROM chapters WHERE id = ?", removed)
+
+    counts["added"] = len(inserts)
+    counts["removed"] = len(removed)
+    return counts
 
 
 async def get_chapter(chapter_id: int) -> Optional[Dict]:
-    """获取章节详情"""
-    conn = await get_db_connection()
-    try:
+    """获取章节详情（含正文）"""
+    async with db_pool.acquire() as conn:
         cursor = await conn.execute(
-            "SELECT * FROM chapters WHERE id = ?", (chapter_id,)
+            f"SELECT {CHAPTER_COLUMNS} FROM chapters WHERE id = ?", (chapter_id,)
         )
         result = await cursor.fetchone()
-        return dict(result) if result else None
-    finally:
-        await conn.close()
+        if not result:
+            return None
+        chapter = dict(result)
+        chapter['content'] = await load_content(conn, chapter_id)
+        return chapter
 
 
 async def get_novel_chapters(novel_id: int) -> List[Dict]:
-    """获取小说的所有章节"""
-    conn = await get_db_connection()
-    try:
+    """获取小说的所有章节（不含正文）"""
+    async with db_pool.acquire() as conn:
         cursor = await conn.execute(
-            "SELECT * FROM chapters WHERE novel_id = ? ORDER BY chapter_index",
+            f"SELECT {CHAPTER_COLUMNS} FROM chapters WHERE novel_id = ? ORDER BY chapter_index",
             (novel_id,)
         )
         rows = await cursor.fetchall()
         return [dict(row) for row in rows]
-    finally:
-        await conn.close()
+
+
+async def _store_chapter_content(conn: aiosqlite.Connection, chapter_id: int, content: str, now: datetime) -> None:
+    """写入章节正文并标记为已下载，调用方负责提交事务"""
+    await save_content(conn, chapter_id, content)
+    await conn.execute(
+        """
+        UPDATE chapters
+        SET content = NULL, is_downloaded = 1, updated_at = ?
+        WHERE id = ?
+        """,
+        (now, chapter_id)
+    )
 
 
 async def update_chapter_content(chapter_id: int, content: str) -> bool:
     """更新章节内容"""
-    conn = await get_db_connection()
-    try:
+    async with db_writer.transaction() as conn:
+        await _store_chapter_content(conn, chapter_id, content, datetime.now())
+        return True
+
+
+async def search_chapter_content(
+    keyword: str, novel_id: Optional[int] = None, page: int = 1, page_size: int = 20
+) -> Tuple[List[Dict], bool]:
+    """在已下载的章节正文中搜索，novel_id为空时搜索整个书库，返回(命中列表, 是否还有更多)
+
+    关键词过短时无法使用trigram索引，退回到逐章解压扫描（见content_store.scan_paragraphs）。
+    """
+    keyword = keyword.strip()
+    if not keyword:
+        raise ValueError("关键词不能为空")
+    search = search_paragraphs if len(keyword) >= FTS_MIN_KEYWORD_LENGTH else scan_paragraphs
+    async with db_pool.acquire() as conn:
+        # 多取一条用于判断是否还有下一页，避免对全部命中计数
+        hits = await search(conn, keyword, novel_id, page_size + 1, (page - 1) * page_size)
+        return hits[:page_size], len(hits) > page_size
+
+
+# 下载任务相关操作
+
+def _download_job(row: aiosqlite.Row) -> Dict:
+    """下载任务，附加进度和按累计下载时间计算的速度"""
+    job = dict(row)
+    total = job['total_chapters']
+    elapsed = job['elapsed_seconds']
+    if total:
+        job['progress'] = round((job['done_chapters'] + job['failed_chapters']) / total, 4)
+    else:
+        job['progress'] = 1.0 if job['status'] == 'completed' else 0.0
+    job['chapters_per_second'] = round(job['done_chapters'] / elapsed, 2) if elapsed else 0.0
+    job['bytes_per_second'] = round(job['downloaded_bytes'] / elapsed, 1) if elapsed else 0.0
+    return job
+
+
+async def create_download_job(novel_id: int, rule_id: int) -> Tuple[Dict, bool]:
+    """创建下载任务，该小说已有等待或进行中的任务时返回该任务，返回(任务, 是否新建)"""
+    async with db_writer.transaction() as conn:
+        # 写入串行执行，查询和插入之间不会有其他任务插入
+        cursor = await conn.execute(
+            "SELECT * FROM download_jobs WHERE novel_id = ? AND status IN ('pending', 'running')",
+            (novel_id,)
+        )
+        row = await cursor.fetchone()
+        if row:
+            return _download_job(row), False
+
+        cursor = await conn.execute(
+            "INSERT INTO download_jobs (novel_id, rule_id) VALUES (?, ?)",
+            (novel_id, rule_id)
+        )
+        cursor = await conn.execute("SELECT * FROM download_jobs WHERE id = ?", (cursor.lastrowid,))
+        return _download_job(await cursor.fetchone()), True
+
+
+async def get_download_job(job_id: int) -> Optional[Dict]:
+    """获取下载任务"""
+    async with db_pool.acquire() as conn:
+        cursor = await conn.execute("SELECT * FROM download_jobs WHERE id = ?", (job_id,))
+        row = await cursor.fetchone()
+        return _download_job(row) if row else None
+
+
+async def get_latest_download_job(novel_id: int) -> Optional[Dict]:
+    """获取小说最近的下载任务"""
+    async with db_pool.acquire() as conn:
+        cursor = await conn.execute(
+            "SELECT * FROM download_jobs WHERE novel_id = ? ORDER BY id DESC LIMIT 1",
+            (novel_id,)
+        )
+        row = await cursor.fetchone()
+        return _download_job(row) if row else None
+
+
+async def get_download_jobs(status: Optional[str] = None, limit: int = 50) -> List[Dict]:
+    """获取下载任务列表，最新的在前，status为空时返回所有状态"""
+    async with db_pool.acquire() as conn:
+        if status:
+            cursor = await conn.execute(
+                "SELECT * FROM download_jobs WHERE status = ? ORDER BY id DESC LIMIT ?",
+                (status, limit)
+            )
+        else:
+            cursor = await conn.execute(
+                "SELECT * FROM download_jobs ORDER BY id DESC LIMIT ?", (limit,)
+            )
+        return [_download_job(row) for row in await cursor.fetchall()]
+
+
+async def get_active_download_jobs() -> List[Dict]:
+    """获取等待或进行中的下载任务，按创建顺序，用于启动时恢复"""
+    async with db_pool.acquire() as conn:
+        cursor = await conn.execute(
+            "SELECT * FROM download_jobs WHERE status IN ('pending', 'running') ORDER BY id"
+        )
+        return [_download_job(row) for row in await cursor.fetchall()]
+
+
+async def add_download_job_chapters(job_id: int, chapter_ids: List[int]) -> int:
+    """登记任务要下载的章节，返回任务的章节总数"""
+    async with db_writer.transaction() as conn:
+        await conn.executemany(
+            "INSERT OR IGNORE INTO download_job_chapters (job_id, chapter_id) VALUES (?, ?)",
+            [(job_id, chapter_id) for chapter_id in chapter_ids]
+        )
+        cursor = await conn.execute(
+            "SELECT COUNT(*) FROM download_job_chapters WHERE job_id = ?", (job_id,)
+        )
+        total = (await cursor.fetchone())[0]
+        await conn.execute(
+            "UPDATE download_jobs SET total_chapters = ?, updated_at = ? WHERE id = ?",
+            (total, datetime.now(), job_id)
+        )
+        return total
+
+
+async def get_pending_job_chapters(job_id: int) -> List[Dict]:
+    """获取任务中尚未下载的章节，按章节顺序"""
+    async with db_pool.acquire() as conn:
+        cursor = await conn.execute(
+            """
+            SELECT c.id, c.title, c.source_url
+            FROM download_job_chapters jc
+            JOIN chapters c ON c.id = jc.chapter_id
+            WHERE jc.job_id = ? AND jc.status = 'pending'
+            ORDER BY c.chapter_index
+            """,
+            (job_id,)
+        )
+        return [dict(row) for row in await cursor.fetchall()]
+
+
+async def save_download_batch(job_id: int, results: List[Tuple[int, Optional[str]]], elapsed: float) -> None:
+    """保存一批下载结果作为检查点：正文、章节状态和任务进度在同一事务中提交
+
+    results为(章节ID, 正文)，正文为空表示下载失败；elapsed为这批章节的下载时间（秒）。
+    """
+    now = datetime.now()
+    done = failed = downloaded_bytes = 0
+    states = []
+    async with db_writer.transaction() as conn:
+        for chapter_id, content in results:
+            if content:
+                await _store_chapter_content(conn, chapter_id, content, now)
+                size = len(content.encode('utf-8'))
+                states.append(('done', size, now, job_id, chapter_id))
+                done += 1
+                downloaded_bytes += size
+            else:
+                states.append(('failed', 0, now, job_id, chapter_id))
+                failed += 1
+        await conn.executemany(
+            "UPDATE download_job_chapters SET status = ?, bytes = ?, updated_at = ? WHERE job_id = ? AND chapter_id = ?",
+            states
+        )
         await conn.execute(
             """
-            UPDATE chapters
-            SET content = ?, is_downloaded = 1, updated_at = ?
+            UPDATE download_jobs
+            SET done_chapters = done_chapters + ?, failed_chapters = failed_chapters + ?,
+                downloaded_bytes = downloaded_bytes + ?, elapsed_seconds = elapsed_seconds + ?,
+                updated_at = ?
             WHERE id = ?
             """,
-            (content, datetime.now(), chapter_id)
+            (done, failed, downloaded_bytes, elapsed, now, job_id)
         )
-        await conn.commit()
-        return True
-    finally:
-        await conn.close()
+
+
+async def update_download_job_status(job_id: int, status: str, error: Optional[str] = None) -> bool:
+    """更新下载任务状态，首次运行时记录开始时间，结束时记录结束时间"""
+    now = datetime.now()
+    async with db_writer.transaction() as conn:
+        cursor = await conn.execute(
+            """
+            UPDATE download_jobs
+            SET status = ?, error = ?, updated_at = ?,
+                started_at = CASE WHEN ? = 'running' THEN COALESCE(started_at, ?) ELSE started_at END,
+                finished_at = CASE WHEN ? IN ('completed', 'failed', 'cancelled') THEN ? ELSE NULL END
+            WHERE id = ?
+            """,
+            (status, error, now, status, now, status, now, job_id)
+        )
+        return cursor.rowcount > 0
+
+
+# 页面条件请求验证信息相关操作
+
+async def get_http_validators(url: str, kind: str) -> Optional[Dict]:
+    """获取页面上次抓取时的ETag、Last-Modified和规则版本"""
+    async with db_pool.acquire() as conn:
+        cursor = await conn.execute(
+            "SELECT etag, last_modified, rule_version FROM http_validators WHERE url = ? AND kind = ?",
+            (url, kind)
+        )
+        row = await cursor.fetchone()
+        return dict(row) if row else None
+
+
+async def save_http_validators(
+    url: str, kind: str, etag: Optional[str], last_modified: Optional[str], rule_version: Optional[str]
+) -> None:
+    """保存页面的验证信息，两者都没有时删除，之后对该页面发送普通请求"""
+    async with db_writer.transaction() as conn:
+        if not etag and not last_modified:
+            await conn.execute("DELETE FROM http_validators WHERE url = ? AND kind = ?", (url, kind))
+            return
+        await conn.execute(
+            """
+            INSERT INTO http_validators (url, kind, etag, last_modified, rule_version, checked_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(url, kind) DO UPDATE SET
+                etag = excluded.etag, last_modified = excluded.last_modified,
+                rule_version = excluded.rule_version, checked_at = excluded.checked_at
+            """,
+            (url, kind, etag, last_modified, rule_version, datetime.now())
+        )
+
+
+async def delete_http_validators(url: str) -> bool:
+    """删除页面所有任务类型的验证信息，下次刷新时重新完整获取"""
+    async with db_writer.transaction() as conn:
+        cursor = await conn.execute("DELETE FROM http_validators WHERE url = ?", (url,))
+        return cursor.rowcount > 0
 
 
 # 书架相关操作
 async def add_to_bookshelf(bookshelf: BookshelfCreate) -> int:
     """添加到书架"""
-    conn = await get_db_connection()
-    try:
+    async with db_writer.transaction() as conn:
         # 检查是否已存在
         cursor = await conn.execute(
             "SELECT id FROM bookshelf WHERE novel_id = ?",
@@ -223,298 +593,371 @@ async def add_to_bookshelf(bookshelf: BookshelfCreate) -> int:
                 (bookshelf.last_read_chapter_id, bookshelf.last_read_position,
                  datetime.now(), existing['id'])
             )
-            await conn.commit()
             return existing['id']
         else:
             # 创建新记录
+            added_at = datetime.now()
             cursor = await conn.execute(
                 """
                 INSERT INTO bookshelf
-                (novel_id, last_read_chapter_id, last_read_position)
-                VALUES (?, ?, ?)
+                (novel_id, last_read_chapter_id, last_read_position, added_at)
+                VALUES (?, ?, ?, ?)
                 """,
-                (bookshelf.novel_id, bookshelf.last_read_chapter_id, bookshelf.last_read_position)
+                (bookshelf.novel_id, bookshelf.last_read_chapter_id, bookshelf.last_read_position, added_at)
+            )
+            await popularity.record_event(
+                conn, bookshelf.novel_id, popularity.BOOKSHELF_WEIGHT, added_at, bookshelf_delta=1
             )
-            await conn.commit()
             return cursor.lastrowid
-    finally:
-        await conn.close()
+
+
+# 书架排序方式: 排序字段 -> (排序键列, 是否降序)
+BOOKSHELF_SORTS = {
+    "updated_at": (("b.updated_at", "b.id"), True),
+    "added_at": (("b.added_at", "b.id"), True),
+    "title": (("n.title", "b.id"), False),
+}
+
+
+async def _select_bookshelf(
+    conn: aiosqlite.Connection, sort_by: str, limit: int, offset: int = 0, after: Optional[List[Any]] = None
+) -> List[Dict]:
+    """按排序方式查询书架，after为上一页最后一行的排序键"""
+    columns, descending = BOOKSHELF_SORTS.get(sort_by, BOOKSHELF_SORTS["updated_at"])
+    where_clause = f"WHERE {keyset_condition(columns, descending)}" if after else ""
+    cursor = await conn.execute(
+        f"""
+        SELECT b.*, n.title, n.author, n.cover, n.description, n.source, n.source_url,
+               {columns[0]} as sort_key
+        FROM bookshelf b
+        LEFT JOIN novels n ON b.novel_id = n.id
+        {where_clause}
+        {keyset_order(columns, descending)}
+        LIMIT ? OFFSET ?
+        """,
+        (*(after or ()), limit, offset)
+    )
+    rows = await cursor.fetchall()
+
+    # 处理结果
+    bookshelf_items = []
+    for row in rows:
+        item = dict(row)
+        novel = {
+            "id": item["novel_id"],
+            "title": item["title"],
+            "author": item["author"],
+            "cover": item["cover"],
+            "description": item["description"],
+            "source": item["source"],
+            "source_url": item["source_url"]
+        }
+        item["novel"] = novel
+        # 删除重复字段
+        for key in list(novel.keys()):
+            if key != "id" and key in item:
+                del item[key]
+        bookshelf_items.append(item)
+    return bookshelf_items
 
 
 async def get_bookshelf(page: int = 1, page_size: int = 10, sort_by: str = "updated_at") -> Tuple[List[Dict], int]:
     """获取书架列表"""
-    conn = await get_db_connection()
-    try:
-        # 验证排序字段
-        valid_sort_fields = ["updated_at", "added_at", "title"]
-        if sort_by not in valid_sort_fields:
-            sort_by = "updated_at"
-
-        # 处理按小说标题排序的特殊情况
-        join_clause = "LEFT JOIN novels n ON b.novel_id = n.id"
-        order_clause = "ORDER BY b.updated_at DESC"
-        if sort_by == "title":
-            order_clause = "ORDER BY n.title ASC"
-        elif sort_by == "added_at":
-            order_clause = "ORDER BY b.added_at DESC"
-
+    async with db_pool.acquire() as conn:
         # 计算总数
         cursor = await conn.execute("SELECT COUNT(*) as count FROM bookshelf")
         result = await cursor.fetchone()
         total = result['count']
 
         # 获取分页数据
-        cursor = await conn.execute(
-            f"""
-            SELECT b.*, n.title, n.author, n.cover, n.description, n.source, n.source_url
-            FROM bookshelf b
-            {join_clause}
-            {order_clause}
-            LIMIT ? OFFSET ?
-            """,
-            (page_size, (page - 1) * page_size)
-        )
-        rows = await cursor.fetchall()
-
-        # 处理结果
-        bookshelf_items = []
-        for row in rows:
-            item = dict(row)
-            novel = {
-                "id": item["novel_id"],
-                "title": item["title"],
-                "author": item["author"],
-                "cover": item["cover"],
-                "description": item["description"],
-                "source": item["source"],
-                "source_url": item["source_url"]
-            }
-            item["novel"] = novel
-            # 删除重复字段
-            for key in list(novel.keys()):
-                if key != "id" and key in item:
-                    del item[key]
-            bookshelf_items.append(item)
+        bookshelf_items = await _select_bookshelf(conn, sort_by, page_size, (page - 1) * page_size)
+        for item in bookshelf_items:
+            del item["sort_key"]
 
         return bookshelf_items, total
-    finally:
-        await conn.close()
+
+
+async def get_bookshelf_by_cursor(
+    cursor: Optional[str], page_size: int = 10, sort_by: str = "updated_at"
+) -> Tuple[List[Dict], Optional[str]]:
+    """按游标获取书架列表，返回(数据, 下一页游标)"""
+    after = decode_cursor(cursor, 2)
+    async with db_pool.acquire() as conn:
+        bookshelf_items = await _select_bookshelf(conn, sort_by, page_size + 1, after=after)
+        return _next_page(bookshelf_items, page_size)
 
 
 async def remove_from_bookshelf(novel_id: int) -> bool:
     """从书架移除"""
-    conn = await get_db_connection()
-    try:
+    async with db_writer.transaction() as conn:
+        cursor = await conn.execute(
+            "SELECT added_at FROM bookshelf WHERE novel_id = ?",
+            (novel_id,)
+        )
+        for row in await cursor.fetchall():
+            await popularity.record_event(
+                conn, novel_id, popularity.BOOKSHELF_WEIGHT, row['added_at'], bookshelf_delta=-1, removed=True
+            )
         await conn.execute(
             "DELETE FROM bookshelf WHERE novel_id = ?",
             (novel_id,)
         )
-        await conn.commit()
         return True
-    finally:
-        await conn.close()
 
 
 # 历史记录相关操作
+async def _upsert_history(conn: aiosqlite.Connection, history: HistoryCreate, read_at: datetime) -> int:
+    """写入一条阅读记录，同一章节已有记录时更新阅读位置，调用方负责提交事务"""
+    # 检查是否已存在该小说的历史记录
+    cursor = await conn.execute(
+        "SELECT id, read_at FROM history WHERE novel_id = ? AND chapter_id = ?",
+        (history.novel_id, history.chapter_id)
+    )
+    existing = await cursor.fetchone()
+
+    if existing:
+        # 更新已有记录，热度按新的阅读时间重新计入
+        await conn.execute(
+            """
+            UPDATE history
+            SET read_position = ?, read_at = ?
+            WHERE id = ?
+            """,
+            (history.read_position, read_at, existing['id'])
+        )
+        await popularity.record_event(
+            conn, history.novel_id, popularity.HISTORY_WEIGHT, existing['read_at'], removed=True
+        )
+        await popularity.record_event(conn, history.novel_id, popularity.HISTORY_WEIGHT, read_at)
+        return existing['id']
+
+    # 创建新记录，阅读时间与更新记录时使用同一时钟
+    cursor = await conn.execute(
+        """
+        INSERT INTO history
+        (novel_id, chapter_id, read_position, read_at)
+        VALUES (?, ?, ?, ?)
+        """,
+        (history.novel_id, history.chapter_id, history.read_position, read_at)
+    )
+    await popularity.record_event(
+        conn, history.novel_id, popularity.HISTORY_WEIGHT, read_at, history_delta=1
+    )
+    return cursor.lastrowid
+
+
 async def add_history(history: HistoryCreate) -> int:
     """添加历史记录"""
-    conn = await get_db_connection()
-    try:
-        # 检查是否已存在该小说的历史记录
-        cursor = await conn.execute(
-            "SELECT id FROM history WHERE novel_id = ? AND chapter_id = ?",
-            (history.novel_id, history.chapter_id)
+    async with db_writer.transaction() as conn:
+        history_id = await _upsert_history(conn, history, datetime.now())
+        return history_id
+
+
+async def add_history_batch(entries: List[Tuple[HistoryCreate, datetime]]) -> int:
+    """在一个事务中写入多条阅读记录，entries为(记录, 阅读时间)，返回写入条数
+
+    每条记录在自己的SAVEPOINT中写入，小说或章节已被删除的记录违反外键约束，
+    回滚该条后丢弃，不影响同批次的其他记录。
+    """
+    if not entries:
+        return 0
+    written = 0
+    async with db_writer.transaction() as conn:
+        for history, read_at in entries:
+            await conn.execute("SAVEPOINT history_entry")
+            try:
+                await _upsert_history(conn, history, read_at)
+            except aiosqlite.IntegrityError as e:
+                await conn.execute("ROLLBACK TO history_entry")
+                logger.warning(
+                    f"丢弃无效的阅读记录: 小说ID {history.novel_id}, 章节ID {history.chapter_id}, {str(e)}"
+                )
+            else:
+                written += 1
+            finally:
+                await conn.execute("RELEASE history_entry")
+        return written
+
+
+# 搜索历史相关操作
+async def _upsert_search_history(conn: aiosqlite.Connection, keyword: str, search_at: datetime) -> int:
+    """写入一条搜索历史，相同关键词只保留一条并更新时间，调用方负责提交事务"""
+    # 检查是否已存在相同关键词的搜索历史
+    cursor = await conn.execute(
+        "SELECT id FROM search_history WHERE keyword = ?",
+        (keyword,)
+    )
+    existing = await cursor.fetchone()
+
+    if existing:
+        # 更新已有记录的时间戳
+        await conn.execute(
+            """
+            UPDATE search_history
+            SET search_at = ?
+            WHERE id = ?
+            """,
+            (search_at, existing['id'])
         )
-        existing = await cursor.fetchone()
+        return existing['id']
 
-        if existing:
-            # 更新已有记录
-            await conn.execute(
-                """
-                UPDATE history
-                SET read_position = ?, read_at = ?
-                WHERE id = ?
-                """,
-                (history.read_position, datetime.now(), existing['id'])
-            )
-            await conn.commit()
-            return existing['id']
-        else:
-            # 创建新记录
-            cursor = await conn.execute(
-                """
-                INSERT INTO history
-                (novel_id, chapter_id, read_position)
-                VALUES (?, ?, ?)
-                """,
-                (history.novel_id, history.chapter_id, history.read_position)
-            )
-            await conn.commit()
-            return cursor.lastrowid
-    finally:
-        await conn.close()
+    # 创建新记录
+    cursor = await conn.execute(
+        """
+        INSERT INTO search_history
+        (keyword, search_at)
+        VALUES (?, ?)
+        """,
+        (keyword, search_at)
+    )
+    return cursor.lastrowid
 
 
-# 搜索历史相关操作
 async def add_search_history(search_history: SearchHistoryCreate) -> int:
     """添加搜索历史"""
-    conn = await get_db_connection()
-    try:
-        # 检查是否已存在相同关键词的搜索历史
-        cursor = await conn.execute(
-            "SELECT id FROM search_history WHERE keyword = ?",
-            (search_history.keyword,)
-        )
-        existing = await cursor.fetchone()
-
-        if existing:
-            # 更新已有记录的时间戳
-            await conn.execute(
-                """
-                UPDATE search_history
-                SET search_at = ?
-                WHERE id = ?
-                """,
-                (datetime.now(), existing['id'])
-            )
-            await conn.commit()
-            return existing['id']
-        else:
-            # 创建新记录
-            cursor = await conn.execute(
-                """
-                INSERT INTO search_history
-                (keyword)
-                VALUES (?)
-                """,
-                (search_history.keyword,)
-            )
-            await conn.commit()
-            return cursor.lastrowid
-    finally:
-        await conn.close()
+    async with db_writer.transaction() as conn:
+        history_id = await _upsert_search_history(conn, search_history.keyword, datetime.now())
+        return history_id
+
+
+async def add_search_history_batch(entries: List[Tuple[str, datetime]]) -> int:
+    """在一个事务中写入多条搜索历史，entries为(关键词, 搜索时间)，返回写入条数"""
+    if not entries:
+        return 0
+    async with db_writer.transaction() as conn:
+        for keyword, search_at in entries:
+            await _upsert_search_history(conn, keyword, search_at)
+        return len(entries)
+
+
+# 历史记录排序方式: 排序字段 -> (排序键列, 是否降序)
+HISTORY_SORTS = {
+    "read_at": (("s.read_at", "s.history_id"), True),
+    "title": (("n.title", "s.history_id"), False),
+}
+
+
+async def _select_history(
+    conn: aiosqlite.Connection, sort_by: str, limit: int, offset: int = 0, after: Optional[List[Any]] = None
+) -> List[Dict]:
+    """按排序方式查询每本小说最新的一条历史记录，after为上一页最后一行的排序键"""
+    columns, descending = HISTORY_SORTS.get(sort_by, HISTORY_SORTS["read_at"])
+    where_clause = f"WHERE {keyset_condition(columns, descending)}" if after else ""
+    # reading_state由触发器维护，每本小说只有一行，直接按索引分页
+    cursor = await conn.execute(
+        f"""
+        SELECT s.history_id as id, s.novel_id, s.chapter_id, s.read_position, s.read_at,
+               n.title, n.author, n.cover, n.description, n.source, n.source_url,
+               c.title as chapter_title, c.chapter_index, {columns[0]} as sort_key
+        FROM reading_state s
+        JOIN novels n ON s.novel_id = n.id
+        JOIN chapters c ON s.chapter_id = c.id
+        {where_clause}
+        {keyset_order(columns, descending)}
+        LIMIT ? OFFSET ?
+        """,
+        (*(after or ()), limit, offset)
+    )
+    rows = await cursor.fetchall()
+
+    # 处理结果
+    history_items = []
+    for row in rows:
+        item = dict(row)
+        novel = {
+            "id": item["novel_id"],
+            "title": item["title"],
+            "author": item["author"],
+            "cover": item["cover"],
+            "description": item["description"],
+            "source": item["source"],
+            "source_url": item["source_url"]
+        }
+        chapter = {
+            "id": item["chapter_id"],
+            "title": item["chapter_title"],
+            "chapter_index": item["chapter_index"]
+        }
+        item["novel"] = novel
+        item["chapter"] = chapter
+        # 删除重复字段
+        for key in list(novel.keys()):
+            if key != "id" and key in item:
+                del item[key]
+        del item["chapter_title"]
+        del item["chapter_index"]
+        history_items.append(item)
+    return history_items
 
 
 async def get_history(page: int = 1, page_size: int = 10, sort_by: str = "read_at") -> Tuple[List[Dict], int]:
     """获取历史记录列表"""
-    conn = await get_db_connection()
-    try:
-        # 验证排序字段
-        valid_sort_fields = ["read_at", "title"]
-        if sort_by not in valid_sort_fields:
-            sort_by = "read_at"
-
-        # 处理按小说标题排序的特殊情况
-        order_clause = "ORDER BY h.read_at DESC"
-        if sort_by == "title":
-            order_clause = "ORDER BY n.title ASC"
-
+    async with db_pool.acquire() as conn:
         # 计算总数
-        cursor = await conn.execute(
-            """
-            SELECT COUNT(DISTINCT h.novel_id) as count
-            FROM history h
-            """
-        )
+        cursor = await conn.execute("SELECT COUNT(*) as count FROM reading_state")
         result = await cursor.fetchone()
         total = result['count']
 
         # 获取分页数据 - 每本小说只取最新的一条历史记录
-        cursor = await conn.execute(
-            f"""
-            SELECT h.*, n.title, n.author, n.cover, n.description, n.source, n.source_url,
-                   c.title as chapter_title, c.chapter_index
-            FROM history h
-            JOIN novels n ON h.novel_id = n.id
-            JOIN chapters c ON h.chapter_id = c.id
-            JOIN (
-                SELECT novel_id, MAX(read_at) as latest_read
-                FROM history
-                GROUP BY novel_id
-            ) latest ON h.novel_id = latest.novel_id AND h.read_at = latest.latest_read
-            {order_clause}
-            LIMIT ? OFFSET ?
-            """,
-            (page_size, (page - 1) * page_size)
-        )
-        rows = await cursor.fetchall()
-
-        # 处理结果
-        history_items = []
-        for row in rows:
-            item = dict(row)
-            novel = {
-                "id": item["novel_id"],
-                "title": item["title"],
-                "author": item["author"],
-                "cover": item["cover"],
-                "description": item["description"],
-                "source": item["source"],
-                "source_url": item["source_url"]
-            }
-            chapter = {
-                "id": item["chapter_id"],
-                "title": item["chapter_title"],
-                "chapter_index": item["chapter_index"]
-            }
-            item["novel"] = novel
-            item["chapter"] = chapter
-            # 删除重复字段
-            for key in list(novel.keys()):
-                if key != "id" and key in item:
-                    del item[key]
-            del item["chapter_title"]
-            del item["chapter_index"]
-            history_items.append(item)
+        history_items = await _select_history(conn, sort_by, page_size, (page - 1) * page_size)
+        for item in history_items:
+            del item["sort_key"]
 
         return history_items, total
-    finally:
-        await conn.close()
+
+
+async def get_history_by_cursor(
+    cursor: Optional[str], page_size: int = 10, sort_by: str = "read_at"
+) -> Tuple[List[Dict], Optional[str]]:
+    """按游标获取历史记录列表，返回(数据, 下一页游标)"""
+    after = decode_cursor(cursor, 2)
+    async with db_pool.acquire() as conn:
+        history_items = await _select_history(conn, sort_by, page_size + 1, after=after)
+        return _next_page(history_items, page_size)
 
 
 async def delete_history(history_id: int) -> bool:
     """删除历史记录"""
-    conn = await get_db_connection()
-    try:
+    async with db_writer.transaction() as conn:
+        cursor = await conn.execute(
+            "SELECT novel_id, read_at FROM history WHERE id = ?",
+            (history_id,)
+        )
+        existing = await cursor.fetchone()
         await conn.execute(
             "DELETE FROM history WHERE id = ?",
             (history_id,)
         )
-        await conn.commit()
+        if existing:
+            await popularity.record_event(
+                conn, existing['novel_id'], popularity.HISTORY_WEIGHT, existing['read_at'],
+                history_delta=-1, removed=True
+            )
         return True
-    finally:
-        await conn.close()
 
 
 async def delete_novel_history(novel_id: int) -> bool:
     """删除小说的所有历史记录"""
-    conn = await get_db_connection()
-    try:
+    async with db_writer.transaction() as conn:
         await conn.execute(
             "DELETE FROM history WHERE novel_id = ?",
             (novel_id,)
         )
-        await conn.commit()
+        await popularity.rebuild(conn, [novel_id])
         return True
-    finally:
-        await conn.close()
 
 
 async def clear_all_history() -> bool:
     """清空所有历史记录"""
-    conn = await get_db_connection()
-    try:
+    async with db_writer.transaction() as conn:
         await conn.execute("DELETE FROM history")
-        await conn.commit()
+        await popularity.rebuild(conn)
         return True
-    finally:
-        await conn.close()
 
 
 async def get_search_history(limit: int = 10) -> List[Dict]:
     """获取搜索历史列表"""
-    conn = await get_db_connection()
-    try:
+    async with db_pool.acquire() as conn:
         cursor = await conn.execute(
             """
             SELECT * FROM search_history
@@ -525,123 +968,128 @@ async def get_search_history(limit: int = 10) -> List[Dict]:
         )
         rows = await cursor.fetchall()
         return [dict(row) for row in rows]
-    finally:
-        await conn.close()
 
 
 async def delete_search_history(history_id: int) -> bool:
     """删除搜索历史"""
-    conn = await get_db_connection()
-    try:
+    async with db_writer.transaction() as conn:
         await conn.execute(
             "DELETE FROM search_history WHERE id = ?",
             (history_id,)
         )
-        await conn.commit()
         return True
-    finally:
-        await conn.close()
 
 
 async def delete_search_history_by_keyword(keyword: str) -> bool:
     """根据关键词删除搜索历史"""
-    conn = await get_db_connection()
-    try:
+    async with db_writer.transaction() as conn:
         await conn.execute(
             "DELETE FROM search_history WHERE keyword = ?",
             (keyword,)
         )
-        await conn.commit()
         return True
-    finally:
-        await conn.close()
 
 
 async def clear_all_search_history() -> bool:
     """清空所有搜索历史"""
-    conn = await get_db_connection()
-    try:
+    async with db_writer.transaction() as conn:
         await conn.execute("DELETE FROM search_history")
-        await conn.commit()
         return True
-    finally:
-        await conn.close()
 
 
 # 规则相关操作
 async def create_rule(rule: RuleCreate) -> int:
     """创建规则"""
-    conn = await get_db_connection()
-    try:
+    async with db_writer.transaction() as conn:
         cursor = await conn.execute(
             """
             INSERT INTO rules
             (name, source_url, search_url, search_result_rule, cover_rule, title_rule, author_rule,
-             description_rule, chapter_list_rule, chapter_content_rule)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+             description_rule, chapter_list_rule, chapter_content_rule, cleaning_rules)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             """,
             (rule.name, rule.source_url, rule.search_url, rule.search_result_rule, rule.cover_rule,
              rule.title_rule, rule.author_rule, rule.description_rule,
-             rule.chapter_list_rule, rule.chapter_content_rule)
+             rule.chapter_list_rule, rule.chapter_content_rule,
+             rule.cleaning_rules.model_dump_json() if rule.cleaning_rules else None)
         )
-        await conn.commit()
         return cursor.lastrowid
-    finally:
-        await conn.close()
 
 
 async def get_rule(rule_id: int) -> Optional[Dict]:
     """获取规则详情"""
-    conn = await get_db_connection()
-    try:
+    async with db_pool.acquire() as conn:
         cursor = await conn.execute(
             "SELECT * FROM rules WHERE id = ?", (rule_id,)
         )
         result = await cursor.fetchone()
         return dict(result) if result else None
-    finally:
-        await conn.close()
 
 
-async def get_rules(page: int = 1, page_size: int = 10, sort_by: str = "updated_at") -> Tuple[List[Dict], int]:
-    """获取规则列表"""
-    conn = await get_db_connection()
-    try:
-        # 验证排序字段
-        valid_sort_fields = ["updated_at", "created_at", "name"]
-        if sort_by not in valid_sort_fields:
-            sort_by = "updated_at"
+# 规则排序方式: 排序字段 -> (排序键列, 是否降序)
+RULE_SORTS = {
+    "updated_at": (("updated_at", "id"), True),
+    "created_at": (("created_at", "id"), True),
+    "name": (("name", "id"), False),
+}
+
+
+async def _select_rules(
+    conn: aiosqlite.Connection, sort_by: str, limit: int, offset: int = 0, after: Optional[List[Any]] = None
+) -> List[Dict]:
+    """按排序方式查询规则，after为上一页最后一行的排序键"""
+    columns, descending = RULE_SORTS.get(sort_by, RULE_SORTS["updated_at"])
+    where_clause = f"WHERE {keyset_condition(columns, descending)}" if after else ""
+    cursor = await conn.execute(
+        f"""
+        SELECT *, {columns[0]} as sort_key FROM rules
+        {where_clause}
+        {keyset_order(columns, descending)}
+        LIMIT ? OFFSET ?
+        """,
+        (*(after or ()), limit, offset)
+    )
+    rows = await cursor.fetchall()
+    return [dict(row) for row in rows]
 
-        # 确定排序方向
-        direction = "DESC" if sort_by in ["updated_at", "created_at"] else "ASC"
 
+async def get_rules(page: int = 1, page_size: int = 10, sort_by: str = "updated_at") -> Tuple[List[Dict], int]:
+    """获取规则列表"""
+    async with db_pool.acquire() as conn:
         # 计算总数
         cursor = await conn.execute("SELECT COUNT(*) as count FROM rules")
         result = await cursor.fetchone()
         total = result['count']
 
         # 获取分页数据
-        cursor = await conn.execute(
-            f"SELECT * FROM rules ORDER BY {sort_by} {direction} LIMIT ? OFFSET ?",
-            (page_size, (page - 1) * page_size)
-        )
-        rows = await cursor.fetchall()
-        rules = [dict(row) for row in rows]
+        rules = await _select_rules(conn, sort_by, page_size, (page - 1) * page_size)
+        for rule in rules:
+            del rule["sort_key"]
 
         return rules, total
-    finally:
-        await conn.close()
+
+
+async def get_rules_by_cursor(
+    cursor: Optional[str], page_size: int = 10, sort_by: str = "updated_at"
+) -> Tuple[List[Dict], Optional[str]]:
+    """按游标获取规则列表，返回(数据, 下一页游标)"""
+    after = decode_cursor(cursor, 2)
+    async with db_pool.acquire() as conn:
+        rules = await _select_rules(conn, sort_by, page_size + 1, after=after)
+        return _next_page(rules, page_size)
 
 
 async def update_rule(rule_id: int, rule_data: Dict[str, Any]) -> bool:
     """更新规则"""
-    conn = await get_db_connection()
-    try:
+    async with db_writer.transaction() as conn:
         # 构建更新SQL
         fields = []
         values = []
         for key, value in rule_data.items():
             if key not in ['id', 'created_at', 'updated_at']:
+                # 正文清理配置以JSON文本保存
+                if key == 'cleaning_rules' and isinstance(value, dict):
+                    value = json.dumps(value, ensure_ascii=False)
                 fields.append(f"{key} = ?")
                 values.append(value)
 
@@ -660,77 +1108,72 @@ async def update_rule(rule_id: int, rule_data: Dict[str, Any]) -> bool:
             f"UPDATE rules SET {', '.join(fields)} WHERE id = ?",
             values
         )
-        await conn.commit()
-        return True
-    finally:
-        await conn.close()
+
+    # 提交后使规则缓存失效
+    rule_registry.invalidate(rule_id)
+    return True
 
 
 async def delete_rule(rule_id: int) -> bool:
     """删除规则"""
-    conn = await get_db_connection()
-    try:
+    async with db_writer.transaction() as conn:
         await conn.execute(
             "DELETE FROM rules WHERE id = ?",
             (rule_id,)
         )
-        await conn.commit()
-        return True
-    finally:
-        await conn.close()
+
+    rule_registry.invalidate(rule_id)
+    return True
 
 
 # 设置相关操作
 async def get_setting(key: str) -> Optional[str]:
-    """获取设置值"""
-    conn = await get_db_connection()
-    try:
-        cursor = await conn.execute(
-            "SELECT value FROM settings WHERE key = ?",
-            (key,)
-        )
-        result = await cursor.fetchone()
-        return result['value'] if result else None
-    finally:
-        await conn.close()
+    """获取设置值，从进程内快照读取"""
+    return await settings_snapshot.get(key)
+
+
+async def get_settings(keys: List[str]) -> Dict[str, str]:
+    """批量获取设置值，不存在的键不出现在结果中"""
+    return await settings_snapshot.get_many(keys)
 
 
 async def get_all_settings() -> Dict[str, str]:
     """获取所有设置"""
-    conn = await get_db_connection()
-    try:
-        cursor = await conn.execute("SELECT key, value FROM settings")
-        rows = await cursor.fetchall()
-        return {row['key']: row['value'] for row in rows}
-    finally:
-        await conn.close()
+    return await settings_snapshot.get_all()
+
+
+async def get_settings_version() -> int:
+    """获取设置版本号，settings表每次改动后递增"""
+    async with db_pool.acquire() as conn:
+        return await read_settings_version(conn)
+
+
+async def update_settings(values: Dict[str, str]) -> int:
+    """在一个事务中批量写入设置，提交后同步更新设置快照，返回写入后的版本号"""
+    if not values:
+        return await get_settings_version()
+
+    now = datetime.now()
+    async with db_writer.transaction() as conn:
+        before = await read_settings_version(conn)
+        await conn.executemany(
+            """
+            INSERT INTO settings (key, value) VALUES (?, ?)
+            ON CONFLICT(key) DO UPDATE SET value = excluded.value, updated_at = ?
+            """,
+            [(key, value, now) for key, value in values.items()]
+        )
+        after = await read_settings_version(conn)
+
+    settings_snapshot.apply(values, before, after)
+    return after
 
 
 async def update_setting(key: str, value: str) -> bool:
     """更新设置"""
-    conn = await get_db_connection()
-    try:
-        # 检查是否存在
-        cursor = await conn.execute(
-            "SELECT id FROM settings WHERE key = ?",
-            (key,)
-        )
-        existing = await cursor.fetchone()
+    await update_settings({key: value})
+    return True
 
-        if existing:
-            # 更新已有设置
-            await conn.execute(
-                "UPDATE settings SET value = ?, updated_at = ? WHERE key = ?",
-                (value, datetime.now(), key)
-            )
-        else:
-            # 创建新设置
-            await conn.execute(
-                "INSERT INTO settings (key, value) VALUES (?, ?)",
-                (key, value)
-            )
 
-        await conn.commit()
-        return True
-    finally:
-        await conn.close()
+# 为所有公开的crud函数记录连接、执行和提交耗时，见database/instrumentation.py
+instrument_functions(globals())
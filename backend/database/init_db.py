@@ -1,6 +1,13 @@
 import os
 import aiosqlite
 from loguru import logger
+from dotenv import load_dotenv
+
+from database import popularity, content_store
+from database.migrations import run_migrations
+
+# 加载环境变量
+load_dotenv()
 
 # 数据库文件路径
 DB_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "LocalBooks.db")
@@ -8,114 +15,10 @@ DB_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "Loca
 # 确保数据目录存在
 os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
 
-# 数据库表创建SQL语句
-CREATE_TABLES = [
-    """
-    CREATE TABLE IF NOT EXISTS novels (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        title TEXT NOT NULL,
-        author TEXT,
-        cover TEXT,
-        description TEXT,
-        source TEXT,
-        source_url TEXT,
-        last_update TIMESTAMP,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )
-    """,
-    """
-    CREATE TABLE IF NOT EXISTS chapters (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        novel_id INTEGER NOT NULL,
-        title TEXT NOT NULL,
-        chapter_index INTEGER NOT NULL,
-        content TEXT,
-        source_url TEXT,
-        is_downloaded BOOLEAN DEFAULT 0,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (novel_id) REFERENCES novels(id) ON DELETE CASCADE
-    )
-    """,
-    """
-    CREATE TABLE IF NOT EXISTS bookshelf (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        novel_id INTEGER NOT NULL,
-        last_read_chapter_id INTEGER,
-        last_read_position INTEGER DEFAULT 0,
-        added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (novel_id) REFERENCES novels(id) ON DELETE CASCADE,
-        FOREIGN KEY (last_read_chapter_id) REFERENCES chapters(id) ON DELETE SET NULL
-    )
-    """,
-    """
-    CREATE TABLE IF NOT EXISTS history (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        novel_id INTEGER NOT NULL,
-        chapter_id INTEGER NOT NULL,
-        read_position INTEGER DEFAULT 0,
-        read_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (novel_id) REFERENCES novels(id) ON DELETE CASCADE,
-        FOREIGN KEY (chapter_id) REFERENCES chapters(id) ON DELETE CASCADE
-    )
-    """,
-    """
-    CREATE TABLE IF NOT EXISTS search_history (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        keyword TEXT NOT NULL,
-        search_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )
-    """,
-    """
-    CREATE TABLE IF NOT EXISTS rules (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT NOT NULL,
-        source_url TEXT NOT NULL,
-        search_url TEXT NOT NULL,
-        search_result_rule TEXT,
-        cover_rule TEXT,
-        title_rule TEXT NOT NULL,
-        author_rule TEXT,
-        description_rule TEXT,
-        chapter_list_rule TEXT NOT NULL,
-        chapter_content_rule TEXT NOT NULL,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )
-    """,
-    """
-    CREATE TABLE IF NOT EXISTS settings (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        key TEXT NOT NULL UNIQUE,
-        value TEXT NOT NULL,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )
-    """,
-    """
-    CREATE INDEX IF NOT EXISTS idx_novels_title ON novels(title)
-    """,
-    """
-    CREATE INDEX IF NOT EXISTS idx_chapters_novel_id ON chapters(novel_id)
-    """,
-    """
-    CREATE INDEX IF NOT EXISTS idx_bookshelf_novel_id ON bookshelf(novel_id)
-    """,
-    """
-    CREATE INDEX IF NOT EXISTS idx_history_novel_id ON history(novel_id)
-    """,
-    """
-    CREATE INDEX IF NOT EXISTS idx_search_history_keyword ON search_history(keyword)
-    """,
-    """
-    CREATE INDEX IF NOT EXISTS idx_rules_name ON rules(name)
-    """,
-    """
-    CREATE INDEX IF NOT EXISTS idx_settings_key ON settings(key)
-    """
-]
+# 连接参数
+DB_BUSY_TIMEOUT = int(os.getenv("DB_BUSY_TIMEOUT", "5000"))  # 毫秒
+DB_CACHE_SIZE = int(os.getenv("DB_CACHE_SIZE", "-16000"))  # 负数表示KB，默认约16MB
+DB_MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", str(256 * 1024 * 1024)))  # 字节
 
 # 默认设置
 DEFAULT_SETTINGS = [
@@ -131,25 +34,37 @@ DEFAULT_SETTINGS = [
 async def get_db_connection():
     """获取数据库连接"""
     conn = await aiosqlite.connect(DB_PATH)
-    # 启用外键约束
-    await conn.execute("PRAGMA foreign_keys = ON")
+    await configure_connection(conn)
     # 设置行工厂为字典
     conn.row_factory = aiosqlite.Row
     return conn
 
 
+async def configure_connection(conn: aiosqlite.Connection) -> None:
+    """为连接设置PRAGMA参数"""
+    # 启用外键约束
+    await conn.execute("PRAGMA foreign_keys = ON")
+    # WAL模式下读写互不阻塞，NORMAL同步级别在WAL下仍能保证数据库一致性
+    await conn.execute("PRAGMA journal_mode = WAL")
+    await conn.execute("PRAGMA synchronous = NORMAL")
+    await conn.execute(f"PRAGMA busy_timeout = {DB_BUSY_TIMEOUT}")
+    await conn.execute(f"PRAGMA cache_size = {DB_CACHE_SIZE}")
+    await conn.execute(f"PRAGMA mmap_size = {DB_MMAP_SIZE}")
+    await conn.execute("PRAGMA temp_store = MEMORY")
+    # 热度计算使用的自定义函数
+    await popularity.register_functions(conn)
+    # 删除章节时移出正文全文索引的触发器使用的函数
+    await content_store.register_functions(conn)
+
+
 async def init_db():
     """初始化数据库"""
     try:
         # 连接数据库
         conn = await get_db_connection()
 
-        # 创建表
-        for create_table_sql in CREATE_TABLES:
-            await conn.execute(create_table_sql)
-
-        # 提交事务
-        await conn.commit()
+        # 执行尚未应用的数据库迁移，结构已是最新版本时不执行任何DDL
+        await run_migrations(conn)
 
         # 检查是否需要插入默认设置
         cursor = await conn.execute("SELECT COUNT(*) as count FROM settings")
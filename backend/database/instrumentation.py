@@ -0,0 +1,327 @@
+import os
+import math
+import time
+import asyncio
+import bisect
+import inspect
+import functools
+import threading
+from collections import deque
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Callable, Deque, Dict, List, Optional, Set
+
+from loguru import logger
+from dotenv import load_dotenv
+
+# 加载环境变量
+load_dotenv()
+
+# 是否记录crud函数的耗时
+QUERY_STATS_ENABLED = os.getenv("QUERY_STATS_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# 单条语句（执行加读取结果）超过该耗时（毫秒）时记录慢查询及其执行计划
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+
+# 内存中保留的最近慢查询条数
+SLOW_QUERY_LOG_SIZE = int(os.getenv("SLOW_QUERY_LOG_SIZE", "100"))
+
+# 耗时直方图的桶上界（毫秒）
+BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# 需要获取执行计划的语句类型
+EXPLAINED_STATEMENTS = ("SELECT", "UPDATE", "DELETE", "INSERT", "WITH")
+
+
+class Histogram:
+    """固定分桶的耗时直方图，分位数取所在桶的上界"""
+
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, ms: float) -> None:
+        self.counts[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+
+    def percentile(self, fraction: float) -> float:
+        rank = math.ceil(fraction * self.count)
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return BUCKETS_MS[index] if index < len(BUCKETS_MS) else self.max
+        return self.max
+
+    def to_dict(self) -> Dict[str, float]:
+        return {
+            "total_ms": round(self.total, 3),
+            "avg_ms": round(self.total / self.count, 3) if self.count else 0.0,
+            "p50_ms": self.percentile(0.5),
+            "p95_ms": self.percentile(0.95),
+            "p99_ms": self.percentile(0.99),
+            "max_ms": round(self.max, 3),
+        }
+
+
+class _CallRecord:
+    """一次crud函数调用中累计的耗时（秒）和行数"""
+
+    __slots__ = ("function", "connect", "execute", "commit", "rows", "statements")
+
+    def __init__(self, function: str):
+        self.function = function
+        self.connect = 0.0
+        self.execute = 0.0
+        self.commit = 0.0
+        self.rows = 0
+        self.statements = 0
+
+
+class _FunctionStats:
+    """一个crud函数的累计统计"""
+
+    def __init__(self):
+        self.total = Histogram()
+        self.connect = Histogram()
+        self.execute = Histogram()
+        self.commit = Histogram()
+        self.errors = 0
+        self.rows = 0
+        self.max_rows = 0
+        self.statements = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        calls = self.total.count
+        return {
+            "calls": calls,
+            "errors": self.errors,
+            "total": self.total.to_dict(),
+            "connect": self.connect.to_dict(),
+            "execute": self.execute.to_dict(),
+            "commit": self.commit.to_dict(),
+            "rows": {
+                "total": self.rows,
+                "avg": round(self.rows / calls, 2) if calls else 0.0,
+                "max": self.max_rows,
+            },
+            "statements_per_call": round(self.statements / calls, 2) if calls else 0.0,
+        }
+
+
+class QueryStats:
+    """按crud函数汇总的耗时统计和最近的慢查询
+
+    爬虫线程中的事件循环也会调用crud，记录时加锁。
+    """
+
+    def __init__(self, slow_log_size: int = SLOW_QUERY_LOG_SIZE):
+        self._lock = threading.Lock()
+        self._functions: Dict[str, _FunctionStats] = {}
+        self._slow: Deque[Dict[str, Any]] = deque(maxlen=slow_log_size)
+        self._since = datetime.now()
+
+    def record_call(self, record: _CallRecord, elapsed: float, failed: bool) -> None:
+        with self._lock:
+            stats = self._functions.get(record.function)
+            if stats is None:
+                stats = self._functions[record.function] = _FunctionStats()
+            stats.total.add(elapsed * 1000)
+            stats.connect.add(record.connect * 1000)
+            stats.execute.add(record.execute * 1000)
+            stats.commit.add(record.commit * 1000)
+            stats.rows += record.rows
+            stats.max_rows = max(stats.max_rows, record.rows)
+            stats.statements += record.statements
+            if failed:
+                stats.errors += 1
+
+    def record_slow(self, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            self._slow.append(entry)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """各函数的统计，按总耗时降序"""
+        with self._lock:
+            functions = {name: stats.to_dict() for name, stats in self._functions.items()}
+            since = self._since
+        ordered = sorted(functions.items(), key=lambda item: item[1]["total"]["total_ms"], reverse=True)
+        return {
+            "since": since.isoformat(),
+            "slow_query_ms": SLOW_QUERY_MS,
+            "functions": dict(ordered),
+        }
+
+    def slow_queries(self) -> List[Dict[str, Any]]:
+        """最近的慢查询，最新的在前"""
+        with self._lock:
+            return list(reversed(self._slow))
+
+    def reset(self) -> None:
+        with self._lock:
+            self._functions.clear()
+            self._slow.clear()
+            self._since = datetime.now()
+
+
+# 全局统计实例
+query_stats = QueryStats()
+
+# 当前正在执行的crud函数调用
+_current: ContextVar[Optional[_CallRecord]] = ContextVar("crud_call", default=None)
+
+# 正在获取执行计划的后台任务，保留引用避免被回收
+_explain_tasks: Set[asyncio.Task] = set()
+
+
+def instrumented(func: Callable) -> Callable:
+    """记录一个crud函数的耗时，函数内的连接获取、语句执行和提交分别累计"""
+    name = func.__name__
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        record = _CallRecord(name)
+        token = _current.set(record)
+        start = time.perf_counter()
+        failed = True
+        try:
+            result = await func(*args, **kwargs)
+            failed = False
+            return result
+        finally:
+            _current.reset(token)
+            query_stats.record_call(record, time.perf_counter() - start, failed)
+
+    return wrapper
+
+
+def instrument_functions(namespace: Dict[str, Any]) -> None:
+    """为模块中定义的所有公开异步函数加上耗时记录，在模块末尾以globals()调用"""
+    if not QUERY_STATS_ENABLED:
+        return
+    module = namespace["__name__"]
+    for name, value in list(namespace.items()):
+        if (not name.startswith("_") and inspect.iscoroutinefunction(value)
+                and getattr(value, "__module__", None) == module):
+            namespace[name] = instrumented(value)
+
+
+def track_connect(seconds: float) -> None:
+    """记录获取连接（连接池借出或写连接排队）的耗时"""
+    record = _current.get()
+    if record is not None:
+        record.connect += seconds
+
+
+def track_commit(seconds: float) -> None:
+    """记录等待提交的耗时"""
+    record = _current.get()
+    if record is not None:
+        record.commit += seconds
+
+
+def wrap_connection(conn):
+    """在crud函数调用中借出的连接包装为计时连接，其他情况原样返回"""
+    if _current.get() is None:
+        return conn
+    return _TimedConnection(conn)
+
+
+class _TimedConnection:
+    """记录execute/executemany耗时的连接包装，其余属性转发给原连接"""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._conn, name)
+
+    async def execute(self, sql: str, parameters: Any = None) -> "_TimedCursor":
+        start = time.perf_counter()
+        cursor = await self._conn.execute(sql, parameters)
+        return _TimedCursor(cursor, sql, parameters, time.perf_counter() - start)
+
+    async def executemany(self, sql: str, parameters: Any) -> "_TimedCursor":
+        parameters = list(parameters)
+        start = time.perf_counter()
+        cursor = await self._conn.executemany(sql, parameters)
+        return _TimedCursor(cursor, sql, parameters[0] if parameters else None, time.perf_counter() - start)
+
+
+class _TimedCursor:
+    """记录读取结果的耗时和行数的游标包装"""
+
+    def __init__(self, cursor, sql: str, parameters: Any, elapsed: float):
+        self._cursor = cursor
+        self._sql = sql
+        self._parameters = parameters
+        self._elapsed = 0.0
+        self._logged = False
+        record = _current.get()
+        if record is not None:
+            record.statements += 1
+        self._observe(elapsed, 0)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._cursor, name)
+
+    async def fetchone(self):
+        start = time.perf_counter()
+        row = await self._cursor.fetchone()
+        self._observe(time.perf_counter() - start, 1 if row is not None else 0)
+        return row
+
+    async def fetchall(self):
+        start = time.perf_counter()
+        rows = await self._cursor.fetchall()
+        self._observe(time.perf_counter() - start, len(rows))
+        return rows
+
+    def _observe(self, elapsed: float, rows: int) -> None:
+        self._elapsed += elapsed
+        record = _current.get()
+        if record is not None:
+            record.execute += elapsed
+            record.rows += rows
+        if not self._logged and self._elapsed * 1000 >= SLOW_QUERY_MS:
+            self._logged = True
+            _log_slow_query(record.function if record else "", self._sql, self._parameters, self._elapsed)
+
+
+def _log_slow_query(function: str, sql: str, parameters: Any, elapsed: float) -> None:
+    """记录慢查询，执行计划在后台用只读连接获取，不占用当前连接"""
+    entry = {
+        "function": function,
+        "sql": " ".join(sql.split()),
+        "elapsed_ms": round(elapsed * 1000, 3),
+        "at": datetime.now().isoformat(),
+        "plan": [],
+    }
+    query_stats.record_slow(entry)
+    if entry["sql"].upper().startswith(EXPLAINED_STATEMENTS):
+        task = asyncio.ensure_future(_explain(entry, sql, parameters))
+        _explain_tasks.add(task)
+        task.add_done_callback(_explain_tasks.discard)
+    else:
+        logger.warning(f"慢查询 [{function}] {entry['elapsed_ms']}ms: {entry['sql']}")
+
+
+async def _explain(entry: Dict[str, Any], sql: str, parameters: Any) -> None:
+    from database.pool import db_pool
+
+    # 后台任务复制了调用方的上下文，获取执行计划的查询不计入调用方
+    _current.set(None)
+    try:
+        async with db_pool.acquire() as conn:
+            cursor = await conn.execute(f"EXPLAIN QUERY PLAN {sql}", parameters)
+            entry["plan"] = [row['detail'] for row in await cursor.fetchall()]
+    except Exception as e:
+        entry["plan"] = [f"获取执行计划失败: {str(e)}"]
+    plan = "".join(f"\n    {detail}" for detail in entry["plan"])
+    logger.warning(f"慢查询 [{entry['function']}] {entry['elapsed_ms']}ms: {entry['sql']}{plan}")
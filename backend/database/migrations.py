@@ -0,0 +1,542 @@
+from datetime import datetime
+from typing import Awaitable, Callable, List, NamedTuple, Union
+
+import aiosqlite
+from loguru import logger
+
+from database.content_store import (
+    PARAGRAPH_SLOTS, migrate_inline_contents, rebuild_content_index, delete_content, purge_orphan_paragraphs
+)
+from database import popularity
+
+# 数据库结构版本记录表
+CREATE_SCHEMA_VERSION = """
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        description TEXT NOT NULL,
+        applied_at TIMESTAMP NOT NULL
+    )
+"""
+
+
+class Migration(NamedTuple):
+    """一次数据库结构变更
+
+    steps中的字符串按SQL执行，可调用对象以连接为参数执行。
+    旧版本的数据库没有版本记录，会从第一个迁移开始执行，因此每个步骤都必须是幂等的。
+    全部步骤在run_migrations开启的同一个事务中执行，步骤不能自行提交。
+    """
+    version: int
+    description: str
+    steps: List[Union[str, Callable[[aiosqlite.Connection], Awaitable[None]]]]
+
+
+async def table_exists(conn: aiosqlite.Connection, name: str) -> bool:
+    """检查表是否存在"""
+    cursor = await conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+        (name,)
+    )
+    return await cursor.fetchone() is not None
+
+
+async def column_exists(conn: aiosqlite.Connection, table: str, column: str) -> bool:
+    """检查表中是否存在某列"""
+    cursor = await conn.execute(f"PRAGMA table_info({table})")
+    return any(row[1] == column for row in await cursor.fetchall())
+
+
+# 基础表结构
+BASE_TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS novels (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        title TEXT NOT NULL,
+        author TEXT,
+        cover TEXT,
+        description TEXT,
+        source TEXT,
+        source_url TEXT,
+        last_update TIMESTAMP,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS chapters (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        novel_id INTEGER NOT NULL,
+        title TEXT NOT NULL,
+        chapter_index INTEGER NOT NULL,
+        content TEXT,
+        source_url TEXT,
+        is_downloaded BOOLEAN DEFAULT 0,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (novel_id) REFERENCES novels(id) ON DELETE CASCADE
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS bookshelf (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        novel_id INTEGER NOT NULL,
+        last_read_chapter_id INTEGER,
+        last_read_position INTEGER DEFAULT 0,
+        added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (novel_id) REFERENCES novels(id) ON DELETE CASCADE,
+        FOREIGN KEY (last_read_chapter_id) REFERENCES chapters(id) ON DELETE SET NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS history (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        novel_id INTEGER NOT NULL,
+        chapter_id INTEGER NOT NULL,
+        read_position INTEGER DEFAULT 0,
+        read_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (novel_id) REFERENCES novels(id) ON DELETE CASCADE,
+        FOREIGN KEY (chapter_id) REFERENCES chapters(id) ON DELETE CASCADE
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS search_history (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        keyword TEXT NOT NULL,
+        search_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS rules (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        source_url TEXT NOT NULL,
+        search_url TEXT NOT NULL,
+        search_result_rule TEXT,
+        cover_rule TEXT,
+        title_rule TEXT NOT NULL,
+        author_rule TEXT,
+        description_rule TEXT,
+        chapter_list_rule TEXT NOT NULL,
+        chapter_content_rule TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS settings (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        key TEXT NOT NULL UNIQUE,
+        value TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_novels_title ON novels(title)",
+    "CREATE INDEX IF NOT EXISTS idx_chapters_novel_id ON chapters(novel_id)",
+    "CREATE INDEX IF NOT EXISTS idx_bookshelf_novel_id ON bookshelf(novel_id)",
+    "CREATE INDEX IF NOT EXISTS idx_history_novel_id ON history(novel_id)",
+    "CREATE INDEX IF NOT EXISTS idx_search_history_keyword ON search_history(keyword)",
+    "CREATE INDEX IF NOT EXISTS idx_rules_name ON rules(name)",
+    "CREATE INDEX IF NOT EXISTS idx_settings_key ON settings(key)",
+]
+
+# 章节正文压缩存储
+CHAPTER_CONTENTS = [
+    """
+    CREATE TABLE IF NOT EXISTS chapter_contents (
+        chapter_id INTEGER PRIMARY KEY,
+        codec TEXT NOT NULL,
+        data BLOB NOT NULL,
+        raw_size INTEGER NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (chapter_id) REFERENCES chapters(id) ON DELETE CASCADE
+    )
+    """
+]
+
+# 小说全文索引（trigram分词对中文友好），由触发器与novels表保持同步
+NOVEL_SEARCH_INDEX = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS novels_fts USING fts5(
+        title, author, description,
+        content='novels', content_rowid='id', tokenize='trigram'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS novels_fts_ai AFTER INSERT ON novels BEGIN
+        INSERT INTO novels_fts (rowid, title, author, description)
+        VALUES (new.id, new.title, new.author, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS novels_fts_ad AFTER DELETE ON novels BEGIN
+        INSERT INTO novels_fts (novels_fts, rowid, title, author, description)
+        VALUES ('delete', old.id, old.title, old.author, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS novels_fts_au AFTER UPDATE OF title, author, description ON novels BEGIN
+        INSERT INTO novels_fts (novels_fts, rowid, title, author, description)
+        VALUES ('delete', old.id, old.title, old.author, old.description);
+        INSERT INTO novels_fts (rowid, title, author, description)
+        VALUES (new.id, new.title, new.author, new.description);
+    END
+    """
+]
+
+# 章节正文全文索引，按段落建立；正文本身压缩保存，索引不保存原文
+CONTENT_SEARCH_INDEX = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS chapter_paragraphs_fts USING fts5(
+        text, book, content='', tokenize='trigram'
+    )
+"""
+
+# 游标分页使用的排序索引
+KEYSET_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_bookshelf_updated_at ON bookshelf(updated_at, id)",
+    "CREATE INDEX IF NOT EXISTS idx_bookshelf_added_at ON bookshelf(added_at, id)",
+    "CREATE INDEX IF NOT EXISTS idx_history_novel_read_at ON history(novel_id, read_at)",
+    "CREATE INDEX IF NOT EXISTS idx_rules_updated_at ON rules(updated_at, id)",
+    "CREATE INDEX IF NOT EXISTS idx_rules_created_at ON rules(created_at, id)",
+]
+
+# 每本小说最新的阅读记录，由history表上的触发器在同一事务中维护
+READING_STATE = [
+    """
+    CREATE TABLE IF NOT EXISTS reading_state (
+        novel_id INTEGER PRIMARY KEY,
+        history_id INTEGER NOT NULL,
+        chapter_id INTEGER NOT NULL,
+        read_position INTEGER DEFAULT 0,
+        read_at TIMESTAMP NOT NULL,
+        FOREIGN KEY (novel_id) REFERENCES novels(id) ON DELETE CASCADE
+    )
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_reading_state_read_at ON reading_state(read_at, history_id)
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS reading_state_ai AFTER INSERT ON history BEGIN
+        INSERT INTO reading_state (novel_id, history_id, chapter_id, read_position, read_at)
+        VALUES (new.novel_id, new.id, new.chapter_id, new.read_position, new.read_at)
+        ON CONFLICT(novel_id) DO UPDATE SET
+            history_id = excluded.history_id,
+            chapter_id = excluded.chapter_id,
+            read_position = excluded.read_position,
+            read_at = excluded.read_at
+        WHERE excluded.read_at >= reading_state.read_at;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS reading_state_au AFTER UPDATE ON history BEGIN
+        INSERT INTO reading_state (novel_id, history_id, chapter_id, read_position, read_at)
+        VALUES (new.novel_id, new.id, new.chapter_id, new.read_position, new.read_at)
+        ON CONFLICT(novel_id) DO UPDATE SET
+            history_id = excluded.history_id,
+            chapter_id = excluded.chapter_id,
+            read_position = excluded.read_position,
+            read_at = excluded.read_at
+        WHERE excluded.read_at >= reading_state.read_at OR reading_state.history_id = excluded.history_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS reading_state_ad AFTER DELETE ON history BEGIN
+        DELETE FROM reading_state WHERE novel_id = old.novel_id AND history_id = old.id;
+        INSERT INTO reading_state (novel_id, history_id, chapter_id, read_position, read_at)
+        SELECT novel_id, id, chapter_id, read_position, read_at FROM history
+        WHERE novel_id = old.novel_id
+          AND NOT EXISTS (SELECT 1 FROM reading_state WHERE novel_id = old.novel_id)
+        ORDER BY read_at DESC, id DESC
+        LIMIT 1;
+    END
+    """
+]
+
+# 为已有历史记录生成阅读状态
+BACKFILL_READING_STATE = """
+    INSERT OR REPLACE INTO reading_state (novel_id, history_id, chapter_id, read_position, read_at)
+    SELECT h.novel_id, h.id, h.chapter_id, h.read_position, h.read_at
+    FROM history h
+    WHERE h.id = (
+        SELECT id FROM history
+        WHERE novel_id = h.novel_id
+        ORDER BY read_at DESC, id DESC
+        LIMIT 1
+    )
+"""
+
+# 小说热度计数，由crud在写入阅读记录和书架时增量维护，score为带时间衰减的log2热度
+POPULARITY = [
+    """
+    CREATE TABLE IF NOT EXISTS novel_popularity (
+        novel_id INTEGER PRIMARY KEY,
+        history_count INTEGER NOT NULL DEFAULT 0,
+        bookshelf_count INTEGER NOT NULL DEFAULT 0,
+        score REAL,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (novel_id) REFERENCES novels(id) ON DELETE CASCADE
+    )
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_novel_popularity_score ON novel_popularity(score)
+    """
+]
+
+# 热点查询的复合索引，单列索引是复合索引的前缀，不再需要
+HOT_QUERY_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_chapters_novel_index ON chapters(novel_id, chapter_index)",
+    "CREATE INDEX IF NOT EXISTS idx_search_history_search_at ON search_history(search_at)",
+    "DROP INDEX IF EXISTS idx_chapters_novel_id",
+    "DROP INDEX IF EXISTS idx_history_novel_id",
+]
+
+# 设置版本号，settings表的任何改动都由触发器在同一事务中递增，其他进程轮询该值判断是否需要重新加载设置
+SETTINGS_VERSION = [
+    """
+    CREATE TABLE IF NOT EXISTS settings_version (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    "INSERT OR IGNORE INTO settings_version (id, version) VALUES (1, 0)",
+    """
+    CREATE TRIGGER IF NOT EXISTS settings_version_ai AFTER INSERT ON settings BEGIN
+        UPDATE settings_version SET version = version + 1 WHERE id = 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS settings_version_au AFTER UPDATE ON settings BEGIN
+        UPDATE settings_version SET version = version + 1 WHERE id = 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS settings_version_ad AFTER DELETE ON settings BEGIN
+        UPDATE settings_version SET version = version + 1 WHERE id = 1;
+    END
+    """
+]
+
+# 同一小说中来源地址相同的章节只保留一条，并发同步目录不会再插入重复章节；
+# 同步目录时会删除源站已移除的章节，外键级联需要按章节ID查找阅读记录和书架
+CHAPTER_SOURCE_URL_INDEXES = [
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_chapters_novel_source_url ON chapters(novel_id, source_url)",
+    "CREATE INDEX IF NOT EXISTS idx_history_chapter_id ON history(chapter_id)",
+    "CREATE INDEX IF NOT EXISTS idx_bookshelf_last_read_chapter_id ON bookshelf(last_read_chapter_id)"
+]
+
+
+# 章节下载任务：任务进度在每批章节保存时与正文在同一事务中更新，重启后从未完成的章节继续；
+# 同一小说同时只能有一个等待或进行中的任务
+DOWNLOAD_JOBS = [
+    """
+    CREATE TABLE IF NOT EXISTS download_jobs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        novel_id INTEGER NOT NULL,
+        rule_id INTEGER NOT NULL,
+        status TEXT NOT NULL DEFAULT 'pending',
+        total_chapters INTEGER NOT NULL DEFAULT 0,
+        done_chapters INTEGER NOT NULL DEFAULT 0,
+        failed_chapters INTEGER NOT NULL DEFAULT 0,
+        downloaded_bytes INTEGER NOT NULL DEFAULT 0,
+        elapsed_seconds REAL NOT NULL DEFAULT 0,
+        error TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        started_at TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        finished_at TIMESTAMP,
+        FOREIGN KEY (novel_id) REFERENCES novels(id) ON DELETE CASCADE
+    )
+    """,
+    """
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_download_jobs_active_novel
+    ON download_jobs(novel_id) WHERE status IN ('pending', 'running')
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_download_jobs_novel_id ON download_jobs(novel_id, id)",
+    "CREATE INDEX IF NOT EXISTS idx_download_jobs_status ON download_jobs(status, id)",
+    """
+    CREATE TABLE IF NOT EXISTS download_job_chapters (
+        job_id INTEGER NOT NULL,
+        chapter_id INTEGER NOT NULL,
+        status TEXT NOT NULL DEFAULT 'pending',
+        bytes INTEGER NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (job_id, chapter_id),
+        FOREIGN KEY (job_id) REFERENCES download_jobs(id) ON DELETE CASCADE,
+        FOREIGN KEY (chapter_id) REFERENCES chapters(id) ON DELETE CASCADE
+    ) WITHOUT ROWID
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_download_job_chapters_chapter_id ON download_job_chapters(chapter_id)",
+]
+
+# 页面的ETag和Last-Modified，刷新详情和目录时发送条件请求，页面未变化（304）时跳过解析和同步
+# 同一地址的详情和目录可能是同一个页面，按任务类型分别保存；rule_version为解析时规则的版本，规则修改后不再使用
+HTTP_VALIDATORS = [
+    """
+    CREATE TABLE IF NOT EXISTS http_validators (
+        url TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        etag TEXT,
+        last_modified TEXT,
+        rule_version TEXT,
+        checked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (url, kind)
+    ) WITHOUT ROWID
+    """,
+]
+
+# 删除章节（包括删除小说时级联删除）前将其正文段落移出无内容全文索引，否则索引中残留已删除章节的段落；
+# 段落由连接上注册的chapter_paragraphs函数（database/content_store.py）解压拆分，
+# 与写入索引时的rowid和值一致。级联删除chapter_contents发生在删除章节之后，因此触发器建在chapters上
+CHAPTER_INDEX_DELETE_TRIGGER = f"""
+    CREATE TRIGGER IF NOT EXISTS chapters_paragraphs_fts_bd BEFORE DELETE ON chapters BEGIN
+        INSERT INTO chapter_paragraphs_fts (chapter_paragraphs_fts, rowid, text, book)
+        SELECT 'delete', OLD.id * {PARAGRAPH_SLOTS} + p.key, p.value, '<' || OLD.novel_id || '>'
+        FROM chapter_contents cc, json_each(chapter_paragraphs(cc.codec, cc.data)) p
+        WHERE cc.chapter_id = OLD.id;
+    END
+"""
+
+
+async def _build_novel_search_index(conn: aiosqlite.Connection) -> None:
+    """创建小说全文索引，首次创建时为已有数据建立索引"""
+    exists = await table_exists(conn, "novels_fts")
+    for sql in NOVEL_SEARCH_INDEX:
+        await conn.execute(sql)
+    if not exists:
+        await conn.execute("INSERT INTO novels_fts (novels_fts) VALUES ('rebuild')")
+        logger.info("已建立小说全文索引")
+
+
+async def _build_content_search_index(conn: aiosqlite.Connection) -> None:
+    """创建章节正文全文索引，并将旧版本保存在chapters表中的正文迁移到压缩存储"""
+    exists = await table_exists(conn, "chapter_paragraphs_fts")
+    await conn.execute(CONTENT_SEARCH_INDEX)
+    if not exists:
+        await rebuild_content_index(conn)
+    await migrate_inline_contents(conn)
+
+
+async def _build_reading_state(conn: aiosqlite.Connection) -> None:
+    """创建阅读状态表，首次创建时从历史记录生成"""
+    exists = await table_exists(conn, "reading_state")
+    for sql in READING_STATE:
+        await conn.execute(sql)
+    if not exists:
+        await conn.execute(BACKFILL_READING_STATE)
+
+
+async def _build_popularity(conn: aiosqlite.Connection) -> None:
+    """创建热度表，首次创建时根据历史记录和书架计算"""
+    exists = await table_exists(conn, "novel_popularity")
+    for sql in POPULARITY:
+        await conn.execute(sql)
+    if not exists:
+        await popularity.rebuild(conn)
+
+
+async def _dedupe_chapters(conn: aiosqlite.Connection) -> None:
+    """合并来源地址重复的章节：优先保留已下载的章节，其次保留最早的一条，引用改指向保留的章节"""
+    cursor = await conn.execute(
+        """
+        SELECT id, keep_id FROM (
+            SELECT id, FIRST_VALUE(id) OVER (
+                PARTITION BY novel_id, source_url ORDER BY is_downloaded DESC, id
+            ) AS keep_id
+            FROM chapters
+            WHERE source_url IS NOT NULL
+        )
+        WHERE id != keep_id
+        """
+    )
+    duplicates = [(row['keep_id'], row['id']) for row in await cursor.fetchall()]
+    if not duplicates:
+        return
+
+    for _, duplicate_id in duplicates:
+        await delete_content(conn, duplicate_id)
+    # 阅读状态由history上的触发器同步
+    await conn.executemany("UPDATE history SET chapter_id = ? WHERE chapter_id = ?", duplicates)
+    await conn.executemany(
+        "UPDATE bookshelf SET last_read_chapter_id = ? WHERE last_read_chapter_id = ?", duplicates
+    )
+    await conn.executemany("DELETE FROM chapters WHERE id = ?", [(duplicate_id,) for _, duplicate_id in duplicates])
+    logger.info(f"已合并 {len(duplicates)} 个来源地址重复的章节")
+
+
+async def _add_chapter_index_delete_trigger(conn: aiosqlite.Connection) -> None:
+    """创建删除章节时维护正文全文索引的触发器，并清理此前删除章节残留的段落"""
+    await conn.execute(CHAPTER_INDEX_DELETE_TRIGGER)
+    await purge_orphan_paragraphs(conn)
+
+
+async def _add_cleaning_rules(conn: aiosqlite.Connection) -> None:
+    """为规则表添加正文清理配置列，JSON格式见utils/content_cleaner.py"""
+    if not await column_exists(conn, "rules", "cleaning_rules"):
+        await conn.execute("ALTER TABLE rules ADD COLUMN cleaning_rules TEXT")
+
+
+# 按版本号排列的全部迁移，新的结构变更只能追加到末尾
+MIGRATIONS = [
+    Migration(1, "基础表结构", BASE_TABLES),
+    Migration(2, "章节正文压缩存储", CHAPTER_CONTENTS),
+    Migration(3, "小说全文索引", [_build_novel_search_index]),
+    Migration(4, "章节正文全文索引", [_build_content_search_index]),
+    Migration(5, "游标分页索引", KEYSET_INDEXES),
+    Migration(6, "阅读状态表", [_build_reading_state]),
+    Migration(7, "小说热度表", [_build_popularity]),
+    Migration(8, "热点查询复合索引", HOT_QUERY_INDEXES),
+    Migration(9, "设置版本号", SETTINGS_VERSION),
+    Migration(10, "章节来源地址唯一索引", [_dedupe_chapters, *CHAPTER_SOURCE_URL_INDEXES]),
+    Migration(11, "规则正文清理配置", [_add_cleaning_rules]),
+    Migration(12, "章节下载任务", DOWNLOAD_JOBS),
+    Migration(13, "页面条件请求验证信息", HTTP_VALIDATORS),
+    Migration(14, "删除章节时维护正文全文索引", [_add_chapter_index_delete_trigger]),
+]
+
+# 当前代码对应的数据库结构版本
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+async def get_schema_version(conn: aiosqlite.Connection) -> int:
+    """读取数据库当前的结构版本，未记录版本时返回0"""
+    if not await table_exists(conn, "schema_version"):
+        return 0
+    cursor = await conn.execute("SELECT MAX(version) AS version FROM schema_version")
+    row = await cursor.fetchone()
+    return row['version'] or 0
+
+
+async def run_migrations(conn: aiosqlite.Connection) -> int:
+    """执行尚未应用的迁移，返回迁移后的结构版本"""
+    current = await get_schema_version(conn)
+    if current >= LATEST_VERSION:
+        if current > LATEST_VERSION:
+            logger.warning(f"数据库结构版本 {current} 高于程序支持的版本 {LATEST_VERSION}")
+        return current
+
+    for migration in MIGRATIONS:
+        if migration.version <= current:
+            continue
+        # 每个迁移的全部步骤和版本记录在同一个事务中执行，失败时整体回滚且不记录版本，下次启动重新执行
+        await conn.execute("BEGIN IMMEDIATE")
+        try:
+            await conn.execute(CREATE_SCHEMA_VERSION)
+            for step in migration.steps:
+                if isinstance(step, str):
+                    await conn.execute(step)
+                else:
+                    await step(conn)
+                if not conn.in_transaction:
+                    # 步骤自行提交后，之后的失败无法回滚已提交的部分
+                    raise RuntimeError(f"数据库迁移 {migration.version} 的步骤提交了迁移事务")
+            await conn.execute(
+                "INSERT OR REPLACE INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)",
+                (migration.version, migration.description, datetime.now())
+            )
+            await conn.commit()
+        except Exception:
+            await conn.rollback()
+            raise
+        logger.info(f"已应用数据库迁移 {migration.version}: {migration.description}")
+    return LATEST_VERSION
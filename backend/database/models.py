@@ -1,6 +1,10 @@
+import re
+import json
 from datetime import datetime
 from typing import Optional, List
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
+
+from utils.content_cleaner import validate_pattern
 
 
 class NovelBase(BaseModel):
@@ -102,6 +106,23 @@ class History(HistoryBase):
         from_attributes = True
 
 
+class CleaningRules(BaseModel):
+    """规则的正文清理配置"""
+    phrases: List[str] = Field(default_factory=list, description="要删除的广告短语，按字面匹配，不区分大小写")
+    patterns: List[str] = Field(default_factory=list, description="要删除的广告正则，不区分大小写")
+    use_defaults: bool = Field(True, description="是否同时使用内置的广告短语和正则")
+
+    @field_validator('patterns')
+    @classmethod
+    def check_patterns(cls, patterns: List[str]) -> List[str]:
+        for pattern in patterns:
+            try:
+                validate_pattern(pattern)
+            except re.error as e:
+                raise ValueError(f"无效的正则 {pattern}: {str(e)}")
+        return patterns
+
+
 class RuleBase(BaseModel):
     """规则基本信息模型"""
     name: str
@@ -114,6 +135,15 @@ class RuleBase(BaseModel):
     description_rule: Optional[str] = None
     chapter_list_rule: str
     chapter_content_rule: str
+    cleaning_rules: Optional[CleaningRules] = None
+
+    @field_validator('cleaning_rules', mode='before')
+    @classmethod
+    def parse_cleaning_rules(cls, value):
+        # 数据库中以JSON文本保存
+        if isinstance(value, str):
+            return json.loads(value) if value else None
+        return value
 
 
 class RuleCreate(RuleBase):
@@ -181,9 +211,51 @@ class SearchResult(BaseModel):
     source_url: str
 
 
-class PaginatedResponse(BaseModel):
-    """分页响应模型"""
-    total: int
+class ContentSearchHit(BaseModel):
+    """正文搜索命中模型"""
+    novel_id: int
+    novel_title: str
+    chapter_id: int
+    chapter_title: str
+    chapter_index: int
+    paragraph_index: int
+    position: int
+    snippet: str
+
+
+class ContentSearchResponse(BaseModel):
+    """正文搜索响应模型"""
     page: int
     page_size: int
+    has_more: bool
+    data: List[ContentSearchHit]
+
+
+class DownloadJob(BaseModel):
+    """章节下载任务模型，速度按累计的下载时间计算，不含排队和服务停止的时间"""
+    id: int
+    novel_id: int
+    rule_id: int
+    status: str
+    total_chapters: int
+    done_chapters: int
+    failed_chapters: int
+    downloaded_bytes: int
+    elapsed_seconds: float
+    progress: float = 0
+    chapters_per_second: float = 0
+    bytes_per_second: float = 0
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    updated_at: datetime
+    finished_at: Optional[datetime] = None
+
+
+class PaginatedResponse(BaseModel):
+    """分页响应模型，游标分页时不返回total和page"""
+    total: Optional[int] = None
+    page: Optional[int] = None
+    page_size: int
     data: List
+    next_cursor: Optional[str] = None
@@ -0,0 +1,36 @@
+import json
+import base64
+from typing import Any, List, Optional, Sequence
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """将排序键编码为不透明的分页游标"""
+    raw = json.dumps(list(values), ensure_ascii=False, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> Optional[List[Any]]:
+    """解码分页游标，空游标表示第一页"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8"))
+    except (ValueError, UnicodeError):
+        raise ValueError("无效的分页游标")
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("无效的分页游标")
+    return values
+
+
+def keyset_condition(columns: Sequence[str], descending: bool) -> str:
+    """生成游标之后的行的过滤条件"""
+    op = "<" if descending else ">"
+    placeholders = ", ".join("?" for _ in columns)
+    return f"({', '.join(columns)}) {op} ({placeholders})"
+
+
+def keyset_order(columns: Sequence[str], descending: bool) -> str:
+    """生成与游标条件一致的排序子句"""
+    direction = "DESC" if descending else "ASC"
+    return "ORDER BY " + ", ".join(f"{column} {direction}" for column in columns)
@@ -0,0 +1,128 @@
+import os
+import time
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List, Optional
+
+import aiosqlite
+from loguru import logger
+from dotenv import load_dotenv
+
+from database import init_db
+from database.instrumentation import track_connect, wrap_connection
+
+# 加载环境变量
+load_dotenv()
+
+# 连接池大小
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "4"))
+
+
+class ConnectionPool:
+    """SQLite连接池
+
+    连接在启动时预先创建并配置好PRAGMA，请求期间借出、用完归还，
+    避免每次CRUD操作都新建aiosqlite工作线程和打开数据库文件。
+    read_only为True时连接设置PRAGMA query_only，写操作统一交给database.writer。
+    """
+
+    def __init__(self, size: int = DB_POOL_SIZE, read_only: bool = False):
+        self.size = max(1, size)
+        self.read_only = read_only
+        self._idle: Optional[asyncio.Queue] = None
+        self._connections: List[aiosqlite.Connection] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._closed = False
+
+    @property
+    def is_open(self) -> bool:
+        """连接池是否已打开"""
+        return self._loop is not None and not self._closed
+
+    async def open(self) -> None:
+        """打开连接池并预热连接"""
+        if self.is_open:
+            return
+        self._closed = False
+        self._loop = asyncio.get_running_loop()
+        self._idle = asyncio.Queue()
+        for _ in range(self.size):
+            conn = await self._connect()
+            self._connections.append(conn)
+            self._idle.put_nowait(conn)
+        logger.info(f"数据库连接池已打开: {self.size} 个连接")
+
+    async def close(self) -> None:
+        """关闭连接池中的所有连接"""
+        if self._closed or self._loop is None:
+            return
+        self._closed = True
+        # 等待借出的连接归还后再关闭
+        while self._idle.qsize() < len(self._connections):
+            await asyncio.sleep(0.01)
+        for conn in self._connections:
+            try:
+                await conn.close()
+            except Exception as e:
+                logger.error(f"关闭数据库连接失败: {str(e)}")
+        self._connections.clear()
+        self._idle = None
+        self._loop = None
+        logger.info("数据库连接池已关闭")
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[aiosqlite.Connection]:
+        """借出一个连接，退出上下文时自动归还"""
+        if self._closed:
+            raise RuntimeError("数据库连接池已关闭")
+
+        # 爬虫运行在Twisted线程的事件循环中，连接池的队列只能在创建它的事件循环中使用，
+        # 其他事件循环退回到临时连接
+        start = time.perf_counter()
+        if self._loop is not None and asyncio.get_running_loop() is not self._loop:
+            conn = await self._connect()
+            track_connect(time.perf_counter() - start)
+            try:
+                yield wrap_connection(conn)
+            finally:
+                await conn.close()
+            return
+
+        if self._loop is None:
+            # 未在启动时打开（如脚本中直接调用crud），按需打开
+            await self.open()
+
+        conn = await self._idle.get()
+        track_connect(time.perf_counter() - start)
+        try:
+            yield wrap_connection(conn)
+        finally:
+            await self._release(conn)
+
+    async def _connect(self) -> aiosqlite.Connection:
+        """新建一个连接"""
+        conn = await init_db.get_db_connection()
+        if self.read_only:
+            await conn.execute("PRAGMA query_only = ON")
+        return conn
+
+    async def _release(self, conn: aiosqlite.Connection) -> None:
+        """归还连接，回滚未提交的事务"""
+        try:
+            if conn.in_transaction:
+                await conn.rollback()
+        except Exception as e:
+            # 连接已损坏，替换为新连接
+            logger.error(f"回滚数据库连接失败，重建连接: {str(e)}")
+            self._connections.remove(conn)
+            try:
+                await conn.close()
+            except Exception:
+                pass
+            conn = await self._connect()
+            self._connections.append(conn)
+        self._idle.put_nowait(conn)
+
+
+# 全局只读连接池实例
+db_pool = ConnectionPool(read_only=True)
@@ -0,0 +1,154 @@
+import os
+import math
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Union
+
+import aiosqlite
+from loguru import logger
+from dotenv import load_dotenv
+
+# 加载环境变量
+load_dotenv()
+
+# 热度权重：阅读记录与书架收藏
+HISTORY_WEIGHT = 0.7
+BOOKSHELF_WEIGHT = 0.3
+
+# 热度半衰期（天），越早的阅读行为对热度的贡献越小
+HALF_LIFE_DAYS = float(os.getenv("POPULARITY_HALF_LIFE_DAYS", "7"))
+
+# 热度计算的时间基准
+EPOCH = datetime(2024, 1, 1)
+
+# 热度分数以log2保存：score = log2(Σ 权重 * 2^((事件时间 - EPOCH) / 半衰期))
+# 对所有小说按同一时刻衰减不改变排序，因此无需定期衰减全表，也不会数值溢出
+
+
+def _parse_time(value: Union[datetime, str, None]) -> datetime:
+    """解析数据库中的时间字段"""
+    if isinstance(value, datetime):
+        return value
+    if value:
+        try:
+            return datetime.fromisoformat(str(value))
+        except ValueError:
+            pass
+    return datetime.now()
+
+
+def event_score(weight: float, at: Union[datetime, str, None] = None) -> float:
+    """单次事件的log2热度贡献"""
+    days = (_parse_time(at) - EPOCH).total_seconds() / 86400
+    return math.log2(weight) + days / HALF_LIFE_DAYS
+
+
+def log2_add(score: Optional[float], delta: Optional[float]) -> Optional[float]:
+    """在log2空间中累加热度"""
+    if score is None:
+        return delta
+    if delta is None:
+        return score
+    high, low = max(score, delta), min(score, delta)
+    return high + math.log2(1 + 2 ** (low - high))
+
+
+def log2_sub(score: Optional[float], delta: Optional[float]) -> Optional[float]:
+    """在log2空间中扣减热度，扣减到零时返回None"""
+    if score is None or delta is None:
+        return score
+    # 浮点误差范围内视为全部扣除
+    if delta >= score - 1e-9:
+        return None
+    return score + math.log2(1 - 2 ** (delta - score))
+
+
+async def register_functions(conn: aiosqlite.Connection) -> None:
+    """在连接上注册热度计算函数"""
+    await conn.create_function("log2_add", 2, log2_add, deterministic=True)
+    await conn.create_function("log2_sub", 2, log2_sub, deterministic=True)
+
+
+async def ensure_row(conn: aiosqlite.Connection, novel_id: int) -> None:
+    """为小说创建热度记录"""
+    await conn.execute(
+        "INSERT OR IGNORE INTO novel_popularity (novel_id) VALUES (?)",
+        (novel_id,)
+    )
+
+
+async def record_event(
+    conn: aiosqlite.Connection,
+    novel_id: int,
+    weight: float,
+    at: Union[datetime, str, None] = None,
+    history_delta: int = 0,
+    bookshelf_delta: int = 0,
+    removed: bool = False
+) -> None:
+    """增量更新小说热度，调用方负责提交事务"""
+    await ensure_row(conn, novel_id)
+    func = "log2_sub" if removed else "log2_add"
+    await conn.execute(
+        f"""
+        UPDATE novel_popularity
+        SET history_count = MAX(0, history_count + ?),
+            bookshelf_count = MAX(0, bookshelf_count + ?),
+            score = {func}(score, ?),
+            updated_at = ?
+        WHERE novel_id = ?
+        """,
+        (history_delta, bookshelf_delta, event_score(weight, at), datetime.now(), novel_id)
+    )
+
+
+async def rebuild(conn: aiosqlite.Connection, novel_ids: Optional[Iterable[int]] = None) -> int:
+    """根据历史记录和书架重新计算热度，novel_ids为空时重算全部小说，调用方负责提交事务"""
+    if novel_ids is None:
+        cursor = await conn.execute("SELECT id FROM novels")
+    else:
+        requested = list(novel_ids)
+        if not requested:
+            return 0
+        cursor = await conn.execute(
+            f"SELECT id FROM novels WHERE id IN ({', '.join('?' for _ in requested)})",
+            requested
+        )
+    ids = [row['id'] for row in await cursor.fetchall()]
+    if not ids:
+        return 0
+
+    stats: Dict[int, list] = {novel_id: [0, 0, None] for novel_id in ids}
+    placeholders = ", ".join("?" for _ in ids)
+    cursor = await conn.execute(
+        f"SELECT novel_id, read_at FROM history WHERE novel_id IN ({placeholders})",
+        ids
+    )
+    for row in await cursor.fetchall():
+        item = stats[row['novel_id']]
+        item[0] += 1
+        item[2] = log2_add(item[2], event_score(HISTORY_WEIGHT, row['read_at']))
+    cursor = await conn.execute(
+        f"SELECT novel_id, added_at FROM bookshelf WHERE novel_id IN ({placeholders})",
+        ids
+    )
+    for row in await cursor.fetchall():
+        item = stats[row['novel_id']]
+        item[1] += 1
+        item[2] = log2_add(item[2], event_score(BOOKSHELF_WEIGHT, row['added_at']))
+
+    now = datetime.now()
+    await conn.executemany(
+        """
+        INSERT INTO novel_popularity (novel_id, history_count, bookshelf_count, score, updated_at)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(novel_id) DO UPDATE SET
+            history_count = excluded.history_count,
+            bookshelf_count = excluded.bookshelf_count,
+            score = excluded.score,
+            updated_at = excluded.updated_at
+        """,
+        [(novel_id, item[0], item[1], item[2], now) for novel_id, item in stats.items()]
+    )
+    if novel_ids is None:
+        logger.info(f"已重新计算 {len(ids)} 本小说的热度")
+    return len(ids)
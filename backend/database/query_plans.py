@@ -0,0 +1,202 @@
+"""热点查询的执行计划检查
+
+在临时数据库上执行crud.py中的热点操作，记录实际发出的SQL，
+逐条运行EXPLAIN QUERY PLAN，检查是否存在全表扫描或临时排序。
+新增查询或调整索引后运行，发现问题时以非零状态退出。
+
+运行方式（在backend目录下）:
+    python -m database.query_plans
+"""
+import os
+import re
+import sys
+import asyncio
+import tempfile
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from database import init_db
+
+# 执行计划中需要报告的问题: 未使用索引的全表扫描和临时排序
+FULL_SCAN = re.compile(r"^SCAN \S+$")
+TEMP_SORT = re.compile(r"USE TEMP B-TREE FOR (ORDER BY|GROUP BY|DISTINCT)")
+
+# 需要检查的语句类型
+CHECKED_STATEMENTS = ("SELECT", "UPDATE", "DELETE", "WITH")
+
+# FTS5模块内部对影子表的查询
+INTERNAL_STATEMENT = re.compile(r"'main'\.'\w+'")
+
+
+class PlanIssue(NamedTuple):
+    """执行计划中的一个问题"""
+    query: str
+    sql: str
+    detail: str
+
+
+# 允许的例外: 操作名 -> 允许出现的计划片段
+# 全文检索按bm25排序只能在匹配结果上排序；清空类操作本身就要遍历整张表；
+# 设置快照首次读取时整体加载settings表；下载任务启动时只对未完成的任务、
+# 或一个任务的待下载章节排序一次
+ALLOWED = {
+    "search_novels": ["USE TEMP B-TREE FOR ORDER BY"],
+    "clear_all_history": ["SCAN history"],
+    "get_setting": ["SCAN settings"],
+    "get_active_download_jobs": ["USE TEMP B-TREE FOR ORDER BY"],
+    "get_pending_job_chapters": ["USE TEMP B-TREE FOR ORDER BY"],
+}
+
+
+async def _seed() -> Dict[str, int]:
+    """写入覆盖各个热点查询的样例数据"""
+    from database import crud
+    from database.models import NovelCreate, ChapterCreate, BookshelfCreate, HistoryCreate, RuleCreate, \
+        SearchHistoryCreate
+
+    novel_ids = []
+    for i in range(3):
+        novel_id = await crud.create_novel(NovelCreate(title=f"示例小说{i}", author="作者", description="简介"))
+        await crud.create_chapters_bulk([
+            ChapterCreate(
+                novel_id=novel_id, title=f"第{index + 1}章", chapter_index=index,
+                source_url=f"https://example.com/{novel_id}/{index}", content="第一段正文\n第二段正文"
+            )
+            for index in range(5)
+        ])
+        novel_ids.append(novel_id)
+    chapters = await crud.get_novel_chapters(novel_ids[0])
+    await crud.add_to_bookshelf(BookshelfCreate(novel_id=novel_ids[0], last_read_chapter_id=chapters[0]['id']))
+    history_id = await crud.add_history(HistoryCreate(novel_id=novel_ids[0], chapter_id=chapters[0]['id']))
+    await crud.add_search_history(SearchHistoryCreate(keyword="示例"))
+    rule_id = await crud.create_rule(RuleCreate(
+        name="示例规则", source_url="https://example.com", search_url="https://example.com/search?q={keyword}",
+        title_rule="h1", chapter_list_rule="#list a", chapter_content_rule="#content"
+    ))
+    job, _ = await crud.create_download_job(novel_ids[1], rule_id)
+    job_chapters = await crud.get_novel_chapters(novel_ids[1])
+    await crud.add_download_job_chapters(job['id'], [chapter['id'] for chapter in job_chapters])
+    return {
+        "novel_id": novel_ids[0],
+        "chapter_id": chapters[0]['id'],
+        "history_id": history_id,
+        "rule_id": rule_id,
+        "job_novel_id": novel_ids[1],
+        "job_id": job['id'],
+        "job_chapter_id": job_chapters[0]['id'],
+    }
+
+
+def _hot_queries(ids: Dict[str, int]) -> List[Tuple[str, Callable[[], Awaitable]]]:
+    """需要检查的热点操作"""
+    from database import crud
+    from database.models import ChapterCreate, HistoryCreate, SearchHistoryCreate
+
+    novel_id, chapter_id = ids["novel_id"], ids["chapter_id"]
+    # 新增、改名、移动和移除各一章
+    catalog = [
+        ChapterCreate(novel_id=novel_id, title="改名章节" if index == 1 else f"第{index + 1}章",
+                      chapter_index=index + 1 if index == 2 else index,
+                      source_url=f"https://example.com/{novel_id}/{index}")
+        for index in range(6) if index != 4
+    ]
+    return [
+        ("get_novel", lambda: crud.get_novel(novel_id)),
+        ("search_novels", lambda: crud.search_novels("示例小说")),
+        ("get_hot_novels", lambda: crud.get_hot_novels()),
+        ("get_chapter", lambda: crud.get_chapter(chapter_id)),
+        ("get_novel_chapters", lambda: crud.get_novel_chapters(novel_id)),
+        ("sync_chapter_catalog", lambda: crud.sync_chapter_catalog(novel_id, catalog)),
+        ("update_chapter_content", lambda: crud.update_chapter_content(chapter_id, "新的正文")),
+        ("search_chapter_content", lambda: crud.search_chapter_content("段正文", novel_id)),
+        ("get_bookshelf", lambda: crud.get_bookshelf()),
+        ("get_bookshelf_by_cursor", lambda: crud.get_bookshelf_by_cursor("", 1)),
+        ("add_history", lambda: crud.add_history(HistoryCreate(novel_id=novel_id, chapter_id=chapter_id))),
+        ("get_history", lambda: crud.get_history()),
+        ("get_history_by_cursor", lambda: crud.get_history_by_cursor("", 1)),
+        ("add_search_history", lambda: crud.add_search_history(SearchHistoryCreate(keyword="示例"))),
+        ("get_search_history", lambda: crud.get_search_history()),
+        ("get_rules", lambda: crud.get_rules()),
+        ("get_rules_by_cursor", lambda: crud.get_rules_by_cursor("", 1)),
+        ("get_rule", lambda: crud.get_rule(ids["rule_id"])),
+        ("create_download_job", lambda: crud.create_download_job(ids["job_novel_id"], ids["rule_id"])),
+        ("get_download_job", lambda: crud.get_download_job(ids["job_id"])),
+        ("get_latest_download_job", lambda: crud.get_latest_download_job(ids["job_novel_id"])),
+        ("get_download_jobs", lambda: crud.get_download_jobs("running")),
+        ("get_active_download_jobs", lambda: crud.get_active_download_jobs()),
+        ("get_pending_job_chapters", lambda: crud.get_pending_job_chapters(ids["job_id"])),
+        ("save_download_batch", lambda: crud.save_download_batch(
+            ids["job_id"], [(ids["job_chapter_id"], "下载的正文"), (ids["job_chapter_id"] + 1, None)], 0.5
+        )),
+        ("update_download_job_status", lambda: crud.update_download_job_status(ids["job_id"], "running")),
+        ("save_http_validators", lambda: crud.save_http_validators(
+            "https://example.com/book", "chapters", '"v1"', None, "2024-01-01 00:00:00"
+        )),
+        ("get_http_validators", lambda: crud.get_http_validators("https://example.com/book", "chapters")),
+        ("delete_http_validators", lambda: crud.delete_http_validators("https://example.com/book")),
+        ("get_setting", lambda: crud.get_setting("theme")),
+        ("update_settings", lambda: crud.update_settings({"theme": "dark"})),
+        ("delete_history", lambda: crud.delete_history(ids["history_id"])),
+        ("clear_all_history", lambda: crud.clear_all_history()),
+    ]
+
+
+def _is_allowed(query: str, detail: str) -> bool:
+    """是否为允许的例外"""
+    return any(detail.startswith(allowed) for allowed in ALLOWED.get(query, []))
+
+
+async def check_query_plans(db_path: Optional[str] = None) -> List[PlanIssue]:
+    """在临时数据库上检查热点查询的执行计划，返回发现的问题，db_path为空时在临时目录中创建数据库"""
+    from database.pool import db_pool
+    from database.writer import db_writer
+
+    init_db.DB_PATH = db_path or os.path.join(tempfile.mkdtemp(prefix="localbooks_plans_"), "plans.db")
+    await init_db.init_db()
+    await db_pool.open()
+    await db_writer.open()
+
+    # 记录每个操作实际执行的SQL
+    statements: List[Tuple[str, str]] = []
+    current = [""]
+    try:
+        ids = await _seed()
+        for conn in db_pool._connections + [db_writer._conn]:
+            await conn.set_trace_callback(lambda sql: statements.append((current[0], sql)))
+        for name, call in _hot_queries(ids):
+            current[0] = name
+            await call()
+    finally:
+        await db_writer.close()
+        await db_pool.close()
+
+    issues = []
+    seen = set()
+    conn = await init_db.get_db_connection()
+    try:
+        for query, sql in statements:
+            sql = sql.strip()
+            if not sql.upper().startswith(CHECKED_STATEMENTS) or INTERNAL_STATEMENT.search(sql):
+                continue
+            if (query, sql) in seen:
+                continue
+            seen.add((query, sql))
+            cursor = await conn.execute(f"EXPLAIN QUERY PLAN {sql}")
+            for row in await cursor.fetchall():
+                detail = row['detail']
+                if (FULL_SCAN.search(detail) or TEMP_SORT.search(detail)) and not _is_allowed(query, detail):
+                    issues.append(PlanIssue(query, " ".join(sql.split()), detail))
+    finally:
+        await conn.close()
+    return issues
+
+
+async def main() -> int:
+    issues = await check_query_plans()
+    for issue in issues:
+        print(f"[{issue.query}] {issue.detail}\n    {issue.sql}")
+    print(f"发现 {len(issues)} 个执行计划问题" if issues else "全部热点查询均使用索引")
+    return 1 if issues else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
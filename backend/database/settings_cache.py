@@ -0,0 +1,104 @@
+import os
+import time
+from typing import Dict, Iterable, Optional
+
+import aiosqlite
+from loguru import logger
+from dotenv import load_dotenv
+
+from database.pool import db_pool
+
+# 加载环境变量
+load_dotenv()
+
+# 检查设置版本号的最短间隔（秒），用于发现其他进程写入的设置
+SETTINGS_POLL_INTERVAL = float(os.getenv("SETTINGS_POLL_INTERVAL", "1"))
+
+
+async def read_version(conn: aiosqlite.Connection) -> int:
+    """读取设置版本号"""
+    cursor = await conn.execute("SELECT version FROM settings_version WHERE id = 1")
+    row = await cursor.fetchone()
+    return row['version'] if row else 0
+
+
+class SettingsSnapshot:
+    """进程内的设置快照
+
+    设置在首次读取时整体加载到内存，此后读取直接返回内存中的值。
+    本进程通过crud.update_settings写入时同步更新快照（写穿透）；
+    settings表的每次改动都会由触发器递增settings_version中的版本号，
+    读取时最多每隔poll_interval秒查询一次版本号，发现其他进程修改过设置后重新加载。
+    """
+
+    def __init__(self, poll_interval: float = SETTINGS_POLL_INTERVAL):
+        self.poll_interval = poll_interval
+        self._values: Optional[Dict[str, str]] = None
+        self._version = -1
+        self._checked_at = 0.0
+
+    @property
+    def version(self) -> int:
+        """快照对应的设置版本号，未加载时为-1"""
+        return self._version
+
+    async def get(self, key: str) -> Optional[str]:
+        """获取单个设置值"""
+        values = await self._current()
+        return values.get(key)
+
+    async def get_many(self, keys: Iterable[str]) -> Dict[str, str]:
+        """获取多个设置值，不存在的键不出现在结果中"""
+        values = await self._current()
+        return {key: values[key] for key in keys if key in values}
+
+    async def get_all(self) -> Dict[str, str]:
+        """获取所有设置"""
+        values = await self._current()
+        return dict(values)
+
+    def apply(self, values: Dict[str, str], before: int, after: int) -> None:
+        """写穿透：本进程提交设置后更新快照
+
+        before和after是写事务前后的版本号，快照版本与before一致说明期间没有其他写入，
+        可以直接合并；否则说明快照已落后，丢弃后在下次读取时重新加载。
+        """
+        if self._values is not None and self._version == before:
+            self._values.update(values)
+            self._version = after
+            self._checked_at = time.monotonic()
+        else:
+            self.invalidate()
+
+    def invalidate(self) -> None:
+        """丢弃快照，下次读取时重新加载"""
+        self._values = None
+        self._version = -1
+
+    async def _current(self) -> Dict[str, str]:
+        """返回最新的快照，必要时重新加载"""
+        if self._values is None:
+            await self.reload()
+        elif time.monotonic() - self._checked_at >= self.poll_interval:
+            self._checked_at = time.monotonic()
+            async with db_pool.acquire() as conn:
+                version = await read_version(conn)
+            if version != self._version:
+                await self.reload()
+        return self._values
+
+    async def reload(self) -> None:
+        """从数据库重新加载全部设置"""
+        async with db_pool.acquire() as conn:
+            # 先读版本号再读设置，两次查询之间若有写入，快照只会比版本号新，下次检查时再加载一次
+            version = await read_version(conn)
+            cursor = await conn.execute("SELECT key, value FROM settings")
+            values = {row['key']: row['value'] for row in await cursor.fetchall()}
+        self._values = values
+        self._version = version
+        self._checked_at = time.monotonic()
+        logger.debug(f"已加载设置快照: {len(values)} 项，版本 {version}")
+
+
+# 全局设置快照实例
+settings_snapshot = SettingsSnapshot()
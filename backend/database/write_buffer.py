@@ -0,0 +1,153 @@
+import os
+import asyncio
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from aiosqlite import IntegrityError
+from loguru import logger
+from dotenv import load_dotenv
+
+from database import crud
+from database.models import HistoryCreate
+
+# 加载环境变量
+load_dotenv()
+
+# 定时刷新间隔（秒）
+WRITE_BUFFER_INTERVAL = float(os.getenv("WRITE_BUFFER_INTERVAL", "2"))
+
+# 缓冲的写入超过该数量时立即刷新
+WRITE_BUFFER_MAX_PENDING = int(os.getenv("WRITE_BUFFER_MAX_PENDING", "200"))
+
+
+class WriteBehindBuffer:
+    """阅读进度和搜索历史的延迟写入缓冲
+
+    阅读器每次翻页都会上报阅读位置，搜索时也会记录关键词。写入先按键合并在内存中，
+    同一章节、同一关键词只保留最后一次，再定时或在关闭时以一个事务批量写入数据库。
+    读取这些数据的接口在查询前调用flush()，因此总能看到最新的值。
+    """
+
+    def __init__(self, interval: float = WRITE_BUFFER_INTERVAL, max_pending: int = WRITE_BUFFER_MAX_PENDING):
+        self.interval = interval
+        self.max_pending = max_pending
+        # (小说ID, 章节ID) -> (阅读记录, 阅读时间)
+        self._history: Dict[Tuple[int, int], Tuple[HistoryCreate, datetime]] = {}
+        # 关键词 -> 搜索时间
+        self._searches: Dict[str, datetime] = {}
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        # 缓冲已满时触发的后台刷新，同时只运行一个；保留引用，避免任务在运行中被回收
+        self._flush_task: Optional[asyncio.Task] = None
+
+    @property
+    def pending(self) -> int:
+        """尚未写入数据库的条数"""
+        return len(self._history) + len(self._searches)
+
+    def add_history(self, history: HistoryCreate) -> None:
+        """缓冲一条阅读记录"""
+        self._history[(history.novel_id, history.chapter_id)] = (history, datetime.now())
+        self._flush_if_full()
+
+    def add_search(self, keyword: str) -> None:
+        """缓冲一条搜索历史"""
+        self._searches[keyword] = datetime.now()
+        self._flush_if_full()
+
+    def _flush_if_full(self) -> None:
+        if self.pending < self.max_pending or self._task is None:
+            return
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_quietly())
+
+    async def _flush_quietly(self) -> None:
+        """后台刷新，失败时已记录日志并放回缓冲，等待下次重试"""
+        try:
+            await self.flush()
+        except Exception:
+            pass
+
+    async def flush(self) -> int:
+        """将缓冲的写入批量提交到数据库，返回写入条数"""
+        async with self._lock:
+            if not self.pending:
+                return 0
+            history, self._history = self._history, {}
+            searches, self._searches = self._searches, {}
+            # 阅读记录和搜索历史分别写入，一方失败不影响另一方
+            written = 0
+            errors = []
+            try:
+                written += await crud.add_history_batch(list(history.values()))
+            except IntegrityError as e:
+                # 违反约束的数据重试也不会成功，丢弃而不放回缓冲，避免之后的每次刷新都失败
+                logger.error(f"丢弃无法写入的阅读记录: {len(history)} 条, {str(e)}")
+            except Exception as e:
+                self._requeue(self._history, history)
+                errors.append(e)
+                logger.error(f"批量写入阅读记录失败: {str(e)}")
+            try:
+                written += await crud.add_search_history_batch(list(searches.items()))
+            except IntegrityError as e:
+                # 违反约束的数据重试也不会成功，丢弃而不放回缓冲，避免之后的每次刷新都失败
+                logger.error(f"丢弃无法写入的搜索历史: {len(searches)} 条, {str(e)}")
+            except Exception as e:
+                self._requeue(self._searches, searches)
+                errors.append(e)
+                logger.error(f"批量写入搜索历史失败: {str(e)}")
+            if errors:
+                raise errors[0]
+            logger.debug(f"已批量写入 {written} 条阅读记录和搜索历史")
+            return written
+
+    @staticmethod
+    def _requeue(pending: Dict, failed: Dict) -> None:
+        """写入失败时放回缓冲，等待下次刷新，期间的新写入优先"""
+        for key, value in failed.items():
+            pending.setdefault(key, value)
+
+    async def discard_history(self, novel_id: Optional[int] = None) -> None:
+        """丢弃缓冲的阅读记录，novel_id为空时丢弃全部，用于删除历史记录前"""
+        async with self._lock:
+            if novel_id is None:
+                self._history.clear()
+            else:
+                for key in [key for key in self._history if key[0] == novel_id]:
+                    del self._history[key]
+
+    async def discard_search(self, keyword: Optional[str] = None) -> None:
+        """丢弃缓冲的搜索历史，keyword为空时丢弃全部"""
+        async with self._lock:
+            if keyword is None:
+                self._searches.clear()
+            else:
+                self._searches.pop(keyword, None)
+
+    async def start(self) -> None:
+        """启动定时刷新任务"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """停止定时刷新并写入剩余的缓冲，写入失败时记录日志，不影响之后关闭写协程和连接池"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._flush_task is not None:
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+            self._flush_task = None
+        await self._flush_quietly()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self._flush_quietly()
+
+
+# 全局写入缓冲实例
+write_buffer = WriteBehindBuffer()
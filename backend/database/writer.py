@@ -0,0 +1,208 @@
+import os
+import time
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+import aiosqlite
+from loguru import logger
+from dotenv import load_dotenv
+
+from database import init_db
+from database.instrumentation import track_connect, track_commit, wrap_connection
+
+# 加载环境变量
+load_dotenv()
+
+# 一次组提交最多包含的写事务数
+DB_WRITER_BATCH_SIZE = int(os.getenv("DB_WRITER_BATCH_SIZE", "64"))
+
+
+class _WriteRequest:
+    """排队等待写连接的一个写事务"""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        # 轮到该事务时由写协程设置为写连接
+        self.granted = loop.create_future()
+        # 调用方执行完毕后设置，True表示成功
+        self.done = loop.create_future()
+        # 所在批次提交后设置
+        self.committed = loop.create_future()
+
+
+class DatabaseWriter:
+    """单写连接与组提交
+
+    SQLite同一时刻只允许一个写事务，多个连接各自提交会互相等待锁甚至报"database is locked"。
+    所有写操作都通过transaction()排队使用同一个写连接：写协程依次把连接交给排队的调用方，
+    每个调用方的语句包在一个SAVEPOINT中，出错时只回滚自己的部分；
+    队列中积压的写事务合并为一个事务提交，一次COMMIT（一次fsync）完成整批写入。
+    """
+
+    def __init__(self, batch_size: int = DB_WRITER_BATCH_SIZE):
+        self.batch_size = max(1, batch_size)
+        self._conn: Optional[aiosqlite.Connection] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._closed = False
+
+    @property
+    def is_open(self) -> bool:
+        """写协程是否已启动"""
+        return self._task is not None and not self._closed
+
+    async def open(self) -> None:
+        """打开写连接并启动写协程"""
+        if self.is_open:
+            return
+        self._closed = False
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        # 先创建写协程再打开连接，并发的首次写入只会启动一个写协程，连接就绪前的写事务在队列中等待
+        opened = self._loop.create_future()
+        self._task = asyncio.create_task(self._run(opened))
+        try:
+            await opened
+        except Exception:
+            self._task = None
+            raise
+        logger.info("数据库写协程已启动")
+
+    async def close(self) -> None:
+        """等待已排队的写事务完成后关闭写连接"""
+        if self._closed or self._task is None:
+            return
+        self._closed = True
+        await self._queue.join()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        await self._conn.close()
+        self._conn = None
+        self._task = None
+        self._queue = None
+        self._loop = None
+        logger.info("数据库写协程已停止")
+
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator[aiosqlite.Connection]:
+        """排队获取写连接，退出上下文时等待所在批次提交，上下文中抛出异常则回滚本事务"""
+        if self._closed:
+            raise RuntimeError("数据库写协程已关闭")
+
+        # 爬虫运行在Twisted线程的事件循环中，写协程的队列只能在创建它的事件循环中使用，
+        # 其他事件循环退回到独立连接和独立事务
+        start = time.perf_counter()
+        if self._loop is not None and asyncio.get_running_loop() is not self._loop:
+            conn = await init_db.get_db_connection()
+            try:
+                await conn.execute("BEGIN IMMEDIATE")
+                track_connect(time.perf_counter() - start)
+                yield wrap_connection(conn)
+                start = time.perf_counter()
+                await conn.commit()
+                track_commit(time.perf_counter() - start)
+            except BaseException:
+                await conn.rollback()
+                raise
+            finally:
+                await conn.close()
+            return
+
+        if self._task is None:
+            # 未在启动时打开（如脚本中直接调用crud），按需打开
+            await self.open()
+
+        request = _WriteRequest(asyncio.get_running_loop())
+        self._queue.put_nowait(request)
+        try:
+            conn = await request.granted
+        except asyncio.CancelledError:
+            # 排队期间被取消，写协程会跳过该事务；已拿到连接时需要通知写协程继续
+            if request.granted.done() and not request.granted.cancelled():
+                request.done.set_result(False)
+            else:
+                request.granted.cancel()
+            raise
+        track_connect(time.perf_counter() - start)
+
+        try:
+            yield wrap_connection(conn)
+        except BaseException:
+            request.done.set_result(False)
+            raise
+        request.done.set_result(True)
+        start = time.perf_counter()
+        await request.committed
+        track_commit(time.perf_counter() - start)
+
+    async def _run(self, opened: asyncio.Future) -> None:
+        """写协程：取出积压的写事务，逐个执行后一次提交"""
+        try:
+            self._conn = await init_db.get_db_connection()
+        except Exception as e:
+            opened.set_exception(e)
+            return
+        opened.set_result(None)
+
+        while True:
+            request = await self._queue.get()
+            batch = []
+            try:
+                await self._conn.execute("BEGIN IMMEDIATE")
+                while True:
+                    if await self._execute(request):
+                        batch.append(request)
+                    if len(batch) >= self.batch_size or self._queue.empty():
+                        break
+                    self._queue.task_done()
+                    request = self._queue.get_nowait()
+                await self._conn.commit()
+            except Exception as e:
+                logger.error(f"数据库组提交失败: {str(e)}")
+                try:
+                    await self._conn.rollback()
+                except Exception:
+                    pass
+                for item in batch + [request]:
+                    for future in (item.granted, item.committed):
+                        if not future.done():
+                            future.set_exception(e)
+            else:
+                for item in batch:
+                    # 等待提交时被取消的调用方，其future已是取消状态
+                    if not item.committed.done():
+                        item.committed.set_result(None)
+            finally:
+                self._queue.task_done()
+
+    async def _execute(self, request: _WriteRequest) -> bool:
+        """把写连接交给一个排队的调用方，等待其执行完毕，返回是否需要提交"""
+        if request.granted.cancelled():
+            return False
+        await self._conn.execute("SAVEPOINT writer_job")
+        if request.granted.done():
+            # 调用方在创建SAVEPOINT期间被取消，只跳过该事务，不影响同批次的其他事务
+            await self._conn.execute("ROLLBACK TO writer_job")
+            await self._conn.execute("RELEASE writer_job")
+            return False
+        request.granted.set_result(self._conn)
+        try:
+            succeeded = await request.done
+        except asyncio.CancelledError:
+            # 写协程被取消时回滚未完成的事务
+            await self._conn.execute("ROLLBACK TO writer_job")
+            raise
+        if succeeded:
+            await self._conn.execute("RELEASE writer_job")
+        else:
+            await self._conn.execute("ROLLBACK TO writer_job")
+            await self._conn.execute("RELEASE writer_job")
+        return succeeded
+
+
+# 全局写协程实例
+db_writer = DatabaseWriter()
@@ -15,10 +15,17 @@ from api.history import router as history_router
 from api.rule import router as rule_router
 from api.cache import router as cache_router
 from api.search_history import router as search_history_router
-# 移除settings_router导入，改为使用localStorage
+from api.backup import router as backup_router
+from api.metrics import router as metrics_router
+from api.settings import router as settings_router
 
 # 导入数据库初始化
 from database.init_db import init_db
+from database.pool import db_pool
+from database.writer import db_writer
+from database.write_buffer import write_buffer
+from spider.spider_manager import spider_manager
+from spider.download_manager import download_manager
 
 # 加载环境变量
 load_dotenv()
@@ -93,7 +100,9 @@ app.include_router(history_router, prefix="/api/history", tags=["历史"])
 app.include_router(rule_router, prefix="/api/rule", tags=["规则"])
 app.include_router(cache_router, prefix="/api/cache", tags=["缓存管理"])
 app.include_router(search_history_router, prefix="/api/search_history", tags=["搜索历史"])
-# 移除settings_router注册，改为使用localStorage
+app.include_router(backup_router, prefix="/api/backup", tags=["备份"])
+app.include_router(metrics_router, prefix="/api/metrics", tags=["性能统计"])
+app.include_router(settings_router, prefix="/api/settings", tags=["设置"])
 
 
 @app.on_event("startup")
@@ -113,7 +122,12 @@ async def startup_event():
     # 初始化数据库
     try:
         await init_db()
+        await db_pool.open()
+        await db_writer.open()
+        await write_buffer.start()
         app_logger.info("数据库初始化完成")
+        # 恢复上次未完成的章节下载任务
+        await download_manager.start()
     except Exception as e:
         error_logger.exception("数据库初始化失败", exc_info=e)
         raise
@@ -124,6 +138,12 @@ async def shutdown_event():
     """应用关闭时执行的操作"""
     app_logger.info("LocalBooks API 服务关闭中...")
     app_logger.info("正在清理资源...")
+    # 中断下载任务并保存已下载的章节，关闭抓取后端，再写入缓冲中的阅读记录和搜索历史，最后关闭写协程和连接池
+    await download_manager.stop()
+    await spider_manager.close()
+    await write_buffer.stop()
+    await db_writer.close()
+    await db_pool.close()
     # 这里可以添加其他资源清理操作
     app_logger.info("LocalBooks API 服务已安全关闭")
 
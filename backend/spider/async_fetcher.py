@@ -0,0 +1,116 @@
+import asyncio
+import functools
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+from w3lib.encoding import html_to_unicode
+from loguru import logger
+
+from utils.rule_registry import CompiledRule
+from .settings import CONCURRENT_REQUESTS, DOWNLOAD_TIMEOUT, REDIRECT_ENABLED, RETRY_TIMES, RETRY_HTTP_CODES
+from .middlewares import random_user_agent, retry_reason
+from .rate_limiter import rate_limiter
+from .conditional import NOT_MODIFIED, conditional_headers, response_validators
+from .parsers import PARSERS
+from .crawler_service import CRAWLER_JOB_TIMEOUT
+
+# 获取爬虫日志记录器
+spider_logger = logger.bind(name="spider")
+
+
+class AsyncFetcher:
+    """在应用事件循环中抓取页面的异步后端
+
+    与CrawlerService的fetch接口相同，请求由httpx的连接池发出并保持长连接，
+    结果不需要跨线程传递。用户代理和重试判断与Scrapy中间件共用，
+    页面编码识别与Scrapy相同，解析函数也相同，解析在线程池中执行以免阻塞事件循环。
+    """
+
+    def __init__(self, timeout: float = CRAWLER_JOB_TIMEOUT, retry_times: int = RETRY_TIMES):
+        self.timeout = timeout
+        self.retry_times = retry_times
+        self.retry_http_codes = set(RETRY_HTTP_CODES)
+        self._client: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """获取当前事件循环的客户端，连接池只能在创建它的事件循环中使用"""
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            self._client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=CONCURRENT_REQUESTS,
+                    max_keepalive_connections=CONCURRENT_REQUESTS,
+                ),
+                timeout=DOWNLOAD_TIMEOUT,
+                follow_redirects=REDIRECT_ENABLED,
+            )
+            self._loop = loop
+        return self._client
+
+    async def stop(self) -> None:
+        """关闭连接池"""
+        client, loop = self._client, self._loop
+        self._client = None
+        self._loop = None
+        if client is not None and loop is asyncio.get_running_loop():
+            await client.aclose()
+
+    async def fetch(self, kind: str, url: str, rule: CompiledRule, **params) -> Any:
+        """抓取并解析一个页面，kind为PARSERS中的任务类型，超时时抛出asyncio.TimeoutError"""
+        result, _ = await self.fetch_conditional(kind, url, rule, None, **params)
+        return result
+
+    async def fetch_conditional(
+        self, kind: str, url: str, rule: CompiledRule, validators: Optional[Dict[str, Any]], **params
+    ) -> Tuple[Any, Dict[str, Optional[str]]]:
+        """按上次的验证信息发送条件请求，返回(解析结果, 响应的验证信息)，页面未变化时结果为NOT_MODIFIED"""
+        response = await asyncio.wait_for(
+            self._download(url, conditional_headers(validators)), timeout=self.timeout
+        )
+        if response.status_code == 304 and validators:
+            return NOT_MODIFIED, validators
+        if response.status_code >= 400:
+            spider_logger.error(f"抓取失败: {url}, HTTP {response.status_code}")
+            raise RuntimeError(f"HTTP {response.status_code}")
+
+        result = await asyncio.get_running_loop().run_in_executor(
+            None, functools.partial(_parse, kind, rule, response, params)
+        )
+        return result, response_validators(response.headers)
+
+    async def _download(self, url: str, headers: Optional[Dict[str, str]] = None) -> httpx.Response:
+        """下载页面，按Scrapy重试中间件的规则重试，每次请求前从按域名共享的限速器获取令牌"""
+        client = self._get_client()
+        retries = 0
+        while True:
+            try:
+                await rate_limiter.acquire(url)
+                response = await client.get(url, headers={'User-Agent': random_user_agent(), **(headers or {})})
+                rate_limiter.feedback(url, response.status_code, response.headers.get('retry-after'))
+                reason = retry_reason(response.status_code, response.content, self.retry_http_codes)
+                if not reason:
+                    return response
+            except httpx.TransportError as e:
+                spider_logger.error(f"请求异常: {url}, 异常: {e}")
+                if retries >= self.retry_times:
+                    spider_logger.error(f"达到最大重试次数，放弃请求: {url}")
+                    raise
+                reason = str(e) or type(e).__name__
+            else:
+                if retries >= self.retry_times:
+                    spider_logger.error(f"达到最大重试次数，放弃请求: {url}")
+                    return response
+
+            retries += 1
+            spider_logger.warning(f"重试请求 ({retries}/{self.retry_times}): {url}, 原因: {reason}")
+
+
+def _parse(kind: str, rule: CompiledRule, response: httpx.Response, params: Dict[str, Any]) -> Any:
+    """按响应头和页面meta识别编码后解析页面"""
+    _, html = html_to_unicode(response.headers.get('content-type'), response.content)
+    return PARSERS[kind](rule, html, str(response.url), **params)
+
+
+# 全局异步抓取实例
+async_fetcher = AsyncFetcher()
@@ -0,0 +1,40 @@
+from typing import Any, Dict, Optional
+
+
+class _NotModified:
+    """页面未变化的标记"""
+
+    __slots__ = ()
+
+    def __repr__(self) -> str:
+        return "NOT_MODIFIED"
+
+
+# 条件请求得到304时抓取后端返回的结果，调用方据此跳过解析和数据库同步
+NOT_MODIFIED = _NotModified()
+
+
+def _header_text(value: Any) -> Optional[str]:
+    """Scrapy的响应头为bytes，httpx为str"""
+    if isinstance(value, bytes):
+        value = value.decode('latin-1')
+    return value or None
+
+
+def conditional_headers(validators: Optional[Dict[str, Any]]) -> Dict[str, str]:
+    """根据上次响应的验证信息生成If-None-Match和If-Modified-Since请求头"""
+    headers = {}
+    if validators:
+        if validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        if validators.get('last_modified'):
+            headers['If-Modified-Since'] = validators['last_modified']
+    return headers
+
+
+def response_validators(headers: Any) -> Dict[str, Optional[str]]:
+    """取出响应的ETag和Last-Modified，下次请求同一页面时使用"""
+    return {
+        'etag': _header_text(headers.get('ETag')),
+        'last_modified': _header_text(headers.get('Last-Modified')),
+    }
@@ -0,0 +1,243 @@
+import os
+import asyncio
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from scrapy import Spider, signals
+from scrapy.crawler import Crawler
+from scrapy.exceptions import DontCloseSpider
+from scrapy.http import Request, Response
+from scrapy.settings import Settings
+from scrapy.utils.project import get_project_settings
+from twisted.internet import reactor
+from twisted.internet.defer import Deferred, maybeDeferred
+from twisted.python.failure import Failure
+from loguru import logger
+from dotenv import load_dotenv
+
+from utils.rule_registry import CompiledRule
+from spider.parsers import PARSERS
+from spider.conditional import NOT_MODIFIED, conditional_headers, response_validators
+
+# 加载环境变量
+load_dotenv()
+
+# 获取爬虫日志记录器
+spider_logger = logger.bind(name="spider")
+
+# 单个抓取任务的超时时间（秒）
+CRAWLER_JOB_TIMEOUT = float(os.getenv("CRAWLER_JOB_TIMEOUT", "60"))
+
+
+def project_settings() -> Settings:
+    """加载spider/settings.py中的项目设置
+
+    没有scrapy.cfg时get_project_settings()只返回Scrapy默认设置，中间件、重试和缓存配置都不生效，
+    这里显式加载项目设置模块。
+    """
+    settings = get_project_settings()
+    settings.setmodule('spider.settings', priority='project')
+    return settings
+
+
+def start_reactor() -> None:
+    """在单独的线程中运行Twisted反应器"""
+    if not reactor.running:
+        threading.Thread(target=reactor.run, args=(False,), daemon=True).start()
+
+
+def stop_reactor() -> None:
+    """停止Twisted反应器"""
+    if reactor.running:
+        reactor.callFromThread(reactor.stop)
+
+
+def run_in_reactor(func: Callable[..., Any], *args, **kwargs) -> "asyncio.Future":
+    """在反应器线程中调用func，返回在当前事件循环中完成的Future，func返回Deferred时等待其完成"""
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def resolve(result: Any) -> None:
+        if isinstance(result, Failure):
+            loop.call_soon_threadsafe(_set_exception, future, result.value)
+        else:
+            loop.call_soon_threadsafe(_set_result, future, result)
+
+    reactor.callFromThread(lambda: maybeDeferred(func, *args, **kwargs).addBoth(resolve))
+    return future
+
+
+def _set_result(future: asyncio.Future, result: Any) -> None:
+    if not future.done():
+        future.set_result(result)
+
+
+def _set_exception(future: asyncio.Future, error: BaseException) -> None:
+    if not future.done():
+        future.set_exception(error)
+
+
+class _FetchJob:
+    """一个等待结果的抓取任务"""
+
+    def __init__(
+        self, kind: str, url: str, rule: CompiledRule, params: Dict[str, Any], validators: Optional[Dict[str, Any]]
+    ):
+        self.kind = kind
+        self.url = url
+        self.rule = rule
+        self.params = params
+        self.validators = validators
+        self.loop = asyncio.get_running_loop()
+        self.future = self.loop.create_future()
+
+    def resolve(self, result: Any) -> None:
+        self.loop.call_soon_threadsafe(_set_result, self.future, result)
+
+    def fail(self, error: BaseException) -> None:
+        self.loop.call_soon_threadsafe(_set_exception, self.future, error)
+
+
+class ServiceSpider(Spider):
+    """常驻爬虫：没有起始请求，空闲时不关闭，由CrawlerService投递请求"""
+    name = 'crawler_service'
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler, *args, **kwargs) -> "ServiceSpider":
+        spider = super().from_crawler(crawler, *args, **kwargs)
+        crawler.signals.connect(spider.on_idle, signal=signals.spider_idle)
+        return spider
+
+    def start_requests(self):
+        return []
+
+    def on_idle(self) -> None:
+        raise DontCloseSpider
+
+
+class CrawlerService:
+    """常驻的Scrapy爬虫服务
+
+    以前每次搜索、获取详情、获取章节都新建一个Crawler，每个页面都要重新加载设置、
+    初始化中间件和扩展、打开关闭爬虫。这里只在首次使用时启动一个Crawler并保持打开，
+    每个抓取任务只是向引擎投递一个请求，页面在反应器线程中解析后通过Future交回调用方。
+
+    请求通过engine.download下载，经过下载中间件（重试、User-Agent、HTTP缓存），
+    但不经过Scraper，因为Scraper调用回调前固定延迟0.1秒。
+    """
+
+    def __init__(self, settings: Optional[Settings] = None, timeout: float = CRAWLER_JOB_TIMEOUT):
+        self.settings = settings
+        self.timeout = timeout
+        self._crawler: Optional[Crawler] = None
+        self._spider: Optional[ServiceSpider] = None
+        self._ready = threading.Event()
+        self._start_lock = threading.Lock()
+        self._start_error: Optional[BaseException] = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._spider is not None
+
+    async def start(self) -> None:
+        """启动常驻爬虫，已启动时直接返回"""
+        if self._spider is not None:
+            return
+        with self._start_lock:
+            if self._crawler is None:
+                self._ready.clear()
+                self._start_error = None
+                start_reactor()
+                reactor.callFromThread(self._start_crawler)
+        # 等待爬虫打开，不阻塞事件循环
+        await asyncio.get_running_loop().run_in_executor(None, self._ready.wait, self.timeout)
+        if self._start_error is not None:
+            raise RuntimeError(f"爬虫服务启动失败: {self._start_error}")
+        if self._spider is None:
+            raise RuntimeError("爬虫服务启动超时")
+
+    async def stop(self) -> None:
+        """关闭常驻爬虫"""
+        crawler = self._crawler
+        if crawler is None:
+            return
+        await run_in_reactor(crawler.stop)
+        self._crawler = None
+        self._spider = None
+        spider_logger.info("爬虫服务已停止")
+
+    async def fetch(self, kind: str, url: str, rule: CompiledRule, **params) -> Any:
+        """抓取并解析一个页面，kind为PARSERS中的任务类型，超时时抛出asyncio.TimeoutError"""
+        result, _ = await self.fetch_conditional(kind, url, rule, None, **params)
+        return result
+
+    async def fetch_conditional(
+        self, kind: str, url: str, rule: CompiledRule, validators: Optional[Dict[str, Any]], **params
+    ) -> Tuple[Any, Dict[str, Optional[str]]]:
+        """按上次的验证信息发送条件请求，返回(解析结果, 响应的验证信息)，页面未变化时结果为NOT_MODIFIED
+
+        validators为None时是普通请求；否则不使用HTTP缓存，为空时只是取得最新页面和验证信息。
+        """
+        await self.start()
+        job = _FetchJob(kind, url, rule, params, validators)
+        reactor.callFromThread(self._schedule, job)
+        return await asyncio.wait_for(job.future, timeout=self.timeout)
+
+    # 以下方法在反应器线程中执行
+
+    def _start_crawler(self) -> None:
+        settings = self.settings if self.settings is not None else project_settings()
+        crawler = Crawler(ServiceSpider, settings)
+        crawler.signals.connect(self._on_spider_opened, signal=signals.spider_opened)
+        self._crawler = crawler
+        deferred: Deferred = crawler.crawl()
+        deferred.addErrback(self._on_start_failed)
+        deferred.addBoth(self._on_crawler_finished)
+
+    def _on_spider_opened(self, spider: ServiceSpider) -> None:
+        self._spider = spider
+        self._ready.set()
+        spider_logger.info("爬虫服务已启动")
+
+    def _on_start_failed(self, failure: Failure) -> None:
+        spider_logger.error(f"爬虫服务异常退出: {failure.getErrorMessage()}")
+        self._start_error = failure.value
+        self._ready.set()
+
+    def _on_crawler_finished(self, _: Any) -> None:
+        self._crawler = None
+        self._spider = None
+
+    def _schedule(self, job: _FetchJob) -> None:
+        if self._crawler is None or self._spider is None:
+            job.fail(RuntimeError("爬虫服务未运行"))
+            return
+        request = Request(job.url, dont_filter=True)
+        if job.validators is not None:
+            # 刷新时需要源站的最新状态，不能由缓存在有效期内直接返回旧页面
+            request.headers.update(conditional_headers(job.validators))
+            request.meta['dont_cache'] = True
+        deferred: Deferred = self._crawler.engine.download(request)
+        deferred.addCallbacks(self._on_response, self._on_failure, callbackArgs=(job,), errbackArgs=(job,))
+
+    def _on_response(self, response: Response, job: _FetchJob) -> None:
+        """在反应器线程中解析页面，并把结果交回等待的调用方"""
+        if response.status == 304 and job.validators:
+            job.resolve((NOT_MODIFIED, job.validators))
+            return
+        if response.status >= 400:
+            spider_logger.error(f"抓取失败: {job.url}, HTTP {response.status}")
+            job.fail(RuntimeError(f"HTTP {response.status}"))
+            return
+        try:
+            result = PARSERS[job.kind](job.rule, response.text, response.url, **job.params)
+            job.resolve((result, response_validators(response.headers)))
+        except Exception as e:
+            job.fail(e)
+
+    def _on_failure(self, failure: Failure, job: _FetchJob) -> None:
+        spider_logger.error(f"抓取失败: {job.url}, {failure.getErrorMessage()}")
+        job.fail(failure.value)
+
+# 全局爬虫服务实例
+crawler_service = CrawlerService()
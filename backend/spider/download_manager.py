@@ -0,0 +1,191 @@
+import os
+import time
+import asyncio
+from contextlib import aclosing
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from loguru import logger
+from dotenv import load_dotenv
+
+from database import crud
+from database.models import ChapterCreate
+from .spider_manager import spider_manager
+
+# 加载环境变量
+load_dotenv()
+
+# 获取爬虫日志记录器
+spider_logger = logger.bind(name="spider")
+
+# 同时运行的下载任务数，其余任务排队等待
+DOWNLOAD_MAX_JOBS = int(os.getenv("DOWNLOAD_MAX_JOBS", "2"))
+
+# 每下载多少章保存一次检查点
+DOWNLOAD_CHECKPOINT_SIZE = int(os.getenv("DOWNLOAD_CHECKPOINT_SIZE", "20"))
+
+# 两次检查点之间的最长时间（秒），下载较慢时也定期保存进度
+DOWNLOAD_CHECKPOINT_INTERVAL = float(os.getenv("DOWNLOAD_CHECKPOINT_INTERVAL", "10"))
+
+
+class DownloadManager:
+    """章节下载任务队列
+
+    下载任务和每个章节的状态保存在download_jobs和download_job_chapters表中。
+    章节批量下载（SpiderManager.get_chapter_contents），每下载一批就把正文、章节状态和任务进度
+    在一个事务中提交，作为检查点。服务重启后从未完成的章节继续，已保存的章节不会重新下载。
+    同一小说同时只有一个等待或进行中的任务，重复提交返回已有的任务。
+    """
+
+    def __init__(
+        self,
+        max_jobs: int = DOWNLOAD_MAX_JOBS,
+        checkpoint_size: int = DOWNLOAD_CHECKPOINT_SIZE,
+        checkpoint_interval: float = DOWNLOAD_CHECKPOINT_INTERVAL,
+    ):
+        self.max_jobs = max_jobs
+        self.checkpoint_size = checkpoint_size
+        self.checkpoint_interval = checkpoint_interval
+        # 任务ID -> 运行任务的协程
+        self._tasks: Dict[int, asyncio.Task] = {}
+        # 被用户取消的任务，停止服务时被中断的任务不在其中，下次启动时继续
+        self._cancelled: Set[int] = set()
+        self._slots = asyncio.Semaphore(max_jobs)
+
+    async def start(self) -> None:
+        """恢复上次未完成的任务"""
+        jobs = await crud.get_active_download_jobs()
+        for job in jobs:
+            self._launch(job)
+        if jobs:
+            spider_logger.info(f"恢复 {len(jobs)} 个未完成的下载任务")
+
+    async def stop(self) -> None:
+        """中断所有任务，已下载的章节在中断前保存，任务保持未完成状态"""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def submit(self, novel_id: int, rule_id: int) -> Tuple[Dict[str, Any], bool]:
+        """提交下载任务，该小说已有未完成的任务时返回该任务，返回(任务, 是否新建)"""
+        job, created = await crud.create_download_job(novel_id, rule_id)
+        if job['id'] not in self._tasks:
+            self._launch(job)
+        if created:
+            spider_logger.info(f"创建下载任务: 任务ID {job['id']}, 小说ID {novel_id}")
+        return job, created
+
+    async def cancel(self, job_id: int) -> bool:
+        """取消未完成的任务，已下载的章节保留，任务不存在或已结束时返回False"""
+        job = await crud.get_download_job(job_id)
+        if not job or job['status'] not in ('pending', 'running'):
+            return False
+
+        task = self._tasks.get(job_id)
+        if task is None:
+            await crud.update_download_job_status(job_id, 'cancelled')
+        else:
+            self._cancelled.add(job_id)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        return True
+
+    def _launch(self, job: Dict[str, Any]) -> None:
+        self._tasks[job['id']] = asyncio.create_task(self._run(job))
+
+    async def _run(self, job: Dict[str, Any]) -> None:
+        job_id = job['id']
+        try:
+            async with self._slots:
+                await crud.update_download_job_status(job_id, 'running')
+                if not job['total_chapters']:
+                    await self._prepare(job)
+                await self._download(job)
+                await crud.update_download_job_status(job_id, 'completed')
+            spider_logger.info(f"下载任务完成: 任务ID {job_id}, 小说ID {job['novel_id']}")
+        except asyncio.CancelledError:
+            if job_id in self._cancelled:
+                await crud.update_download_job_status(job_id, 'cancelled')
+                spider_logger.info(f"下载任务已取消: 任务ID {job_id}")
+            raise
+        except Exception as e:
+            spider_logger.error(f"下载任务失败: 任务ID {job_id}, {str(e)}")
+            await crud.update_download_job_status(job_id, 'failed', str(e))
+        finally:
+            self._tasks.pop(job_id, None)
+            self._cancelled.discard(job_id)
+
+    async def _prepare(self, job: Dict[str, Any]) -> None:
+        """首次运行时登记要下载的章节，小说还没有目录时先获取目录"""
+        novel_id = job['novel_id']
+        chapters = await crud.get_novel_chapters(novel_id)
+        if not chapters:
+            novel = await crud.get_novel(novel_id)
+            if not novel:
+                raise RuntimeError(f"小说不存在: {novel_id}")
+            chapter_list = await spider_manager.get_chapters(novel_id, novel['source_url'], job['rule_id'])
+            if not chapter_list:
+                raise RuntimeError(f"获取小说章节列表失败: 小说ID {novel_id}")
+            await crud.sync_chapter_catalog(novel_id, [
+                ChapterCreate(
+                    novel_id=novel_id,
+                    title=chapter_data['title'],
+                    chapter_index=chapter_data['chapter_index'],
+                    source_url=chapter_data['source_url'],
+                    content=None,
+                    is_downloaded=False
+                )
+                for chapter_data in chapter_list
+            ])
+            chapters = await crud.get_novel_chapters(novel_id)
+
+        total = await crud.add_download_job_chapters(
+            job['id'], [chapter['id'] for chapter in chapters if not chapter.get('is_downloaded')]
+        )
+        spider_logger.info(f"下载任务 {job['id']} 共 {total} 章待下载")
+
+    async def _download(self, job: Dict[str, Any]) -> None:
+        """下载任务中尚未完成的章节，每checkpoint_size章或每checkpoint_interval秒保存一次检查点"""
+        chapters = await crud.get_pending_job_chapters(job['id'])
+        batch: List[Tuple[int, Optional[str]]] = []
+        started = time.monotonic()
+        try:
+            async with aclosing(spider_manager.get_chapter_contents(
+                [(chapter['id'], chapter['source_url']) for chapter in chapters], job['rule_id']
+            )) as contents:
+                async for chapter_id, content in contents:
+                    batch.append((chapter_id, content))
+                    if len(batch) >= self.checkpoint_size or time.monotonic() - started >= self.checkpoint_interval:
+                        # 保存失败时这批章节仍是未下载状态，下次运行时重新下载
+                        results, batch = batch, []
+                        await self._checkpoint(job['id'], results, time.monotonic() - started)
+                        started = time.monotonic()
+        finally:
+            if batch:
+                # 任务被取消或中断时也保存已下载的章节
+                await self._checkpoint(job['id'], batch, time.monotonic() - started)
+
+    @staticmethod
+    async def _checkpoint(job_id: int, results: List[Tuple[int, Optional[str]]], elapsed: float) -> None:
+        """保存检查点，任务在保存期间被取消时等待本次保存完成后再结束
+
+        cancel()和stop()随时可能取消任务，写事务不能被中途打断：
+        正文、章节状态和任务进度要么一起提交，要么都不提交。
+        """
+        save = asyncio.ensure_future(crud.save_download_batch(job_id, results, elapsed))
+        try:
+            await asyncio.shield(save)
+        except asyncio.CancelledError:
+            # wait()被取消时不会取消save，再次取消任务也不会打断保存
+            while not save.done():
+                try:
+                    await asyncio.wait([save])
+                except asyncio.CancelledError:
+                    pass
+            if not save.cancelled() and save.exception():
+                spider_logger.error(f"保存下载检查点失败: 任务ID {job_id}, {str(save.exception())}")
+            raise
+
+
+# 全局下载任务管理器实例
+download_manager = DownloadManager()
@@ -0,0 +1,213 @@
+import os
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import soupsieve
+from bs4 import BeautifulSoup
+from lxml import etree, html as lxml_html
+from cssselect import HTMLTranslator
+from loguru import logger
+from dotenv import load_dotenv
+
+from utils.rule_registry import CompiledRule
+
+# selectolax为可选依赖
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+# 加载环境变量
+load_dotenv()
+
+# 获取爬虫日志记录器
+spider_logger = logger.bind(name="spider")
+
+# 页面解析引擎：lxml、selectolax或bs4（BeautifulSoup + html.parser，最慢）
+PARSER_ENGINE = os.getenv("PARSER_ENGINE", "lxml").lower()
+
+# 这些元素内的文本不计入get_text的结果，与BeautifulSoup一致
+SKIPPED_TEXT_TAGS = frozenset(('script', 'style', 'template', 'rt', 'rp'))
+
+
+def _join_strings(strings: Iterator[str], separator: str) -> str:
+    """去掉每段文本首尾空白并丢弃空段后拼接，对应BeautifulSoup的get_text(separator, strip=True)"""
+    return separator.join(text for text in (string.strip() for string in strings) if text)
+
+
+class HtmlEngine:
+    """页面解析引擎
+
+    parsers.py中的解析函数只通过这里的接口访问页面：解析、按选择器查找、取文本和属性。
+    规则中的选择器按引擎编译后缓存在CompiledRule上，解析函数中固定的选择器缓存在引擎上。
+    """
+
+    name = ''
+
+    def __init__(self):
+        self._selectors: Dict[str, Any] = {}
+
+    def parse(self, html: str) -> Any:
+        """解析页面，返回文档根节点"""
+        raise NotImplementedError
+
+    def compile(self, selector: str) -> Any:
+        """编译CSS选择器，选择器无效时抛出异常"""
+        raise NotImplementedError
+
+    def _select(self, compiled: Any, node: Any) -> List[Any]:
+        raise NotImplementedError
+
+    def _select_one(self, compiled: Any, node: Any) -> Optional[Any]:
+        matches = self._select(compiled, node)
+        return matches[0] if matches else None
+
+    def _strings(self, node: Any) -> Iterator[str]:
+        raise NotImplementedError
+
+    def text(self, node: Any, separator: str = '') -> str:
+        """节点的文本，等同于BeautifulSoup的get_text(separator, strip=True)"""
+        return _join_strings(self._strings(node), separator)
+
+    def attr(self, node: Any, name: str) -> Optional[str]:
+        """节点的属性值"""
+        raise NotImplementedError
+
+    def _compiled(self, selector: str) -> Any:
+        compiled = self._selectors.get(selector)
+        if compiled is None:
+            compiled = self._selectors[selector] = self.compile(selector)
+        return compiled
+
+    def css(self, selector: str, node: Any) -> List[Any]:
+        """在节点的后代中查找所有匹配元素"""
+        return self._select(self._compiled(selector), node)
+
+    def css_one(self, selector: str, node: Any) -> Optional[Any]:
+        """在节点的后代中查找第一个匹配元素"""
+        return self._select_one(self._compiled(selector), node)
+
+    def select(self, rule: CompiledRule, field: str, node: Any) -> List[Any]:
+        """用规则字段对应的选择器查找所有匹配元素，未配置或无效时返回空列表"""
+        compiled = rule.compiled_selectors(self.name, self.compile).get(field)
+        return self._select(compiled, node) if compiled is not None else []
+
+    def select_one(self, rule: CompiledRule, field: str, node: Any) -> Optional[Any]:
+        """用规则字段对应的选择器查找第一个匹配元素"""
+        compiled = rule.compiled_selectors(self.name, self.compile).get(field)
+        return self._select_one(compiled, node) if compiled is not None else None
+
+
+class BeautifulSoupEngine(HtmlEngine):
+    """BeautifulSoup + html.parser，选择器由soupsieve编译"""
+
+    name = 'bs4'
+
+    def parse(self, html: str) -> BeautifulSoup:
+        return BeautifulSoup(html, 'html.parser')
+
+    def compile(self, selector: str) -> soupsieve.SoupSieve:
+        return soupsieve.compile(selector)
+
+    def _select(self, compiled: soupsieve.SoupSieve, node: Any) -> List[Any]:
+        return compiled.select(node)
+
+    def _select_one(self, compiled: soupsieve.SoupSieve, node: Any) -> Optional[Any]:
+        return compiled.select_one(node)
+
+    def text(self, node: Any, separator: str = '') -> str:
+        return node.get_text(separator, strip=True)
+
+    def attr(self, node: Any, name: str) -> Optional[str]:
+        return node.get(name)
+
+
+class LxmlEngine(HtmlEngine):
+    """lxml的HTML解析器，CSS选择器由cssselect转换为XPath后编译"""
+
+    name = 'lxml'
+
+    def __init__(self):
+        super().__init__()
+        self._translator = HTMLTranslator()
+        self._parser = lxml_html.HTMLParser(encoding='utf-8')
+
+    def parse(self, html: str) -> etree._ElementTree:
+        # 以UTF-8字节解析，避免页面中的XML编码声明或meta charset与已解码的文本冲突
+        data = html.encode('utf-8') if html.strip() else b'<html></html>'
+        return lxml_html.document_fromstring(data, parser=self._parser).getroottree()
+
+    def compile(self, selector: str) -> etree.XPath:
+        # 只查找后代，不包括节点本身，与BeautifulSoup的select一致
+        return etree.XPath(self._translator.css_to_xpath(selector, prefix='descendant::'))
+
+    def _select(self, compiled: etree.XPath, node: Any) -> List[Any]:
+        return compiled(node)
+
+    def _strings(self, node: Any) -> Iterator[str]:
+        if node.text:
+            yield node.text
+        for child in node:
+            # 注释和处理指令的tag不是字符串，只保留其后的文本
+            if isinstance(child.tag, str) and child.tag not in SKIPPED_TEXT_TAGS:
+                yield from self._strings(child)
+            if child.tail:
+                yield child.tail
+
+    def attr(self, node: Any, name: str) -> Optional[str]:
+        return node.get(name)
+
+
+class SelectolaxEngine(HtmlEngine):
+    """selectolax（lexbor），不支持预编译选择器，编译时只检查选择器是否有效"""
+
+    name = 'selectolax'
+
+    def parse(self, html: str) -> Any:
+        return LexborHTMLParser(html)
+
+    def compile(self, selector: str) -> str:
+        LexborHTMLParser('<html></html>').css(selector)
+        return selector
+
+    def _select(self, compiled: str, node: Any) -> List[Any]:
+        if isinstance(node, LexborHTMLParser):
+            return node.css(compiled)
+        # 在节点上查找时结果包括节点本身，这里去掉
+        return [match for match in node.css(compiled) if match.mem_id != node.mem_id]
+
+    def _strings(self, node: Any) -> Iterator[str]:
+        for child in node.iter(include_text=True):
+            if child.is_text_node:
+                yield child.text_content
+            elif child.is_element_node and child.tag not in SKIPPED_TEXT_TAGS:
+                yield from self._strings(child)
+
+    def attr(self, node: Any, name: str) -> Optional[str]:
+        return node.attributes.get(name)
+
+
+# 引擎名称 -> 实现
+ENGINES: Dict[str, Callable[[], HtmlEngine]] = {
+    'bs4': BeautifulSoupEngine,
+    'lxml': LxmlEngine,
+    'selectolax': SelectolaxEngine,
+}
+
+
+def available_engines() -> List[str]:
+    """当前环境可用的解析引擎"""
+    return [name for name in ENGINES if name != 'selectolax' or LexborHTMLParser is not None]
+
+
+def create_engine(name: str) -> HtmlEngine:
+    """按名称创建解析引擎，selectolax未安装时退回lxml"""
+    if name not in ENGINES:
+        raise ValueError(f"未知的解析引擎: {name}，可选: {', '.join(ENGINES)}")
+    if name == 'selectolax' and LexborHTMLParser is None:
+        spider_logger.warning("未安装selectolax，使用lxml解析页面")
+        name = 'lxml'
+    return ENGINES[name]()
+
+
+# 全局解析引擎实例
+html_engine = create_engine(PARSER_ENGINE)
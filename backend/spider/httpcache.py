@@ -0,0 +1,169 @@
+import time
+import zlib
+import sqlite3
+from pathlib import Path
+from typing import Optional
+
+from scrapy import Spider
+from scrapy.http import Headers, Request, Response
+from scrapy.responsetypes import responsetypes
+from scrapy.settings import Settings
+from scrapy.utils.project import data_path
+from w3lib.http import headers_dict_to_raw, headers_raw_to_dict
+from loguru import logger
+
+# 获取爬虫日志记录器
+spider_logger = logger.bind(name="spider")
+
+# zlib压缩级别，写入在反应器线程中进行，用最快的级别：
+# 比章节正文存储使用的6级快约三倍，压缩结果只大约10%
+ZLIB_LEVEL = 1
+
+# 超出容量时淘汰到容量的该比例以下，避免之后每次写入都触发淘汰
+EVICT_TARGET_RATIO = 0.9
+
+# 访问时间的精度（秒），同一页面在此时间内再次命中不更新访问时间，避免每次命中都写库
+TOUCH_INTERVAL = 60
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS responses (
+        id INTEGER PRIMARY KEY,
+        fingerprint BLOB NOT NULL UNIQUE,
+        url TEXT NOT NULL,
+        status INTEGER NOT NULL,
+        headers BLOB NOT NULL,
+        body BLOB NOT NULL,
+        size INTEGER NOT NULL,
+        stored_at REAL NOT NULL,
+        accessed_at REAL NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_responses_accessed_at ON responses(accessed_at)",
+]
+
+
+class SqliteCacheStorage:
+    """Scrapy HTTP缓存存储：每个爬虫一个SQLite文件，响应头和正文zlib压缩，超出容量时淘汰最久未使用的页面
+
+    FilesystemCacheStorage为每个响应创建一个目录和六个文件，从不压缩，只按过期时间失效而从不删除，
+    长期运行后缓存目录中有数百万个小文件。这里所有响应保存在HTTPCACHE_DIR下的一个数据库文件中，
+    压缩后的总大小超过HTTPCACHE_MAX_BYTES时按访问时间淘汰，删除后的空闲页交还给文件系统。
+    HTTPCACHE_EXPIRATION_SECS的含义与内置存储相同，过期的页面在打开时清理。
+
+    缓存只在反应器线程中使用，使用同步的sqlite3连接。
+    """
+
+    def __init__(self, settings: Settings):
+        self.cachedir = data_path(settings['HTTPCACHE_DIR'], createdir=True)
+        self.expiration_secs = settings.getint('HTTPCACHE_EXPIRATION_SECS')
+        # 压缩后的响应头、正文和URL的总字节数上限，0表示不限制
+        self.max_bytes = settings.getint('HTTPCACHE_MAX_BYTES', 0)
+        self.db: Optional[sqlite3.Connection] = None
+        self.total_bytes = 0
+
+    def open_spider(self, spider: Spider) -> None:
+        path = Path(self.cachedir, f"{spider.name}.sqlite3")
+        self.db = sqlite3.connect(str(path), isolation_level=None)
+        # auto_vacuum只在建表前设置才生效
+        self.db.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        self.db.execute("PRAGMA journal_mode = WAL")
+        self.db.execute("PRAGMA synchronous = NORMAL")
+        self.db.execute("PRAGMA busy_timeout = 5000")
+        for sql in SCHEMA:
+            self.db.execute(sql)
+        self._fingerprinter = spider.crawler.request_fingerprinter
+
+        if self.expiration_secs > 0:
+            self.db.execute("DELETE FROM responses WHERE stored_at < ?", (time.time() - self.expiration_secs,))
+        self.total_bytes = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        self._evict()
+        spider_logger.debug(f"HTTP缓存: {path}, {self.total_bytes} 字节")
+
+    def close_spider(self, spider: Spider) -> None:
+        if self.db is not None:
+            self.db.execute("PRAGMA optimize")
+            self.db.close()
+            self.db = None
+
+    def retrieve_response(self, spider: Spider, request: Request) -> Optional[Response]:
+        """返回缓存的响应，未缓存或已过期时返回None"""
+        row = self.db.execute(
+            "SELECT id, url, status, headers, body, stored_at, accessed_at FROM responses WHERE fingerprint = ?",
+            (self._fingerprinter.fingerprint(request),)
+        ).fetchone()
+        if row is None:
+            return None
+
+        entry_id, url, status, headers, body, stored_at, accessed_at = row
+        now = time.time()
+        if 0 < self.expiration_secs < now - stored_at:
+            # 过期的页面在重新下载后被覆盖
+            return None
+        if now - accessed_at >= TOUCH_INTERVAL:
+            self.db.execute("UPDATE responses SET accessed_at = ? WHERE id = ?", (now, entry_id))
+
+        headers = Headers(headers_raw_to_dict(zlib.decompress(headers)))
+        body = zlib.decompress(body)
+        respcls = responsetypes.from_args(headers=headers, url=url, body=body)
+        return respcls(url=url, headers=headers, status=status, body=body)
+
+    def store_response(self, spider: Spider, request: Request, response: Response) -> None:
+        """压缩保存响应，超出容量时淘汰最久未使用的页面"""
+        fingerprint = self._fingerprinter.fingerprint(request)
+        headers = zlib.compress(headers_dict_to_raw(response.headers), ZLIB_LEVEL)
+        body = zlib.compress(response.body, ZLIB_LEVEL)
+        size = len(headers) + len(body) + len(response.url)
+        if self.max_bytes and size > self.max_bytes * EVICT_TARGET_RATIO:
+            spider_logger.debug(f"响应过大，不缓存: {response.url}, {size} 字节")
+            return
+
+        now = time.time()
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            old = self.db.execute("SELECT size FROM responses WHERE fingerprint = ?", (fingerprint,)).fetchone()
+            self.db.execute(
+                """
+                INSERT INTO responses (fingerprint, url, status, headers, body, size, stored_at, accessed_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(fingerprint) DO UPDATE SET
+                    url = excluded.url, status = excluded.status, headers = excluded.headers,
+                    body = excluded.body, size = excluded.size,
+                    stored_at = excluded.stored_at, accessed_at = excluded.accessed_at
+                """,
+                (fingerprint, response.url, response.status, headers, body, size, now, now)
+            )
+            self.db.execute("COMMIT")
+        except BaseException:
+            self.db.execute("ROLLBACK")
+            raise
+        self.total_bytes += size - (old[0] if old else 0)
+        self._evict()
+
+    def _evict(self) -> None:
+        """总大小超出容量时，按访问时间从旧到新删除页面，直到低于容量的EVICT_TARGET_RATIO"""
+        if not self.max_bytes or self.total_bytes <= self.max_bytes:
+            return
+
+        excess = self.total_bytes - self.max_bytes * EVICT_TARGET_RATIO
+        evicted, freed = [], 0
+        cursor = self.db.execute("SELECT id, size FROM responses ORDER BY accessed_at")
+        for entry_id, size in cursor:
+            evicted.append((entry_id,))
+            freed += size
+            if freed >= excess:
+                break
+        # 提前结束的查询仍占用读事务，关闭后才能开始写事务
+        cursor.close()
+
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            self.db.executemany("DELETE FROM responses WHERE id = ?", evicted)
+            self.db.execute("COMMIT")
+        except BaseException:
+            self.db.execute("ROLLBACK")
+            raise
+        # 把删除后的空闲页交还给文件系统，每取一行释放一页
+        self.db.execute("PRAGMA incremental_vacuum").fetchall()
+        self.total_bytes -= freed
+        spider_logger.info(f"HTTP缓存超出容量，淘汰 {len(evicted)} 个页面，释放 {freed} 字节")
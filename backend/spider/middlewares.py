@@ -1,26 +1,67 @@
 import random
-from typing import Optional, Union, Type
+from typing import Iterable, Optional, Union, Type
 from scrapy import signals
 from scrapy.http import Request, Response
 from scrapy.spiders import Spider
 from scrapy.utils.response import response_status_message
 from scrapy.downloadermiddlewares.retry import RetryMiddleware
+from twisted.internet import reactor
+from twisted.internet.task import deferLater
 from loguru import logger
 
 from .settings import USER_AGENT_LIST
+from .rate_limiter import rate_limiter
 
 # 获取爬虫日志记录器
 spider_logger = logger.bind(name="spider")
 
+# 响应内容小于该字节数时视为错误页面并重试
+MIN_RESPONSE_SIZE = 100
+
+
+def random_user_agent() -> str:
+    """随机选择一个用户代理"""
+    user_agent = random.choice(USER_AGENT_LIST)
+    spider_logger.debug(f"使用User-Agent: {user_agent}")
+    return user_agent
+
+
+def retry_reason(status: int, body: bytes, retry_http_codes: Iterable[int]) -> Optional[str]:
+    """判断响应是否需要重试，需要时返回原因，Scrapy中间件和异步抓取后端共用"""
+    if status in retry_http_codes:
+        return response_status_message(status)
+
+    # 条件请求得到的304没有正文
+    if status == 304:
+        return None
+
+    # 检查响应内容是否为空或过小
+    if len(body) < MIN_RESPONSE_SIZE:  # 响应内容过小，可能是错误页面
+        return f"响应内容过小: {len(body)} bytes"
+
+    return None
+
 
 class RandomUserAgentMiddleware:
     """随机用户代理中间件"""
 
     def process_request(self, request: Request, spider: Spider) -> None:
         """处理请求，设置随机用户代理"""
-        user_agent = random.choice(USER_AGENT_LIST)
-        request.headers['User-Agent'] = user_agent
-        spider_logger.debug(f"使用User-Agent: {user_agent}")
+        request.headers['User-Agent'] = random_user_agent()
+
+
+class RateLimitMiddleware:
+    """按域名限速中间件，与httpx后端共用进程内的限速器，重试的请求同样需要获取令牌"""
+
+    async def process_request(self, request: Request, spider: Spider) -> None:
+        """请求发出前等待该域名的令牌"""
+        await rate_limiter.acquire(request.url, sleep=lambda delay: deferLater(reactor, delay))
+
+    def process_response(self, request: Request, response: Response, spider: Spider) -> Response:
+        """源站返回429/503时暂停该域名，缓存的响应不参与"""
+        if 'cached' not in response.flags:
+            rate_limiter.feedback(request.url, response.status, response.headers.get('Retry-After'))
+        return response
 
 
 class CustomRetryMiddleware(RetryMiddleware):
@@ -38,13 +79,8 @@ class CustomRetryMiddleware(RetryMiddleware):
         if request.meta.get('dont_retry', False):
             return response
 
-        if response.status in self.retry_http_codes:
-            reason = response_status_message(response.status)
-            return self._retry(request, reason, spider) or response
-
-        # 检查响应内容是否为空或过小
-        if len(response.body) < 100:  # 响应内容过小，可能是错误页面
-            reason = f"响应内容过小: {len(response.body)} bytes"
+        reason = retry_reason(response.status, response.body, self.retry_http_codes)
+        if reason:
             return self._retry(request, reason, spider) or response
 
         return response
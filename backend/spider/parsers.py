@@ -0,0 +1,227 @@
+from functools import lru_cache
+from typing import Dict, Any, Callable, List, Optional
+from urllib.parse import urljoin, urlsplit
+
+from loguru import logger
+
+from utils.rule_registry import CompiledRule
+from .html_engines import HtmlEngine, html_engine
+
+# 获取爬虫日志记录器
+spider_logger = logger.bind(name="spider")
+
+# 规则未配置搜索结果选择器时，依次尝试的常见页面结构
+SEARCH_ITEM_SELECTORS = 'div.result-item, div.book-item, li.book-list, div.novel-item'
+SEARCH_TITLE_SELECTORS = 'a.book-name, a.title, h3 > a, div.name > a'
+SEARCH_AUTHOR_SELECTORS = 'span.author, div.author, p.author'
+SEARCH_COVER_SELECTORS = 'img.cover, div.cover > img, img.book-cover'
+SEARCH_DESC_SELECTORS = 'p.desc, div.intro, div.description'
+FALLBACK_ITEM_SELECTORS = 'div.book, li.result, div.search-result-item'
+FALLBACK_TITLE_SELECTORS = 'a, h3, div.title'
+
+
+@lru_cache(maxsize=256)
+def _origin(base_url: str) -> str:
+    parts = urlsplit(base_url)
+    return f"{parts.scheme}://{parts.netloc}" if parts.scheme and parts.netloc else ''
+
+
+def _absolute(link: Optional[str], base_url: str) -> Optional[str]:
+    """处理相对URL"""
+    if link and not link.startswith('http'):
+        # 目录页的链接大多以/开头，直接拼接站点地址，比urljoin快得多
+        origin = _origin(base_url)
+        if origin and link.startswith('/') and not link.startswith('//') and '/.' not in link:
+            return origin + link
+        return urljoin(base_url, link)
+    return link
+
+
+def build_search_url(rule: CompiledRule, keyword: str) -> Optional[str]:
+    """根据规则生成搜索页URL，规则未配置搜索地址时返回None"""
+    if not rule['search_url']:
+        return None
+    return rule['search_url'].replace('{keyword}', keyword)
+
+
+def parse_search_results(rule: CompiledRule, html: str, url: str,
+                         engine: Optional[HtmlEngine] = None) -> List[Dict[str, Any]]:
+    """解析搜索结果"""
+    engine = engine or html_engine
+    try:
+        # 解析HTML
+        doc = engine.parse(html)
+
+        # 提取搜索结果列表
+        results = []
+
+        # 由于每个网站的结构不同，这里使用一些常见的选择器尝试提取
+        for item in engine.css(SEARCH_ITEM_SELECTORS, doc):
+            # 提取标题和链接
+            title_elem = engine.css_one(SEARCH_TITLE_SELECTORS, item)
+            if title_elem is None:
+                continue
+
+            title = engine.text(title_elem)
+            link = engine.attr(title_elem, 'href')
+            if not link:
+                continue
+
+            # 提取作者
+            author_elem = engine.css_one(SEARCH_AUTHOR_SELECTORS, item)
+            author = engine.text(author_elem) if author_elem is not None else None
+
+            # 提取封面
+            cover_elem = engine.css_one(SEARCH_COVER_SELECTORS, item)
+            cover = _absolute(engine.attr(cover_elem, 'src'), url) if cover_elem is not None else None
+
+            # 提取描述
+            desc_elem = engine.css_one(SEARCH_DESC_SELECTORS, item)
+            description = engine.text(desc_elem) if desc_elem is not None else None
+
+            results.append({
+                'type': 'search_result',
+                'title': title,
+                'author': author,
+                'cover': cover,
+                'description': description,
+                'source': rule['name'],
+                'source_url': _absolute(link, url)
+            })
+
+        # 如果没有找到结果，尝试其他常见的选择器
+        if not results:
+            for item in engine.css(FALLBACK_ITEM_SELECTORS, doc):
+                title_elem = engine.css_one(FALLBACK_TITLE_SELECTORS, item)
+                if title_elem is None:
+                    continue
+
+                title = engine.text(title_elem)
+                link = engine.attr(title_elem, 'href')
+                if not link:
+                    continue
+
+                results.append({
+                    'type': 'search_result',
+                    'title': title,
+                    'author': None,
+                    'cover': None,
+                    'description': None,
+                    'source': rule['name'],
+                    'source_url': _absolute(link, url)
+                })
+
+        spider_logger.info(f"搜索结果: {len(results)} 条")
+        return results
+
+    except Exception as e:
+        spider_logger.error(f"解析搜索结果失败: {str(e)}")
+        return []
+
+
+def parse_novel_detail(rule: CompiledRule, html: str, url: str,
+                       engine: Optional[HtmlEngine] = None) -> Dict[str, Any]:
+    """解析小说详情"""
+    engine = engine or html_engine
+    try:
+        doc = engine.parse(html)
+
+        result = {
+            'type': 'novel_detail',
+            'source_url': url,
+            'source': rule['name']
+        }
+
+        title_elem = engine.select_one(rule, 'title_rule', doc)
+        if title_elem is not None:
+            result['title'] = engine.text(title_elem)
+
+        author_elem = engine.select_one(rule, 'author_rule', doc)
+        if author_elem is not None:
+            result['author'] = engine.text(author_elem)
+
+        cover_elem = engine.select_one(rule, 'cover_rule', doc)
+        if cover_elem is not None:
+            result['cover'] = _absolute(engine.attr(cover_elem, 'src'), url)
+
+        desc_elem = engine.select_one(rule, 'description_rule', doc)
+        if desc_elem is not None:
+            result['description'] = engine.text(desc_elem)
+
+        # 通常小说详情页就包含章节列表，这里假设章节列表就在当前页面
+        result['chapters_url'] = url
+
+        spider_logger.info(f"获取小说详情成功: {result.get('title', '未知标题')}")
+        return result
+
+    except Exception as e:
+        spider_logger.error(f"解析小说详情失败: {str(e)}")
+        return {}
+
+
+def parse_chapter_list(rule: CompiledRule, html: str, url: str, novel_id: Optional[int] = None,
+                       engine: Optional[HtmlEngine] = None) -> List[Dict[str, Any]]:
+    """解析章节列表"""
+    engine = engine or html_engine
+    try:
+        if not rule['chapter_list_rule']:
+            return []
+
+        doc = engine.parse(html)
+
+        chapters = []
+        for index, elem in enumerate(engine.select(rule, 'chapter_list_rule', doc)):
+            # 提取章节标题和链接
+            title = engine.text(elem)
+            link = engine.attr(elem, 'href')
+
+            if not title or not link:
+                continue
+
+            chapters.append({
+                'novel_id': novel_id,
+                'title': title,
+                'chapter_index': index,
+                'source_url': _absolute(link, url)
+            })
+
+        spider_logger.info(f"获取章节列表成功: {len(chapters)} 章")
+        return chapters
+
+    except Exception as e:
+        spider_logger.error(f"解析章节列表失败: {str(e)}")
+        return []
+
+
+def parse_chapter_content(rule: CompiledRule, html: str, url: str = '',
+                          engine: Optional[HtmlEngine] = None) -> str:
+    """解析章节内容"""
+    engine = engine or html_engine
+    try:
+        if not rule['chapter_content_rule']:
+            return ""
+
+        doc = engine.parse(html)
+
+        content_elem = engine.select_one(rule, 'chapter_content_rule', doc)
+        if content_elem is None:
+            return ""
+
+        # 获取纯文本内容，移除多余空行和广告文本
+        content = rule.clean(engine.text(content_elem, '\n'))
+
+        spider_logger.info(f"获取章节内容成功: {len(content)} 字符")
+        return content
+
+    except Exception as e:
+        spider_logger.error(f"解析章节内容失败: {str(e)}")
+        return ""
+
+
+# 抓取任务类型 -> 解析函数，解析函数的参数为(规则, 页面HTML, 页面URL, **任务参数)
+PARSERS: Dict[str, Callable[..., Any]] = {
+    'search': parse_search_results,
+    'detail': parse_novel_detail,
+    'chapters': parse_chapter_list,
+    'content': parse_chapter_content,
+}
@@ -37,12 +37,4 @@ class NovelPipeline:
                 if not item[key]:
                     item[key] = None
 
-        # 处理特定字段
-        if 'content' in item and item['content']:
-            # 清理章节内容
-            content = item['content']
-            # 移除多余空行
-            content = '\n'.join(line for line in content.split('\n') if line.strip())
-            # 规范化段落
-            content = content.replace('\r\n', '\n').replace('\r', '\n')
-            item['content'] = content
+        # 章节内容已在解析时由规则的清理器处理（见spider/parsers.py），这里不再重复拆分合并
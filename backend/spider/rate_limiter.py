@@ -0,0 +1,239 @@
+import os
+import time
+import asyncio
+import threading
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+from loguru import logger
+from dotenv import load_dotenv
+
+# 加载环境变量
+load_dotenv()
+
+# 获取爬虫日志记录器
+spider_logger = logger.bind(name="spider")
+
+# 每个域名每秒允许发出的请求数，0表示不限速
+RATE_LIMIT_PER_HOST = float(os.getenv("RATE_LIMIT_PER_HOST", "2"))
+
+# 每个域名允许的突发请求数（令牌桶容量）
+RATE_LIMIT_BURST = int(os.getenv("RATE_LIMIT_BURST", "4"))
+
+# 单独配置的域名速率，格式为"域名=每秒请求数[:突发数]"，多个用逗号分隔，如"www.example.com=0.5:1"
+RATE_LIMIT_HOSTS = os.getenv("RATE_LIMIT_HOSTS", "")
+
+# 收到429/503后首次暂停该域名的时间（秒），连续触发时加倍
+RATE_LIMIT_BACKOFF = float(os.getenv("RATE_LIMIT_BACKOFF", "5"))
+
+# 暂停时间上限（秒），响应头Retry-After要求的时间也不超过该值
+RATE_LIMIT_MAX_BACKOFF = float(os.getenv("RATE_LIMIT_MAX_BACKOFF", "300"))
+
+# 表示源站要求降低请求频率的状态码
+BACKOFF_HTTP_CODES = frozenset((429, 503))
+
+
+def parse_host_rates(config: str) -> Dict[str, Tuple[float, int]]:
+    """解析RATE_LIMIT_HOSTS，返回 域名 -> (每秒请求数, 突发数)，格式错误的项记录日志后忽略"""
+    rates = {}
+    for item in config.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        try:
+            host, value = item.split('=', 1)
+            rate, _, burst = value.partition(':')
+            rates[host.strip().lower()] = (float(rate), int(burst) if burst else RATE_LIMIT_BURST)
+        except ValueError:
+            spider_logger.error(f"无效的域名限速配置: {item}")
+    return rates
+
+
+def retry_after_seconds(value: Any) -> Optional[float]:
+    """解析响应头Retry-After，支持秒数和HTTP日期，无法解析时返回None"""
+    if value is None:
+        return None
+    if isinstance(value, bytes):
+        value = value.decode('latin-1')
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class _HostBucket:
+    """一个域名的限速状态和统计"""
+
+    __slots__ = (
+        "rate", "burst", "next_at", "paused_until", "backoff",
+        "waiting", "max_waiting", "requests", "delayed", "wait_seconds", "backoffs",
+    )
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(1, burst)
+        # 下一个令牌的理论发放时间，早于当前时间的部分即桶中积累的令牌
+        self.next_at = 0.0
+        self.paused_until = 0.0
+        self.backoff = 0.0
+        self.waiting = 0
+        self.max_waiting = 0
+        self.requests = 0
+        self.delayed = 0
+        self.wait_seconds = 0.0
+        self.backoffs = 0
+
+
+class HostRateLimiter:
+    """进程内按域名共享的令牌桶限速器
+
+    Scrapy的DOWNLOAD_DELAY和AutoThrottle只在一个Crawler内部生效，httpx后端则完全不限速。
+    所有抓取请求发出前都从这里按域名获取令牌：每秒发放rate个，最多积累burst个；
+    令牌不足时预约下一个令牌并等待，等待中的请求数即该域名的队列深度。
+    收到429或503时暂停该域名（优先使用Retry-After，否则按RATE_LIMIT_BACKOFF加倍），
+    暂停期间醒来的请求重新排队，暂停结束后按速率逐个发出，不会同时涌向源站；成功响应后重置暂停时间。
+
+    Scrapy后端在反应器线程中调用，httpx后端在事件循环中调用，状态由锁保护，
+    等待方式由调用方提供（asyncio.sleep或Twisted的deferLater）。
+    """
+
+    def __init__(
+        self,
+        rate: float = RATE_LIMIT_PER_HOST,
+        burst: int = RATE_LIMIT_BURST,
+        host_rates: Optional[Dict[str, Tuple[float, int]]] = None,
+        backoff: float = RATE_LIMIT_BACKOFF,
+        max_backoff: float = RATE_LIMIT_MAX_BACKOFF,
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.host_rates = dict(host_rates or {})
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._buckets: Dict[str, _HostBucket] = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, host: str) -> _HostBucket:
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            rate, burst = self.host_rates.get(host, (self.rate, self.burst))
+            bucket = self._buckets[host] = _HostBucket(rate, burst)
+        return bucket
+
+    def set_host_rate(self, host: str, rate: float, burst: Optional[int] = None) -> None:
+        """设置一个域名的速率，rate为0表示不限速"""
+        host = host.lower()
+        burst = burst if burst is not None else self.burst
+        with self._lock:
+            self.host_rates[host] = (rate, burst)
+            bucket = self._bucket(host)
+            bucket.rate = rate
+            bucket.burst = max(1, burst)
+
+    def _reserve(self, host: str, requeue: bool = False) -> float:
+        """预约一个令牌，返回需要等待的秒数，requeue表示暂停后重新排队，不重复计数"""
+        with self._lock:
+            bucket = self._bucket(host)
+            now = time.monotonic()
+            if not requeue:
+                bucket.requests += 1
+            if bucket.rate <= 0:
+                delay = max(0.0, bucket.paused_until - now)
+                if delay > 0 and not requeue:
+                    bucket.delayed += 1
+                return delay
+
+            interval = 1 / bucket.rate
+            # 最多积累burst个令牌，暂停期间不积累
+            start = max(bucket.next_at, now - (bucket.burst - 1) * interval, bucket.paused_until)
+            bucket.next_at = start + interval
+            delay = start - now
+            if delay > 0 and not requeue:
+                bucket.delayed += 1
+            return max(0.0, delay)
+
+    def _paused_for(self, host: str) -> float:
+        with self._lock:
+            return max(0.0, self._bucket(host).paused_until - time.monotonic())
+
+    def _track_waiting(self, host: str, change: int, waited: float = 0.0) -> None:
+        with self._lock:
+            bucket = self._bucket(host)
+            bucket.waiting += change
+            bucket.max_waiting = max(bucket.max_waiting, bucket.waiting)
+            bucket.wait_seconds += waited
+
+    async def acquire(self, url: str, sleep: Callable[[float], Awaitable] = asyncio.sleep) -> float:
+        """等待获取该URL所在域名的令牌，返回等待的秒数"""
+        host = (urlsplit(url).hostname or '').lower()
+        delay = self._reserve(host)
+        if delay <= 0:
+            return 0.0
+
+        started = time.monotonic()
+        self._track_waiting(host, 1)
+        try:
+            while delay > 0:
+                await sleep(delay)
+                # 等待期间该域名被暂停时重新排队
+                delay = self._reserve(host, requeue=True) if self._paused_for(host) > 0 else 0.0
+        finally:
+            waited = time.monotonic() - started
+            self._track_waiting(host, -1, waited)
+        return waited
+
+    def feedback(self, url: str, status: int, retry_after: Any = None) -> None:
+        """根据响应状态调整：429/503时暂停该域名，其他成功响应重置暂停时间"""
+        host = (urlsplit(url).hostname or '').lower()
+        if status not in BACKOFF_HTTP_CODES:
+            if status < 400:
+                with self._lock:
+                    self._bucket(host).backoff = 0.0
+            return
+
+        requested = retry_after_seconds(retry_after)
+        with self._lock:
+            bucket = self._bucket(host)
+            bucket.backoff = min(self.max_backoff, bucket.backoff * 2 if bucket.backoff else self.backoff)
+            pause = min(self.max_backoff, max(bucket.backoff, requested or 0.0))
+            bucket.paused_until = max(bucket.paused_until, time.monotonic() + pause)
+            bucket.backoffs += 1
+        spider_logger.warning(f"{host} 返回HTTP {status}，暂停该域名的请求 {pause:.1f} 秒")
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """各域名的速率、队列深度、等待时间和暂停情况"""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                host: {
+                    "rate": bucket.rate,
+                    "burst": bucket.burst,
+                    "waiting": bucket.waiting,
+                    "max_waiting": bucket.max_waiting,
+                    "requests": bucket.requests,
+                    "delayed": bucket.delayed,
+                    "avg_wait_ms": round(bucket.wait_seconds / bucket.delayed * 1000, 1) if bucket.delayed else 0.0,
+                    "backoffs": bucket.backoffs,
+                    "paused_for": round(max(0.0, bucket.paused_until - now), 1),
+                }
+                for host, bucket in sorted(self._buckets.items())
+            }
+
+    def reset(self) -> None:
+        """清空所有域名的状态和统计"""
+        with self._lock:
+            self._buckets.clear()
+
+
+# 全局限速器实例
+rate_limiter = HostRateLimiter(host_rates=parse_host_rates(RATE_LIMIT_HOSTS))
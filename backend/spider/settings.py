@@ -14,14 +14,15 @@ ROBOTSTXT_OBEY = False
 # 配置最大并发请求数
 CONCURRENT_REQUESTS = 16
 
+# 同一域名的最大并发请求数，批量下载章节时同时进行的请求数也以此为限
+CONCURRENT_REQUESTS_PER_DOMAIN = 8
+
 # 下载超时时间
 DOWNLOAD_TIMEOUT = 15
 
-# 下载延迟
-DOWNLOAD_DELAY = 0.5
-
-# 随机化下载延迟
-RANDOMIZE_DOWNLOAD_DELAY = True
+# 下载延迟，同一域名的请求频率由spider/rate_limiter.py按域名统一限制，
+# Scrapy和httpx后端的所有请求共用，这里不再额外延迟
+DOWNLOAD_DELAY = 0
 
 # 禁用cookies
 COOKIES_ENABLED = False
@@ -46,7 +47,9 @@ HTTPCACHE_ENABLED = True
 HTTPCACHE_EXPIRATION_SECS = 86400  # 24小时
 HTTPCACHE_DIR = 'httpcache'
 HTTPCACHE_IGNORE_HTTP_CODES = []
-HTTPCACHE_STORAGE = 'scrapy.extensions.httpcache.FilesystemCacheStorage'
+# 所有页面保存在一个SQLite文件中，压缩存储，超出容量时淘汰最久未使用的页面
+HTTPCACHE_STORAGE = 'spider.httpcache.SqliteCacheStorage'
+HTTPCACHE_MAX_BYTES = 256 * 1024 * 1024  # 256MB，压缩后的大小
 
 # 下载器中间件
 DOWNLOADER_MIDDLEWARES = {
@@ -55,6 +58,8 @@ DOWNLOADER_MIDDLEWARES = {
     'scrapy.downloadermiddlewares.httpproxy.HttpProxyMiddleware': 100,
     'spider.middlewares.RandomUserAgentMiddleware': 400,
     'spider.middlewares.CustomRetryMiddleware': 550,
+    # 在HTTP缓存(900)之后，命中缓存的请求不占用令牌
+    'spider.middlewares.RateLimitMiddleware': 950,
 }
 
 # 项目管道
@@ -62,11 +67,8 @@ ITEM_PIPELINES = {
     'spider.pipelines.NovelPipeline': 300,
 }
 
-# 启用自动限速
-AUTOTHROTTLE_ENABLED = True
-AUTOTHROTTLE_START_DELAY = 1.0
-AUTOTHROTTLE_MAX_DELAY = 5.0
-AUTOTHROTTLE_TARGET_CONCURRENCY = 1.0
+# 自动限速只在一个Crawler内部生效，由按域名共享的限速器代替
+AUTOTHROTTLE_ENABLED = False
 
 # 随机用户代理列表
 USER_AGENT_LIST = [
@@ -1,217 +1,197 @@
 import os
 import asyncio
-import json
-from typing import List, Dict, Any, Optional, Callable
+from typing import List, Dict, Any, Optional, Tuple, AsyncIterator
 from loguru import logger
-from scrapy.crawler import CrawlerRunner
-from scrapy.utils.project import get_project_settings
-from twisted.internet import reactor
-from twisted.internet.defer import Deferred
-from threading import Thread
+from dotenv import load_dotenv
 
-from .spiders.novel_spider import NovelSpider
-from .spiders.chapter_spider import ChapterSpider
-from database.models import SearchResult, Novel, Chapter
-from utils.cache import cached
+from database import crud
+from database.models import SearchResult
+from utils.rule_registry import rule_registry, CompiledRule
+from .crawler_service import crawler_service, stop_reactor
+from .async_fetcher import async_fetcher
+from .settings import CONCURRENT_REQUESTS_PER_DOMAIN
+from .parsers import build_search_url
+from .conditional import NOT_MODIFIED
+
+# 加载环境变量
+load_dotenv()
 
 # 获取爬虫日志记录器
 spider_logger = logger.bind(name="spider")
 
+# 抓取后端：scrapy为常驻Scrapy爬虫（运行在反应器线程），httpx为在应用事件循环中请求的异步客户端
+SPIDER_BACKEND = os.getenv("SPIDER_BACKEND", "scrapy").lower()
 
-def _run_reactor():
-    """在单独的线程中运行Twisted反应器"""
-    if not reactor.running:
-        Thread(target=reactor.run, args=(False,), daemon=True).start()
-
-
-def _stop_reactor():
-    """停止Twisted反应器"""
-    if reactor.running:
-        reactor.stop()
-
-
-def _to_future(deferred):
-    """将Deferred转换为Future"""
-    future = asyncio.Future()
-
-    def callback(result):
-        if not future.done():
-            future.set_result(result)
-
-    def errback(failure):
-        if not future.done():
-            future.set_exception(failure.value)
-
-    deferred.addCallbacks(callback, errback)
-    return future
+# 抓取后端名称 -> 实现，两者的fetch和fetch_conditional接口相同
+BACKENDS = {
+    "scrapy": crawler_service,
+    "httpx": async_fetcher,
+}
 
 
 class SpiderManager:
-    """爬虫管理器"""
+    """爬虫管理器
 
-    def __init__(self):
+    页面交给SPIDER_BACKEND选择的抓取后端：常驻的爬虫服务（spider/crawler_service.py）
+    或异步HTTP客户端（spider/async_fetcher.py），两者使用相同的规则和解析函数。
+    """
+
+    def __init__(self, backend: str = SPIDER_BACKEND):
         """初始化爬虫管理器"""
-        self.settings = get_project_settings()
-        self.runner = CrawlerRunner(self.settings)
-        self.results = {}
-        self.callbacks = {}
-        _run_reactor()
+        if backend not in BACKENDS:
+            raise ValueError(f"未知的抓取后端: {backend}，可选: {', '.join(BACKENDS)}")
+        self.backend = backend
+        self.service = BACKENDS[backend]
+        spider_logger.info(f"抓取后端: {backend}")
+
+    async def _get_rule(self, rule_id: int) -> Optional[CompiledRule]:
+        """获取规则"""
+        rule = await rule_registry.get(rule_id)
+        if not rule:
+            spider_logger.error(f"规则不存在: {rule_id}")
+        return rule
 
     async def search_novel(self, keyword: str, rule_id: int) -> List[SearchResult]:
         """搜索小说"""
         spider_logger.info(f"搜索小说: {keyword}, 规则ID: {rule_id}")
 
-        # 生成唯一任务ID
-        task_id = f"search_{keyword}_{rule_id}_{id(self)}"
-
-        # 创建结果Future
-        future = asyncio.Future()
-        self.callbacks[task_id] = future
-
-        # 启动爬虫
-        d = self.runner.crawl(
-            NovelSpider,
-            keyword=keyword,
-            rule_id=rule_id,
-            task_id=task_id,
-            callback=self._spider_callback
-        )
-
-        # 等待爬虫完成
-        await _to_future(d)
+        rule = await self._get_rule(rule_id)
+        search_url = build_search_url(rule, keyword) if rule else None
+        if not search_url:
+            return []
 
-        # 等待结果
         try:
-            result = await asyncio.wait_for(future, timeout=60)
-            return result
+            return await self.service.fetch("search", search_url, rule)
         except asyncio.TimeoutError:
             spider_logger.error(f"搜索小说超时: {keyword}, 规则ID: {rule_id}")
-            return []
-        finally:
-            # 清理回调
-            if task_id in self.callbacks:
-                del self.callbacks[task_id]
-
-    async def get_novel_detail(self, url: str, rule_id: int) -> Optional[Dict[str, Any]]:
-        """获取小说详情"""
+        except Exception as e:
+            spider_logger.error(f"搜索小说失败: {keyword}, 规则ID: {rule_id}, {str(e)}")
+        return []
+
+    async def _fetch_page(self, kind: str, url: str, rule: CompiledRule, revalidate: bool, **params) -> Any:
+        """抓取页面，revalidate时按上次保存的ETag和Last-Modified发送条件请求
+
+        页面未变化时返回NOT_MODIFIED，否则保存新的验证信息。验证信息与规则版本一起保存，
+        规则修改后解析结果可能不同，此时发送普通请求。
+        """
+        if not revalidate:
+            return await self.service.fetch(kind, url, rule, **params)
+
+        version = str(rule.version) if rule.version is not None else None
+        stored = await crud.get_http_validators(url, kind)
+        validators = stored if stored and stored['rule_version'] == version else {}
+        result, fresh = await self.service.fetch_conditional(kind, url, rule, validators, **params)
+        if result is NOT_MODIFIED:
+            spider_logger.info(f"页面未变化: {url}")
+        elif result:
+            await crud.save_http_validators(url, kind, fresh['etag'], fresh['last_modified'], version)
+        return result
+
+    async def get_novel_detail(self, url: str, rule_id: int, revalidate: bool = False) -> Any:
+        """获取小说详情，revalidate时页面未变化返回NOT_MODIFIED"""
         spider_logger.info(f"获取小说详情: {url}, 规则ID: {rule_id}")
 
-        # 生成唯一任务ID
-        task_id = f"detail_{url}_{rule_id}_{id(self)}"
-
-        # 创建结果Future
-        future = asyncio.Future()
-        self.callbacks[task_id] = future
-
-        # 启动爬虫
-        d = self.runner.crawl(
-            NovelSpider,
-            url=url,
-            rule_id=rule_id,
-            task_id=task_id,
-            callback=self._spider_callback,
-            detail_mode=True
-        )
-
-        # 等待爬虫完成
-        await _to_future(d)
+        rule = await self._get_rule(rule_id)
+        if not rule or not url:
+            return None
 
-        # 等待结果
         try:
-            result = await asyncio.wait_for(future, timeout=60)
-            return result
+            return await self._fetch_page("detail", url, rule, revalidate)
         except asyncio.TimeoutError:
             spider_logger.error(f"获取小说详情超时: {url}, 规则ID: {rule_id}")
-            return None
-        finally:
-            # 清理回调
-            if task_id in self.callbacks:
-                del self.callbacks[task_id]
+        except Exception as e:
+            spider_logger.error(f"获取小说详情失败: {url}, 规则ID: {rule_id}, {str(e)}")
+        return None
 
-    async def get_chapters(self, novel_id: int, url: str, rule_id: int) -> List[Dict[str, Any]]:
-        """获取小说章节列表"""
+    async def get_chapters(self, novel_id: int, url: str, rule_id: int, revalidate: bool = False) -> Any:
+        """获取小说章节列表，revalidate时页面未变化返回NOT_MODIFIED"""
         spider_logger.info(f"获取小说章节列表: 小说ID: {novel_id}, URL: {url}, 规则ID: {rule_id}")
 
-        # 生成唯一任务ID
-        task_id = f"chapters_{novel_id}_{rule_id}_{id(self)}"
-
-        # 创建结果Future
-        future = asyncio.Future()
-        self.callbacks[task_id] = future
-
-        # 启动爬虫
-        d = self.runner.crawl(
-            ChapterSpider,
-            novel_id=novel_id,
-            url=url,
-            rule_id=rule_id,
-            task_id=task_id,
-            callback=self._spider_callback,
-            mode="list"
-        )
-
-        # 等待爬虫完成
-        await _to_future(d)
+        rule = await self._get_rule(rule_id)
+        if not rule or not url:
+            return []
 
-        # 等待结果
         try:
-            result = await asyncio.wait_for(future, timeout=60)
-            return result
+            return await self._fetch_page("chapters", url, rule, revalidate, novel_id=novel_id)
         except asyncio.TimeoutError:
             spider_logger.error(f"获取小说章节列表超时: 小说ID: {novel_id}, URL: {url}")
-            return []
-        finally:
-            # 清理回调
-            if task_id in self.callbacks:
-                del self.callbacks[task_id]
+        except Exception as e:
+            spider_logger.error(f"获取小说章节列表失败: 小说ID: {novel_id}, URL: {url}, {str(e)}")
+        return []
 
     async def get_chapter_content(self, chapter_id: int, url: str, rule_id: int) -> Optional[str]:
         """获取章节内容"""
         spider_logger.info(f"获取章节内容: 章节ID: {chapter_id}, URL: {url}, 规则ID: {rule_id}")
 
-        # 生成唯一任务ID
-        task_id = f"content_{chapter_id}_{rule_id}_{id(self)}"
-
-        # 创建结果Future
-        future = asyncio.Future()
-        self.callbacks[task_id] = future
-
-        # 启动爬虫
-        d = self.runner.crawl(
-            ChapterSpider,
-            chapter_id=chapter_id,
-            url=url,
-            rule_id=rule_id,
-            task_id=task_id,
-            callback=self._spider_callback,
-            mode="content"
-        )
-
-        # 等待爬虫完成
-        await _to_future(d)
+        rule = await self._get_rule(rule_id)
+        if not rule or not url:
+            return None
 
-        # 等待结果
         try:
-            result = await asyncio.wait_for(future, timeout=60)
-            return result
+            return await self.service.fetch("content", url, rule)
         except asyncio.TimeoutError:
             spider_logger.error(f"获取章节内容超时: 章节ID: {chapter_id}, URL: {url}")
-            return None
+        except Exception as e:
+            spider_logger.error(f"获取章节内容失败: 章节ID: {chapter_id}, URL: {url}, {str(e)}")
+        return None
+
+    async def get_chapter_contents(
+        self, chapters: List[Tuple[int, str]], rule_id: int, concurrency: int = CONCURRENT_REQUESTS_PER_DOMAIN
+    ) -> AsyncIterator[Tuple[int, Optional[str]]]:
+        """批量获取章节内容，按完成顺序逐个返回(章节ID, 内容)，获取失败的章节内容为None
+
+        同时进行的请求不超过concurrency个，一个完成后立即发出下一个，整本书的下载时间取决于并发数而不是单页延迟。
+        请求还受按域名共享的限速器（spider/rate_limiter.py）约束，Scrapy后端中还受下载器的同域名并发数约束。请求不会一次全部排入下载队列，
+        阅读时单独获取的章节不必等整本书下载完。
+        """
+        spider_logger.info(f"批量获取章节内容: {len(chapters)} 章, 规则ID: {rule_id}, 并发数: {concurrency}")
+
+        rule = await self._get_rule(rule_id)
+        if not rule:
+            for chapter_id, _ in chapters:
+                yield chapter_id, None
+            return
+
+        queue = iter(chapters)
+        # 进行中的任务 -> (章节ID, URL)
+        running: Dict[asyncio.Task, Tuple[int, str]] = {}
+        try:
+            while True:
+                while len(running) < concurrency:
+                    chapter = next(queue, None)
+                    if chapter is None:
+                        break
+                    chapter_id, url = chapter
+                    if not url:
+                        yield chapter_id, None
+                        continue
+                    running[asyncio.ensure_future(self.service.fetch("content", url, rule))] = chapter
+                if not running:
+                    break
+
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    chapter_id, url = running.pop(task)
+                    yield chapter_id, self._chapter_result(task, chapter_id, url)
         finally:
-            # 清理回调
-            if task_id in self.callbacks:
-                del self.callbacks[task_id]
-
-    def _spider_callback(self, task_id: str, result: Any) -> None:
-        """爬虫回调函数"""
-        if task_id in self.callbacks:
-            future = self.callbacks[task_id]
-            if not future.done():
-                future.set_result(result)
-
-    def close(self) -> None:
+            # 调用方提前停止迭代时取消未完成的请求
+            for task in running:
+                task.cancel()
+
+    def _chapter_result(self, task: asyncio.Task, chapter_id: int, url: str) -> Optional[str]:
+        """取出批量下载中一个章节的结果，失败时记录日志并返回None"""
+        try:
+            return task.result()
+        except asyncio.TimeoutError:
+            spider_logger.error(f"获取章节内容超时: 章节ID: {chapter_id}, URL: {url}")
+        except Exception as e:
+            spider_logger.error(f"获取章节内容失败: 章节ID: {chapter_id}, URL: {url}, {str(e)}")
+        return None
+
+    async def close(self) -> None:
         """关闭爬虫管理器"""
-        _stop_reactor()
+        await self.service.stop()
+        stop_reactor()
 
 
 # 创建全局爬虫管理器实例
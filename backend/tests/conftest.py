@@ -0,0 +1,38 @@
+"""测试公共夹具：每个测试使用独立的临时数据库
+
+测试在backend目录下运行:
+    python -m pytest -q
+"""
+import os
+import sys
+import asyncio
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import init_db  # noqa: E402
+from database.pool import db_pool  # noqa: E402
+from database.writer import db_writer  # noqa: E402
+
+
+@pytest.fixture
+def temp_db(tmp_path, monkeypatch):
+    """切换到临时数据库文件并执行全部迁移，返回数据库路径"""
+    path = str(tmp_path / "test.db")
+    monkeypatch.setattr(init_db, "DB_PATH", path)
+    asyncio.run(init_db.init_db())
+    return path
+
+
+def run_with_db(coro_func):
+    """在新的事件循环中打开连接池和写协程后运行测试协程，结束后关闭"""
+    async def runner():
+        await db_pool.open()
+        await db_writer.open()
+        try:
+            return await coro_func()
+        finally:
+            await db_writer.close()
+            await db_pool.close()
+    return asyncio.run(runner())
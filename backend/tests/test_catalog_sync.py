@@ -0,0 +1,47 @@
+from database import crud
+from database.models import ChapterCreate, HistoryCreate, NovelCreate
+from tests.conftest import run_with_db
+
+
+def _catalog(novel_id: int, indexes):
+    return [
+        ChapterCreate(novel_id=novel_id, title=f"第{i}章", chapter_index=i, source_url=f"https://example.com/{i}")
+        for i in indexes
+    ]
+
+
+def test_truncated_catalog_keeps_reading_progress(temp_db):
+    """目录页被截断时，仍有阅读记录的章节保留，阅读进度不被级联删除"""
+    async def scenario():
+        novel_id = await crud.create_novel(NovelCreate(title="测试小说"))
+        await crud.sync_chapter_catalog(novel_id, _catalog(novel_id, range(1, 4)))
+        chapters = await crud.get_novel_chapters(novel_id)
+        await crud.add_history(HistoryCreate(novel_id=novel_id, chapter_id=chapters[1]['id'], read_position=120))
+
+        counts = await crud.sync_chapter_catalog(novel_id, _catalog(novel_id, [1]))
+        remaining = [chapter['chapter_index'] for chapter in await crud.get_novel_chapters(novel_id)]
+        history, total = await crud.get_history()
+        return counts, remaining, total, history
+
+    counts, remaining, total, history = run_with_db(scenario)
+    assert counts["removed"] == 1
+    assert counts["kept"] == 1
+    assert remaining == [1, 2]
+    assert total == 1
+    assert history[0]['read_position'] == 120
+
+
+def test_bulk_import_skips_existing_chapters(temp_db):
+    """重复导入同一目录时跳过来源地址已存在的章节，不违反唯一索引"""
+    async def scenario():
+        novel_id = await crud.create_novel(NovelCreate(title="测试小说"))
+        chapters = _catalog(novel_id, range(1, 4))
+        chapters.append(ChapterCreate(
+            novel_id=novel_id, title="第4章", chapter_index=4, source_url="https://example.com/4",
+            content="正文", is_downloaded=True
+        ))
+        first = await crud.create_chapters_bulk(chapters)
+        second = await crud.create_chapters_bulk(chapters + _catalog(novel_id, [5]))
+        return first, second, len(await crud.get_novel_chapters(novel_id))
+
+    assert run_with_db(scenario) == (4, 1, 5)
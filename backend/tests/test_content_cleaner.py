@@ -0,0 +1,42 @@
+import re
+
+import pytest
+
+from utils.content_cleaner import ContentCleaner, validate_pattern
+
+
+def test_mixed_case_patterns_and_phrases():
+    """规则中大小写混合的正则和短语同样不区分大小写匹配"""
+    cleaner = ContentCleaner.from_config({
+        "phrases": ["VIP章节"],
+        "patterns": [r"Read More At \S+\.COM", r"BOOK\d+"],
+        "use_defaults": False,
+    })
+    content = "第一段正文 read more at Example.com\nvip章节第二段\n第三段Book12结束"
+    assert cleaner.clean(content) == "第一段正文\n\n第二段\n\n第三段结束"
+
+
+def test_escape_sequences_keep_their_case():
+    """大写的转义序列不转为小写，\\S仍表示非空白字符"""
+    cleaner = ContentCleaner(patterns=[r"AD\S+END"])
+    assert cleaner.clean("正文ad-xyz-END正文 ad x END") == "正文正文 ad x END"
+
+
+def test_fallback_on_length_changing_lowercase():
+    """转小写后长度变化的正文在原文上不区分大小写匹配"""
+    cleaner = ContentCleaner(patterns=[r"AD\d+"])
+    assert cleaner.clean("İ正文Ad123") == "İ正文"
+
+
+def test_backreferences_are_rejected():
+    """合并后分组编号会变化，反向引用和条件分组在校验和加载配置时都被拒绝"""
+    for pattern in (r"(ab)\1", r"(a)(?(1)b|c)", r"(?:(x)y)+\1"):
+        with pytest.raises(re.error):
+            validate_pattern(pattern)
+    for pattern in (r"(ab)+c", r"[\1]", "[\x0c-\x20]+", r"\d{2,3}"):
+        validate_pattern(pattern)
+
+    # 第一个正则的反向引用若被接受，会指向合并后其他正则的分组
+    cleaner = ContentCleaner.from_config({"patterns": [r"(广告)", r"(x)\1"], "use_defaults": False})
+    assert cleaner.patterns == ["(广告)"]
+    assert cleaner.clean("正文广告xx") == "正文xx"
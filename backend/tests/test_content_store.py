@@ -0,0 +1,111 @@
+import asyncio
+
+from database import init_db, content_store
+from database.content_store import rebuild_content_index, save_content, search_paragraphs
+
+
+async def _seed(conn, chapter_count: int) -> int:
+    cursor = await conn.execute("INSERT INTO novels (title) VALUES ('测试小说')")
+    novel_id = cursor.lastrowid
+    for i in range(1, chapter_count + 1):
+        cursor = await conn.execute(
+            "INSERT INTO chapters (novel_id, title, chapter_index, source_url) VALUES (?, ?, ?, ?)",
+            (novel_id, f"第{i}章", i, f"https://example.com/book/1/{i}")
+        )
+        await save_content(conn, cursor.lastrowid, f"第一段\n主角来到青云山下\n第{i}章结束")
+    await conn.commit()
+    return novel_id
+
+
+def test_rebuild_index_leaves_commit_to_caller(temp_db, monkeypatch):
+    """重建索引分批执行但不提交，迁移事务回滚后不会留下部分索引"""
+    monkeypatch.setattr(content_store, "MIGRATE_BATCH_SIZE", 1)
+
+    async def scenario():
+        conn = await init_db.get_db_connection()
+        try:
+            await _seed(conn, 3)
+            await conn.execute("INSERT INTO chapter_paragraphs_fts (chapter_paragraphs_fts) VALUES ('delete-all')")
+            await conn.commit()
+
+            await conn.execute("BEGIN")
+            assert await rebuild_content_index(conn) == 3
+            in_transaction = conn.in_transaction
+            indexed = len(await search_paragraphs(conn, "青云山", None, 10, 0))
+            await conn.rollback()
+            return in_transaction, indexed, len(await search_paragraphs(conn, "青云山", None, 10, 0))
+        finally:
+            await conn.close()
+
+    in_transaction, indexed, after_rollback = asyncio.run(scenario())
+    assert in_transaction
+    assert indexed == 3
+    assert after_rollback == 0
+
+
+async def _index_rows(conn, keyword: str) -> int:
+    cursor = await conn.execute(
+        "SELECT COUNT(*) FROM chapter_paragraphs_fts WHERE chapter_paragraphs_fts MATCH ?",
+        ('text: "' + keyword + '"',)
+    )
+    return (await cursor.fetchone())[0]
+
+
+def test_deleting_novel_removes_index_rows(temp_db):
+    """删除小说级联删除章节时，章节段落同时移出全文索引，其他小说的索引不受影响"""
+    async def scenario():
+        conn = await init_db.get_db_connection()
+        try:
+            deleted = await _seed(conn, 3)
+            kept = await _seed(conn, 2)
+            await conn.execute("DELETE FROM novels WHERE id = ?", (deleted,))
+            await conn.commit()
+            hits = await search_paragraphs(conn, "青云山", None, 10, 0)
+            return deleted, kept, hits, await _index_rows(conn, "青云山")
+        finally:
+            await conn.close()
+
+    deleted, kept, hits, rows = asyncio.run(scenario())
+    assert rows == 2
+    assert len(hits) == 2
+    assert {hit['novel_id'] for hit in hits} == {kept}
+
+
+def test_purge_orphan_paragraphs(temp_db):
+    """没有触发器时删除的章节残留在索引中，迁移时清理"""
+    async def scenario():
+        conn = await init_db.get_db_connection()
+        try:
+            deleted = await _seed(conn, 3)
+            await _seed(conn, 1)
+            await conn.execute("DROP TRIGGER chapters_paragraphs_fts_bd")
+            await conn.execute("DELETE FROM novels WHERE id = ?", (deleted,))
+            before = await _index_rows(conn, "青云山")
+            rebuilt = await content_store.purge_orphan_paragraphs(conn)
+            return before, rebuilt, await _index_rows(conn, "青云山")
+        finally:
+            await conn.close()
+
+    assert asyncio.run(scenario()) == (4, 1, 1)
+
+
+def test_short_keyword_falls_back_to_scan(temp_db):
+    """两个字的关键词无法使用trigram索引，逐章扫描的结果与索引搜索格式和顺序相同"""
+    async def scenario():
+        conn = await init_db.get_db_connection()
+        try:
+            novel_id = await _seed(conn, 3)
+            await _seed(conn, 2)
+            indexed = await search_paragraphs(conn, "青云山", novel_id, 10, 0)
+            scanned = await content_store.scan_paragraphs(conn, "青云山", novel_id, 10, 0)
+            short = await content_store.scan_paragraphs(conn, "青云", None, 10, 0)
+            paged = await content_store.scan_paragraphs(conn, "青云", None, 2, 3)
+            return indexed, scanned, short, paged
+        finally:
+            await conn.close()
+
+    indexed, scanned, short, paged = asyncio.run(scenario())
+    assert scanned == indexed
+    assert len(short) == 5
+    assert short[0]['snippet'] == "主角来到<mark>青云</mark>山下"
+    assert paged == short[3:5]
@@ -0,0 +1,61 @@
+import asyncio
+
+from database import crud
+from database.pool import db_pool
+from database.models import NovelCreate, ChapterCreate
+from spider import download_manager as download_module
+from spider.download_manager import DownloadManager
+from tests.conftest import run_with_db
+
+
+async def _create_novel(chapter_count: int) -> int:
+    novel_id = await crud.create_novel(NovelCreate(title="测试小说", source_url="https://example.com/book/1"))
+    await crud.create_chapters_bulk([
+        ChapterCreate(novel_id=novel_id, title=f"第{i}章", chapter_index=i, source_url=f"https://example.com/book/1/{i}")
+        for i in range(1, chapter_count + 1)
+    ])
+    return novel_id
+
+
+def test_cancel_during_checkpoint_keeps_batch(temp_db, monkeypatch):
+    """检查点写入期间取消任务，这一批章节完整提交，任务进度与章节状态一致"""
+    writing = None
+    store = crud._store_chapter_content
+
+    async def slow_store(conn, chapter_id, content, now):
+        # 在写事务中途停下，等待测试取消任务
+        writing.set()
+        await asyncio.sleep(0.02)
+        await store(conn, chapter_id, content, now)
+
+    async def fake_contents(chapters, rule_id):
+        for chapter_id, _ in chapters:
+            await asyncio.sleep(0)
+            yield chapter_id, f"正文{chapter_id}" * 10
+
+    monkeypatch.setattr(crud, "_store_chapter_content", slow_store)
+    monkeypatch.setattr(download_module.spider_manager, "get_chapter_contents", fake_contents)
+
+    async def scenario():
+        nonlocal writing
+        writing = asyncio.Event()
+        novel_id = await _create_novel(6)
+        manager = DownloadManager(max_jobs=1, checkpoint_size=3, checkpoint_interval=60)
+        job, _ = await manager.submit(novel_id, 1)
+        await asyncio.wait_for(writing.wait(), timeout=2)
+        assert await manager.cancel(job['id'])
+
+        job = await crud.get_download_job(job['id'])
+        async with db_pool.acquire() as conn:
+            cursor = await conn.execute(
+                "SELECT COUNT(*) FROM download_job_chapters WHERE job_id = ? AND status = 'done'", (job['id'],)
+            )
+            done_states = (await cursor.fetchone())[0]
+        chapters = await crud.get_novel_chapters(novel_id)
+        downloaded = sum(1 for chapter in chapters if chapter['is_downloaded'])
+        return job, done_states, downloaded
+
+    job, done_states, downloaded = run_with_db(scenario)
+    assert job['status'] == 'cancelled'
+    assert job['done_chapters'] >= 3
+    assert job['done_chapters'] == done_states == downloaded
@@ -0,0 +1,58 @@
+import asyncio
+
+import pytest
+
+from database import init_db, migrations
+from database.migrations import Migration, get_schema_version, run_migrations, table_exists
+
+
+async def _fail(conn):
+    raise RuntimeError("迁移失败")
+
+
+async def _commit(conn):
+    await conn.commit()
+
+
+def _add_migration(monkeypatch, steps):
+    version = migrations.LATEST_VERSION + 1
+    monkeypatch.setattr(migrations, "MIGRATIONS", migrations.MIGRATIONS + [Migration(version, "测试迁移", steps)])
+    monkeypatch.setattr(migrations, "LATEST_VERSION", version)
+    return version
+
+
+async def _migrate(expected_error):
+    conn = await init_db.get_db_connection()
+    try:
+        with pytest.raises(expected_error):
+            await run_migrations(conn)
+        return await get_schema_version(conn), await table_exists(conn, "migration_probe")
+    finally:
+        await conn.close()
+
+
+def test_failing_step_rolls_back_migration(temp_db, monkeypatch):
+    """步骤失败时已执行的步骤一起回滚，不记录版本"""
+    latest = migrations.LATEST_VERSION
+    _add_migration(monkeypatch, ["CREATE TABLE migration_probe (id INTEGER)", _fail])
+    assert asyncio.run(_migrate(RuntimeError)) == (latest, False)
+
+
+def test_step_committing_is_rejected(temp_db, monkeypatch):
+    """步骤自行提交迁移事务时报错，不记录版本"""
+    latest = migrations.LATEST_VERSION
+    _add_migration(monkeypatch, [_commit, "CREATE TABLE migration_probe (id INTEGER)"])
+    version, _ = asyncio.run(_migrate(RuntimeError))
+    assert version == latest
+
+
+def test_migrations_are_idempotent(temp_db):
+    """已是最新版本时不再执行迁移"""
+    async def scenario():
+        conn = await init_db.get_db_connection()
+        try:
+            return await run_migrations(conn)
+        finally:
+            await conn.close()
+
+    assert asyncio.run(scenario()) == migrations.LATEST_VERSION
@@ -0,0 +1,12 @@
+import asyncio
+
+from database import init_db
+from database.query_plans import check_query_plans
+
+
+def test_hot_queries_use_indexes(tmp_path, monkeypatch):
+    """在迁移到最新版本的临时数据库上，热点查询没有全表扫描和临时排序"""
+    # check_query_plans会切换数据库路径，测试结束后恢复
+    monkeypatch.setattr(init_db, "DB_PATH", init_db.DB_PATH)
+    issues = asyncio.run(check_query_plans(str(tmp_path / "plans.db")))
+    assert issues == [], "\n".join(f"[{issue.query}] {issue.detail}: {issue.sql}" for issue in issues)
@@ -0,0 +1,46 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api.settings import router as settings_router
+from database.pool import db_pool
+from database.writer import db_writer
+
+
+def _client() -> TestClient:
+    """只挂载设置路由的应用，路径前缀与main.py相同"""
+    app = FastAPI()
+    app.include_router(settings_router, prefix="/api/settings")
+
+    @app.on_event("startup")
+    async def startup():
+        await db_pool.open()
+        await db_writer.open()
+
+    @app.on_event("shutdown")
+    async def shutdown():
+        await db_writer.close()
+        await db_pool.close()
+
+    return TestClient(app)
+
+
+def test_batch_update_bumps_version(temp_db):
+    """批量更新后版本号递增，批量获取返回更新后的值"""
+    with _client() as client:
+        before = client.get("/api/settings/version").json()["version"]
+
+        response = client.post("/api/settings/batch/update", json={"theme": "dark", "font_size": 18})
+        assert response.status_code == 200
+        assert response.json()["version"] > before
+        assert client.get("/api/settings/version").json()["version"] == response.json()["version"]
+
+        response = client.post("/api/settings/batch/get", json=["theme", "font_size", "missing"])
+        assert response.status_code == 200
+        assert response.json() == {"theme": "dark", "font_size": 18}
+
+
+def test_version_route_is_not_a_setting_key(temp_db):
+    """/version在/{key}之前注册，不会被当作名为version的设置"""
+    with _client() as client:
+        assert client.get("/api/settings/version").status_code == 200
+        assert client.get("/api/settings/missing").status_code == 404
@@ -0,0 +1,63 @@
+import asyncio
+
+from database import crud
+from database.models import HistoryCreate, NovelCreate, ChapterCreate
+from database.write_buffer import WriteBehindBuffer
+from tests.conftest import run_with_db
+
+
+async def _create_chapters(count: int):
+    novel_id = await crud.create_novel(NovelCreate(title="测试小说"))
+    await crud.sync_chapter_catalog(novel_id, [
+        ChapterCreate(novel_id=novel_id, title=f"第{i}章", chapter_index=i, source_url=f"https://example.com/{i}")
+        for i in range(1, count + 1)
+    ])
+    return novel_id, [chapter['id'] for chapter in await crud.get_novel_chapters(novel_id)]
+
+
+def test_stale_history_does_not_block_flush(temp_db):
+    """章节已不存在的阅读记录被丢弃，同批次的其他记录和搜索历史正常写入，之后的刷新不再失败"""
+    async def scenario():
+        novel_id, chapter_ids = await _create_chapters(2)
+        buffer = WriteBehindBuffer(interval=60, max_pending=1000)
+        buffer.add_history(HistoryCreate(novel_id=novel_id, chapter_id=chapter_ids[0]))
+        buffer.add_history(HistoryCreate(novel_id=novel_id, chapter_id=chapter_ids[-1] + 100))
+        buffer.add_search("青云")
+
+        written = await buffer.flush()
+        history, total = await crud.get_history()
+        searches = await crud.get_search_history()
+        return written, buffer.pending, await buffer.flush(), total, [item['keyword'] for item in searches]
+
+    written, pending, second, total, keywords = run_with_db(scenario)
+    assert written == 2
+    assert pending == 0
+    assert second == 0
+    assert total == 1
+    assert keywords == ["青云"]
+
+
+def test_full_buffer_runs_one_flush_task(temp_db, monkeypatch):
+    """缓冲已满后继续写入只启动一个后台刷新任务"""
+    calls = []
+
+    async def slow_flush(self):
+        calls.append(self.pending)
+        await asyncio.sleep(0.01)
+        self._searches.clear()
+        return 0
+
+    monkeypatch.setattr(WriteBehindBuffer, "flush", slow_flush)
+
+    async def scenario():
+        buffer = WriteBehindBuffer(interval=60, max_pending=2)
+        await buffer.start()
+        for i in range(10):
+            buffer.add_search(f"关键词{i}")
+        task = buffer._flush_task
+        await task
+        await buffer.stop()
+        return len(calls)
+
+    # stop()还会刷新一次剩余的缓冲
+    assert run_with_db(scenario) == 2
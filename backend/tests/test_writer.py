@@ -0,0 +1,53 @@
+import asyncio
+
+from database.writer import db_writer
+from tests.conftest import run_with_db
+
+
+def test_cancelled_caller_does_not_stop_writer(temp_db):
+    """等待组提交时被取消的调用方不影响写协程，之后的写事务正常完成"""
+    async def scenario():
+        async def write(key):
+            async with db_writer.transaction() as conn:
+                await conn.execute("INSERT INTO settings (key, value) VALUES (?, '1')", (key,))
+
+        async def slow():
+            async with db_writer.transaction() as conn:
+                await conn.execute("INSERT INTO settings (key, value) VALUES ('slow', '1')")
+                await asyncio.sleep(0.05)
+
+        # slow占用写连接时，victim排队；victim在等待中被取消
+        slow_task = asyncio.create_task(slow())
+        await asyncio.sleep(0)
+        victims = [asyncio.create_task(write(f"victim{i}")) for i in range(5)]
+        await asyncio.sleep(0.01)
+        for task in victims:
+            task.cancel()
+        await slow_task
+        await asyncio.gather(*victims, return_exceptions=True)
+
+        await asyncio.wait_for(write("after"), timeout=2)
+        async with db_writer.transaction() as conn:
+            cursor = await conn.execute("SELECT key FROM settings WHERE key IN ('slow', 'after')")
+            return {row[0] for row in await cursor.fetchall()}
+
+    assert run_with_db(scenario) == {"slow", "after"}
+
+
+def test_caller_cancelled_while_waiting_for_commit(temp_db):
+    """写完后等待提交时被取消，写协程继续处理后续事务"""
+    async def scenario():
+        async def write(key):
+            async with db_writer.transaction() as conn:
+                await conn.execute("INSERT INTO settings (key, value) VALUES (?, '1')", (key,))
+
+        for i in range(20):
+            task = asyncio.create_task(write(f"k{i}"))
+            for _ in range(i % 4):
+                await asyncio.sleep(0)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        await asyncio.wait_for(write("after"), timeout=2)
+        return True
+
+    assert run_with_db(scenario)
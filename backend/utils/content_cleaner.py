@@ -0,0 +1,182 @@
+import re
+import json
+from typing import Any, Dict, Iterable, List, Optional, Pattern
+
+from loguru import logger
+
+try:
+    # Python 3.11起sre_parse改名为re._parser
+    from re import _parser as sre_parse
+except ImportError:  # pragma: no cover
+    import sre_parse
+
+# 章节正文中常见的广告短语，按字面匹配，不区分大小写
+DEFAULT_PHRASES = (
+    '小说更新最快', '无弹窗阅读', '请记住本站', '本站网址', '免费阅读', '最新章节',
+    '请收藏本站', '手机阅读', '章节目录', '加入书签', 'TXT下载', '全文阅读',
+)
+
+# 章节正文中常见的广告文本，按正则匹配，不区分大小写
+DEFAULT_PATTERNS = (
+    r'\(请在百度搜索.*?\)',
+    r'手机用户请访问.*?com',
+    r'本章未完.*?下一页',
+    r'天才一秒记住.*?com',
+    r'https?://\S+',
+    r'www\.\S+\.com',
+)
+
+# 正则中的转义序列，转为小写时保持原样：\S、\W等大小写含义不同
+_ESCAPE = re.compile(r'\\N\{[^}]*\}|\\.', re.DOTALL)
+
+
+def _lower_pattern(pattern: str) -> str:
+    """把正则中的字母转为小写以便在小写的正文上匹配，转义序列保持不变"""
+    parts = []
+    position = 0
+    for match in _ESCAPE.finditer(pattern):
+        parts.append(pattern[position:match.start()].lower())
+        parts.append(match.group())
+        position = match.end()
+    parts.append(pattern[position:].lower())
+    return ''.join(parts)
+
+
+def _trie_alternatives(phrases: Iterable[str]) -> List[str]:
+    """把字面短语编译为前缀树形式的正则，按首字符返回各分支
+
+    共同前缀只匹配一次，每个位置最多沿树走一条分支，效果相当于Aho-Corasick的逐字符匹配，
+    由re模块的C实现执行。短语之间互为前缀时优先匹配较长的短语。
+    """
+    trie: Dict[str, Any] = {}
+    for phrase in phrases:
+        node = trie
+        for char in phrase.lower():
+            node = node.setdefault(char, {})
+        node[''] = None
+
+    def build(node: Dict[str, Any]) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        if '' in node:
+            # 短语可以在这里结束，也可以继续匹配更长的短语
+            return f"(?:{body})?"
+        return body
+
+    return [re.escape(char) + build(child) for char, child in sorted(trie.items())]
+
+
+def _has_backreference(node: Any) -> bool:
+    """在正则的语法树中查找反向引用和条件分组"""
+    if isinstance(node, sre_parse.SubPattern):
+        node = node.data
+    if isinstance(node, (list, tuple)):
+        # 操作码是int的子类，按身份比较，避免与字符范围等元组中的数值相等
+        if len(node) == 2 and (node[0] is sre_parse.GROUPREF or node[0] is sre_parse.GROUPREF_EXISTS):
+            return True
+        return any(_has_backreference(item) for item in node)
+    return False
+
+
+def validate_pattern(pattern: str) -> None:
+    """检查清理正则是否可用，无效时抛出re.error
+
+    正则会嵌入合并后的正则中，不能使用命名分组或全局标志；
+    合并后分组编号会变化，也不能使用反向引用（\\1）和条件分组（(?(1)...)）。
+    """
+    if re.compile(f"(?:{pattern})").groupindex:
+        raise re.error("不支持命名分组")
+    if _has_backreference(sre_parse.parse(pattern)):
+        raise re.error("不支持反向引用")
+
+
+class ContentCleaner:
+    """章节正文清理
+
+    先用字符串操作去掉每行首尾空白和空行，段落之间用一个空行分隔，
+    再用一个合并了广告正则和短语前缀树的正则扫描一遍正文删除广告。
+
+    合并后的正则不带IGNORECASE，在转为小写的正文上匹配：各分支都以普通字符开头时，
+    re模块会先按首字符集合跳过不可能匹配的位置，带IGNORECASE时这一优化失效，
+    比原来逐个正则扫描还慢。因此短语和正则中的字母在合并前转为小写。
+    """
+
+    def __init__(self, phrases: Iterable[str] = (), patterns: Iterable[str] = ()):
+        self.phrases: List[str] = [phrase for phrase in dict.fromkeys(phrases) if phrase]
+        self.patterns: List[str] = [pattern for pattern in dict.fromkeys(patterns) if pattern]
+
+        lowered = dict.fromkeys(_lower_pattern(pattern) for pattern in self.patterns)
+        source = '|'.join([*lowered, *_trie_alternatives(self.phrases)])
+        self.regex: Optional[Pattern] = re.compile(source) if source else None
+        # 个别字符转小写后长度会变化，位置无法对应原文，这时在原文上不区分大小写匹配
+        self.fallback: Optional[Pattern] = re.compile(source, re.IGNORECASE) if source else None
+
+    @classmethod
+    def from_config(cls, config: Any, rule_id: Any = None) -> "ContentCleaner":
+        """根据规则的cleaning_rules创建清理器，未配置时返回默认清理器
+
+        cleaning_rules为JSON对象：phrases为字面短语列表，patterns为正则列表，
+        use_defaults为false时不使用内置的广告短语和正则。无效的正则记录日志后忽略。
+        """
+        if not config:
+            return DEFAULT_CLEANER
+        try:
+            if isinstance(config, str):
+                config = json.loads(config)
+            phrases = [str(phrase) for phrase in config.get('phrases') or []]
+            patterns = [str(pattern) for pattern in config.get('patterns') or []]
+            use_defaults = config.get('use_defaults', True)
+        except Exception as e:
+            logger.error(f"规则 {rule_id} 的正文清理配置无效，使用默认配置: {str(e)}")
+            return DEFAULT_CLEANER
+
+        valid_patterns = []
+        for pattern in patterns:
+            try:
+                validate_pattern(pattern)
+                valid_patterns.append(pattern)
+            except re.error as e:
+                logger.error(f"规则 {rule_id} 的正文清理正则无效: {pattern}, {str(e)}")
+
+        if use_defaults:
+            if not phrases and not valid_patterns:
+                return DEFAULT_CLEANER
+            phrases = [*DEFAULT_PHRASES, *phrases]
+            valid_patterns = [*DEFAULT_PATTERNS, *valid_patterns]
+        try:
+            return cls(phrases, valid_patterns)
+        except re.error as e:
+            logger.error(f"规则 {rule_id} 的正文清理配置无效，使用默认配置: {str(e)}")
+            return DEFAULT_CLEANER
+
+    def clean(self, content: str) -> str:
+        """删除广告文本，段落之间用一个空行分隔"""
+        content = '\n\n'.join(line for line in (line.strip() for line in content.split('\n')) if line)
+        if self.regex is None:
+            return content
+
+        lowered = content.lower()
+        if len(lowered) == len(content):
+            matches = self.regex.finditer(lowered)
+        else:
+            matches = self.fallback.finditer(content)
+
+        parts = []
+        position = 0
+        for match in matches:
+            start, end = match.span()
+            parts.append(content[position:start])
+            position = end
+        if not parts:
+            return content
+        parts.append(content[position:])
+
+        # 删除广告后可能留下空白或空段落
+        paragraphs = (paragraph.strip() for paragraph in ''.join(parts).split('\n\n'))
+        return '\n\n'.join(paragraph for paragraph in paragraphs if paragraph)
+
+
+# 默认清理器，未配置cleaning_rules的规则共用
+DEFAULT_CLEANER = ContentCleaner(DEFAULT_PHRASES, DEFAULT_PATTERNS)
@@ -0,0 +1,111 @@
+from typing import Any, Callable, Dict, Optional
+
+import soupsieve
+from loguru import logger
+
+from database.pool import db_pool
+from utils.content_cleaner import ContentCleaner
+
+# 规则中的CSS选择器字段
+SELECTOR_FIELDS = (
+    'search_result_rule', 'cover_rule', 'title_rule', 'author_rule',
+    'description_rule', 'chapter_list_rule', 'chapter_content_rule',
+)
+
+
+class CompiledRule:
+    """预编译的规则：规则字段、编译后的CSS选择器和正文清理器"""
+
+    def __init__(self, rule: Dict[str, Any]):
+        self.rule = rule
+        # 规则的版本，取自updated_at
+        self.version = rule.get('updated_at')
+        self.selectors: Dict[str, Optional[soupsieve.SoupSieve]] = {
+            field: self._compile(field, rule.get(field)) for field in SELECTOR_FIELDS
+        }
+        # 解析引擎名称 -> 该引擎编译的选择器，见spider/html_engines.py
+        self._engine_selectors: Dict[str, Dict[str, Any]] = {'bs4': self.selectors}
+        self.cleaner = ContentCleaner.from_config(rule.get('cleaning_rules'), rule.get('id'))
+
+    def __getitem__(self, key: str) -> Any:
+        return self.rule[key]
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.rule.get(key, default)
+
+    def _compile(self, field: str, selector: Optional[str],
+                 compile: Callable[[str], Any] = soupsieve.compile) -> Any:
+        if not selector:
+            return None
+        try:
+            return compile(selector)
+        except Exception as e:
+            logger.error(f"规则 {self.rule.get('id')} 的 {field} 不是有效的CSS选择器: {str(e)}")
+            return None
+
+    def compiled_selectors(self, engine: str, compile: Callable[[str], Any]) -> Dict[str, Any]:
+        """按解析引擎编译的选择器，首次用某个引擎时编译，无效的选择器视为未配置"""
+        selectors = self._engine_selectors.get(engine)
+        if selectors is None:
+            selectors = self._engine_selectors[engine] = {
+                field: self._compile(field, self.rule.get(field), compile) for field in SELECTOR_FIELDS
+            }
+        return selectors
+
+    def clean(self, content: str) -> str:
+        """移除正文中的广告文本并规范段落"""
+        return self.cleaner.clean(content)
+
+
+class RuleRegistry:
+    """进程内的规则缓存
+
+    搜索、获取详情和下载章节时，API处理函数和爬虫都要读取同一条规则。
+    规则首次使用时从数据库加载并预编译选择器，此后直接从内存返回；
+    crud.update_rule和crud.delete_rule提交后调用invalidate()使缓存失效。
+    爬虫运行在Twisted线程中，字典的单次读写在GIL下是原子的，这里不加锁。
+    """
+
+    def __init__(self):
+        self._rules: Dict[int, CompiledRule] = {}
+        # 每条规则被失效的次数，加载期间规则被修改时不写入缓存，避免缓存旧版本
+        self._generations: Dict[int, int] = {}
+
+    async def get(self, rule_id: int) -> Optional[CompiledRule]:
+        """获取预编译的规则，规则不存在时返回None"""
+        compiled = self._rules.get(rule_id)
+        if compiled is not None:
+            return compiled
+
+        generation = self._generations.get(rule_id, 0)
+        async with db_pool.acquire() as conn:
+            cursor = await conn.execute("SELECT * FROM rules WHERE id = ?", (rule_id,))
+            row = await cursor.fetchone()
+        if row is None:
+            return None
+        return self.put(dict(row), generation)
+
+    def put(self, rule: Dict[str, Any], generation: Optional[int] = None) -> CompiledRule:
+        """缓存一条规则，同一版本的规则不会重复编译"""
+        rule_id = rule['id']
+        compiled = self._rules.get(rule_id)
+        if compiled is not None and compiled.version == rule.get('updated_at'):
+            return compiled
+        compiled = CompiledRule(rule)
+        if generation is None or generation == self._generations.get(rule_id, 0):
+            self._rules[rule_id] = compiled
+        return compiled
+
+    def invalidate(self, rule_id: int) -> None:
+        """规则被修改或删除后移除缓存"""
+        self._generations[rule_id] = self._generations.get(rule_id, 0) + 1
+        self._rules.pop(rule_id, None)
+
+    def clear(self) -> None:
+        """清空所有缓存的规则"""
+        for rule_id in list(self._rules):
+            self.invalidate(rule_id)
+
+
+# 全局规则缓存实例
+rule_registry = RuleRegistry()